@@ -74,6 +74,9 @@ import sys
 import os
 import subprocess
 import fnmatch
+import shutil
+import tempfile
+import threading
 
 # Import readline so raw_input gets readline features, like history, and
 # backspace working right. Do not import readline if not connected to a tty
@@ -93,6 +96,10 @@ try:
     _input = raw_input # pylint: disable=undefined-variable
 except NameError:
     _input = input
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 log = logging.getLogger("DD")
 
@@ -110,6 +117,54 @@ KERNELVER = os.uname()[2]
 MODULE_UPDATES_DIR = "/lib/modules/%s/updates" % KERNELVER
 FIRMWARE_UPDATES_DIR = "/lib/firmware/updates"
 
+# Number of dd_list/dd_extract processes running at the same time
+try:
+    MAX_WORKERS = min(8, os.cpu_count() or 1)
+except AttributeError:
+    MAX_WORKERS = 1
+
+def parallel_map(func, items, workers=None):
+    """
+    Call func on each of items from a pool of at most workers threads.
+
+    Returns the results in the order of items. If any call raised an
+    exception, no new calls are started and the exception raised for the
+    earliest item is re-raised once the running calls are finished.
+    """
+    items = list(items)
+    if workers is None:
+        workers = MAX_WORKERS
+    workers = min(workers, len(items))
+    if workers <= 1:
+        return [func(item) for item in items]
+
+    results = [None] * len(items)
+    errors = []
+    todo = queue.Queue()
+    for i, item in enumerate(items):
+        todo.put((i, item))
+
+    def worker():
+        while not errors:
+            try:
+                i, item = todo.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[i] = func(item)
+            except Exception as e: # pylint: disable=broad-except
+                errors.append((i, e))
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    if errors:
+        raise min(errors, key=lambda err: err[0])[1]
+    return results
+
 def mkdir_seq(stem):
     """
     Create sequentially-numbered directories starting with stem.
@@ -179,7 +234,8 @@ def dd_extract(rpm_path, outdir, kernel_ver=None, flags='-blmf'):
     subprocess.check_output(cmd, stderr=DEVNULL) # discard stdout
 
 def list_drivers(repos, anaconda_ver=None, kernel_ver=None):
-    return [d for r in repos for d in dd_list(r, anaconda_ver, kernel_ver)]
+    lists = parallel_map(lambda r: dd_list(r, anaconda_ver, kernel_ver), repos)
+    return [d for drivers in lists for d in drivers]
 
 def mount(dev, mnt=None):
     """Mount the given dev at the mountpoint given by mnt."""
@@ -212,7 +268,19 @@ def iter_files(topdir, pattern=None):
 
 def ensure_dir(d):
     """make sure the given directory exists."""
-    subprocess.check_call(["mkdir", "-p", d])
+    try:
+        os.makedirs(d)
+    except OSError as e:
+        if e.errno != 17 or not os.path.isdir(d): raise
+
+def _copy(src, dest):
+    """copy a single file to dest like 'cp -a' would (symlinks stay links)."""
+    if os.path.islink(src):
+        if os.path.lexists(dest):
+            os.unlink(dest)
+        os.symlink(os.readlink(src), dest)
+    else:
+        shutil.copy2(src, dest)
 
 def move_files(files, destdir):
     """move files into destdir (iff they're not already under destdir)"""
@@ -220,7 +288,10 @@ def move_files(files, destdir):
     for f in files:
         if f.startswith(destdir):
             continue
-        subprocess.call(["mv", "-f", f, destdir])
+        try:
+            shutil.move(f, os.path.join(destdir, os.path.basename(f)))
+        except (IOError, OSError) as e:
+            log.error("failed to move %s to %s: %s", f, destdir, e)
 
 def copy_files(files, destdir):
     """copy files into destdir (iff they're not already under destdir)"""
@@ -228,7 +299,39 @@ def copy_files(files, destdir):
     for f in files:
         if f.startswith(destdir):
             continue
-        subprocess.call(["cp", "-a", f, destdir])
+        try:
+            _copy(f, os.path.join(destdir, os.path.basename(f)))
+        except (IOError, OSError) as e:
+            log.error("failed to copy %s to %s: %s", f, destdir, e)
+
+def copy_tree(srcdir, destdir):
+    """copy the contents of srcdir into destdir, like 'cp -aT'."""
+    ensure_dir(destdir)
+    for name in os.listdir(srcdir):
+        src, dest = os.path.join(srcdir, name), os.path.join(destdir, name)
+        if os.path.isdir(src) and not os.path.islink(src):
+            copy_tree(src, dest)
+        else:
+            _copy(src, dest)
+    shutil.copystat(srcdir, destdir)
+
+def merge_tree(srcdir, destdir):
+    """
+    move the contents of srcdir into destdir, replacing anything with the
+    same name but merging directories. srcdir is left empty.
+    """
+    for name in os.listdir(srcdir):
+        src, dest = os.path.join(srcdir, name), os.path.join(destdir, name)
+        src_isdir = os.path.isdir(src) and not os.path.islink(src)
+        if os.path.isdir(dest) and not os.path.islink(dest):
+            if src_isdir:
+                merge_tree(src, dest)
+                os.rmdir(src)
+                continue
+            shutil.rmtree(dest)
+        elif src_isdir and os.path.lexists(dest):
+            os.unlink(dest)
+        os.rename(src, dest)
 
 def append_line(filename, line):
     """simple helper to append a line to a file"""
@@ -250,7 +353,10 @@ def save_repo(repo, target="/run/install"):
     """copy a repo to the place where the installer will look for it later."""
     newdir = mkdir_seq(os.path.join(target, "DD-"))
     log.debug("save_repo: copying %s to %s", repo, newdir)
-    subprocess.call(["cp", "-arT", repo, newdir])
+    try:
+        copy_tree(repo, newdir)
+    except (IOError, OSError) as e:
+        log.error("failed to copy %s to %s: %s", repo, newdir, e)
     return newdir
 
 def extract_drivers(drivers=None, repos=None, outdir="/updates",
@@ -280,9 +386,25 @@ def extract_drivers(drivers=None, repos=None, outdir="/updates",
 
     ensure_dir(outdir)
 
-    for driver in drivers:
+    # Extract each package into its own directory so the packages can be
+    # extracted at the same time, then merge them into outdir in order so
+    # later packages still win if they contain the same files.
+    stagedirs = []
+    def _extract(driver):
         log.info("Extracting: %s", driver.name)
-        dd_extract(driver.source, outdir)
+        stagedir = tempfile.mkdtemp(prefix=".dd-extract-", dir=outdir)
+        stagedirs.append(stagedir)
+        dd_extract(driver.source, stagedir)
+        return stagedir
+
+    try:
+        for stagedir in parallel_map(_extract, drivers):
+            merge_tree(stagedir, outdir)
+    finally:
+        for stagedir in stagedirs:
+            shutil.rmtree(stagedir, ignore_errors=True)
+
+    for driver in drivers:
         # Make sure we install modules/firmware into the target system
         if 'modules' in driver.flags or 'firmwares' in driver.flags:
             append_line(pkglist, driver.name)
@@ -311,16 +433,25 @@ def grab_driver_files(outdir="/updates"):
 def load_drivers(modnames):
     """run depmod and try to modprobe all the given module names."""
     log.debug("load_drivers: %s", modnames)
+    if not modnames:
+        return
     subprocess.call(["depmod", "-a"])
     subprocess.call(["modprobe", "-a"] + modnames)
 
 # We *could* pass in "outdir" if we wanted to extract things somewhere else,
 # but right now the only use case is running inside the initramfs, so..
 def process_driver_disk(dev, interactive=False):
+    # depmod only needs to run once, after all the .iso files were handled
+    modules = _try_process_driver_disk(dev, interactive=interactive)
+    if modules:
+        load_drivers(modules)
+
+def _try_process_driver_disk(dev, interactive=False):
     try:
-        _process_driver_disk(dev, interactive=interactive)
+        return _process_driver_disk(dev, interactive=interactive)
     except (subprocess.CalledProcessError, IOError) as e:
         log.error("ERROR: %s", e)
+        return []
 
 def _process_driver_disk(dev, interactive=False):
     """
@@ -332,8 +463,11 @@ def _process_driver_disk(dev, interactive=False):
 
     If interactive, ask the user which driver(s) to install from the repos,
     or ask which iso file to process (if no repos).
+
+    Returns the names of the new modules, which still have to be loaded.
     """
     log.info("Examining %s", dev)
+    modules = []
     with mounted(dev) as mnt:
         repos = find_repos(mnt)
         isos = find_isos(mnt)
@@ -345,14 +479,14 @@ def _process_driver_disk(dev, interactive=False):
                 new_modules = extract_drivers(repos=repos)
             if new_modules:
                 modules = grab_driver_files()
-                load_drivers(modules)
         elif isos:
             if interactive:
                 isos = iso_menu(isos)
             for iso in isos:
-                process_driver_disk(iso, interactive=interactive)
+                modules += _try_process_driver_disk(iso, interactive=interactive)
         else:
             print("=== No driver disks found in %s! ===\n" % dev)
+    return modules
 
 def process_driver_rpm(rpm):
     try:
@@ -25,6 +25,7 @@ import collections
 import os
 import re
 import blivet
+from blivet import arch
 from parted import PARTITION_BIOS_GRUB
 from glob import glob
 from itertools import chain
@@ -32,12 +33,13 @@ from itertools import chain
 from pyanaconda import iutil
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
 from blivet.devicelibs import raid
-from pyanaconda.product import productName
+from pyanaconda.product import productName, productVersion
 from pyanaconda.flags import flags, can_touch_runtime_system
 from blivet.fcoe import fcoe
 import pyanaconda.network
 from pyanaconda.errors import errorHandler, ERROR_RAISE, ZIPLError
 from pyanaconda.packaging.rpmostreepayload import RPMOSTreePayload
+from pyanaconda.packaging.rpmdb import sysrootRpmDB
 from pyanaconda.nm import nm_device_hwaddress
 from blivet import platform
 from blivet.size import Size
@@ -1377,6 +1379,75 @@ class GRUB(BootLoader):
 
         return valid
 
+# The parts of grub.cfg that don't depend on the installation, as written by
+# the 00_header and 41_custom scripts of grub2-mkconfig
+GRUB2_CONFIG_HEADER = """#
+# DO NOT EDIT THIS FILE
+#
+# It was generated by anaconda. To add entries, edit /etc/grub.d/40_custom
+# and regenerate it with grub2-mkconfig using settings from /etc/default/grub.
+#
+set pager=1
+
+if [ -s $prefix/grubenv ]; then
+  load_env
+fi
+if [ "${next_entry}" ] ; then
+   set default="${next_entry}"
+   set next_entry=
+   save_env next_entry
+   set boot_once=true
+else
+   set default="${saved_entry}"
+fi
+
+if [ x"${feature_menuentry_id}" = xy ]; then
+  menuentry_id_option="--id"
+else
+  menuentry_id_option=""
+fi
+
+export menuentry_id_option
+
+if [ "${prev_saved_entry}" ]; then
+  set saved_entry="${prev_saved_entry}"
+  save_env saved_entry
+  set prev_saved_entry=
+  save_env prev_saved_entry
+  set boot_once=true
+fi
+
+function savedefault {
+  if [ -z "${boot_once}" ]; then
+    saved_entry="${chosen}"
+    save_env saved_entry
+  fi
+}
+
+function load_video {
+  if [ x$feature_all_video_module = xy ]; then
+    insmod all_video
+  else
+    insmod efi_gop
+    insmod efi_uga
+    insmod ieee1275_fb
+    insmod vbe
+    insmod vga
+    insmod video_bochs
+    insmod video_cirrus
+  fi
+}
+
+"""
+
+GRUB2_CONFIG_FOOTER = """
+if [ -f  ${config_directory}/custom.cfg ]; then
+  source ${config_directory}/custom.cfg
+elif [ -z "${config_directory}" -a -f  $prefix/custom.cfg ]; then
+  source $prefix/custom.cfg;
+fi
+"""
+
 class GRUB2(GRUB):
     """ GRUBv2
 
@@ -1406,6 +1477,13 @@ class GRUB2(GRUB):
     terminal_type = "console"
     stage2_max_end = None
 
+    # grub.cfg is written by anaconda instead of grub2-mkconfig when there
+    # is no other OS for os-prober to find (see _can_write_native_config)
+    native_config = True
+    native_config_formats = {"ext2": "ext2", "ext3": "ext2", "ext4": "ext2", "xfs": "xfs"}
+    native_config_device_types = ["partition", "lvmlv"]
+    grubenv_size = 1024
+
     # requirements for boot devices
     stage2_device_types = ["partition", "mdarray", "lvmlv"]
     stage2_raid_levels = [raid.RAID0, raid.RAID1, raid.RAID4,
@@ -1422,6 +1500,9 @@ class GRUB2(GRUB):
     def __init__(self):
         super(GRUB2, self).__init__()
 
+        # Formatted devices not used by the installed system, None if unknown
+        self.other_os_devices = None
+
     # XXX we probably need special handling for raid stage1 w/ gpt disklabel
     #     since it's unlikely there'll be a bios boot partition on each disk
 
@@ -1545,6 +1626,147 @@ class GRUB2(GRUB):
         header.write("EOF\n")
         header.close()
 
+    #
+    # native configuration
+    #
+
+    @property
+    def linux_commands(self):
+        """ The grub commands loading the kernel and the initrd. """
+        if arch.isX86():
+            return ("linux16", "initrd16")
+        else:
+            return ("linux", "initrd")
+
+    def image_title(self, image):
+        """ Return the menu entry title of image, the way 10_linux makes it. """
+        return "%s (%s) %s" % (productName, image.version, productVersion)
+
+    def _can_write_native_config(self):
+        """ Can grub.cfg be written without grub2-mkconfig? """
+        reason = None
+        if not self.native_config:
+            reason = "not supported by %s" % self.name
+        elif self.other_os_devices is None:
+            reason = "other operating systems were not checked for"
+        elif self.other_os_devices:
+            reason = "other operating systems may be installed on %s" % \
+                     ", ".join(d.name for d in self.other_os_devices)
+        elif self.trusted_boot:
+            reason = "trusted boot is enabled"
+        elif any(i.label for i in self.chain_images):
+            reason = "there are images of other operating systems"
+        elif any(isinstance(i, TbootLinuxBootLoaderImage) for i in self.linux_images):
+            reason = "there are tboot images"
+        elif self.stage2_device.type not in self.native_config_device_types:
+            reason = "/boot is on a %s" % self.stage2_device.type
+        elif self.stage2_device.format.type not in self.native_config_formats:
+            reason = "/boot is %s" % self.stage2_device.format.type
+        elif not self.stage2_device.format.uuid:
+            reason = "/boot has no UUID"
+
+        if reason:
+            log.info("using grub2-mkconfig: %s", reason)
+            return False
+        return True
+
+    def write_config_password(self, config):
+        if not self.password and not self.encrypted_password:
+            return
+
+        self._encrypt_password()
+        config.write("set superusers=\"root\"\n"
+                     "export superusers\n"
+                     "password_pbkdf2 root %s\n" % self.encrypted_password)
+
+    def write_config_header(self, config):
+        """ Write what 00_header would write for the defaults file. """
+        config.write(GRUB2_CONFIG_HEADER)
+
+        if self.console and self.has_serial_console:
+            config.write("%s\n"
+                         "terminal_input serial console\n"
+                         "terminal_output serial console\n" % self.serial_command)
+        else:
+            config.write("terminal_output %s\n" % self.terminal_type)
+
+        config.write("set timeout=%d\n" % self.timeout)
+        self.write_config_password(config)
+
+    def write_config_images(self, config):
+        """ Write a menu entry for each of the kernels, like 10_linux. """
+        device = self.stage2_device
+        modules = ["gzio"]
+        if device.type == "partition":
+            modules.append("part_%s" % device.disk.format.labelType)
+        elif device.type == "lvmlv":
+            modules.append("lvm")
+        modules.append(self.native_config_formats[device.format.type])
+        linux_cmd, initrd_cmd = self.linux_commands
+
+        for image in self.images:
+            args = Arguments()
+            args.update(["root=%s" % image.device.fstabSpec, "ro"])
+            if image.device.type == "btrfs subvolume":
+                args.update(["rootflags=subvol=%s" % image.device.name])
+            args.update(self.boot_args)
+
+            config.write("\nmenuentry '%(title)s' --class %(os)s --class gnu-linux --class gnu "
+                         "--class os --unrestricted $menuentry_id_option "
+                         "'gnulinux-%(version)s-advanced-%(uuid)s' {\n"
+                         "\tload_video\n"
+                         "\tset gfxpayload=keep\n"
+                         "%(insmod)s"
+                         "\tsearch --no-floppy --fs-uuid --set=root %(uuid)s\n"
+                         "\t%(linux)s %(prefix)s/%(kernel)s %(args)s\n"
+                         "\t%(initrd)s %(prefix)s/%(initrd_file)s\n"
+                         "}\n"
+                         % {"title": self.image_title(image),
+                            "os": productName.split()[0].lower(),
+                            "version": image.version,
+                            "uuid": device.format.uuid,
+                            "insmod": "".join("\tinsmod %s\n" % m for m in modules),
+                            "linux": linux_cmd, "initrd": initrd_cmd,
+                            "prefix": self.boot_prefix,
+                            "kernel": image.kernel, "initrd_file": image.initrd,
+                            "args": args})
+
+        config.write(GRUB2_CONFIG_FOOTER)
+
+    def write_grubenv(self, **variables):
+        """ Set variables in the grub environment block, like grub2-editenv. """
+        env_path = os.path.normpath("%s%s/grubenv" % (iutil.getSysroot(), self.config_dir))
+        env = collections.OrderedDict()
+        try:
+            with open(env_path, "r") as f:
+                for line in f:
+                    if line.startswith("#") or "=" not in line:
+                        continue
+                    (key, _eq, value) = line.rstrip("\n").partition("=")
+                    env[key] = value
+        except IOError:
+            pass
+
+        env.update(variables)
+        block = "# GRUB Environment Block\n"
+        block += "".join("%s=%s\n" % (key, value) for (key, value) in env.items())
+        if len(block.encode("utf-8")) > self.grubenv_size:
+            raise BootLoaderError("grub environment block too big")
+
+        block += "#" * (self.grubenv_size - len(block.encode("utf-8")))
+        with open(env_path, "w") as f:
+            f.write(block)
+
+    def write_config_post(self):
+        """ Make the default image the saved entry. """
+        if self.default is None:
+            return
+
+        try:
+            self.write_grubenv(saved_entry=self.image_title(self.default))
+        except (BootLoaderError, OSError) as e:
+            log.error("failed to set default menu entry to %s: %s", productName, e)
+
     def write_config(self):
         self.write_config_console(None)
         # See if we have a password and if so update the boot args before we
@@ -1560,6 +1782,12 @@ class GRUB2(GRUB):
         except (BootLoaderError, OSError, RuntimeError) as e:
             log.error("boot loader password setup failed: %s", e)
 
+        # With just this system to boot there's nothing grub2-mkconfig (or
+        # os-prober) could add to the configuration, so write it directly
+        if self._can_write_native_config():
+            super(GRUB, self).write_config()
+            return
+
         # make sure the default entry is the OS we are installing
         if self.default is not None:
             # find the index of the default image
@@ -1692,6 +1920,13 @@ class EFIGRUB(GRUB2):
         super(EFIGRUB, self).__init__()
         self.efi_dir = 'BOOT'
 
+    @property
+    def linux_commands(self):
+        if arch.isX86():
+            return ("linuxefi", "initrdefi")
+        else:
+            return ("linux", "initrd")
+
     def efibootmgr(self, *args, **kwargs):
         if flags.imageInstall or flags.dirInstall:
             log.info("Skipping efibootmgr for image/directory install.")
@@ -2016,6 +2251,9 @@ class IPSeriesGRUB2(GRUB2):
     stage2_bootable = False
     terminal_type = "ofconsole"
 
+    # The terminfo and os-prober settings of the defaults file need grub2-mkconfig
+    native_config = False
+
     #
     # installation
     #
@@ -2333,20 +2571,16 @@ def writeSysconfigKernel(storage, version, instClass):
             return
 
     try:
-        import rpm
+        owners = sysrootRpmDB.fileOwners(kernel_file)
     except ImportError:
         log.error("failed to import rpm python module")
         return
 
-    ts = rpm.TransactionSet(iutil.getSysroot())
-    mi = ts.dbMatch('basenames', kernel_file)
-    try:
-        h = next(mi)
-    except StopIteration:
+    if not owners:
         log.error("failed to get package name for default kernel")
         return
 
-    kernel = h.name
+    kernel = owners[0].name
 
     f = open(iutil.getSysroot() + "/etc/sysconfig/kernel", "w+")
     f.write("# UPDATEDEFAULT specifies if new-kernel-pkg should make\n"
@@ -2365,6 +2599,41 @@ def writeSysconfigKernel(storage, version, instClass):
         f.write("HYPERVISOR_ARGS=logging=vga,serial,memory\n")
     f.close()
 
+def otherOSDevices(storage):
+    """ Return the devices that could contain another operating system.
+
+        Those are the formatted devices that the installed system doesn't use,
+        on any disk, as os-prober looks at all of them, including the hidden
+        ones. Returns None if that can't be told because some of the ignored
+        disks are not known to the devicetree.
+    """
+    devicetree = storage.devicetree
+    candidates = list(devicetree.devices) + list(getattr(devicetree, "_hidden", []))
+
+    names = set(d.name for d in candidates)
+    ignored = getattr(getattr(storage, "config", None), "ignoredDisks", None) or []
+    unknown = [name for name in ignored if name not in names]
+    if unknown:
+        log.debug("ignored disks %s are not in the devicetree", unknown)
+        return None
+
+    used = set()
+    for device in chain(storage.mountpoints.values(), storage.swaps):
+        used.add(device)
+        used.update(device.ancestors)
+
+    ignored_formats = ["disklabel", "biosboot", "prepboot", "swap", "lvmpv", "mdmember",
+                       "iso9660", "squashfs"]
+    devices = []
+    for device in candidates:
+        if device in used or device in devices or not device.format.type or \
+           device.format.type in ignored_formats:
+            continue
+        devices.append(device)
+
+    log.debug("devices that may contain another OS: %s", [d.name for d in devices])
+    return devices
+
 def writeBootLoaderFinal(storage, payload, instClass, ksdata):
     """ Do the final write of the bootloader. """
 
@@ -2372,6 +2641,9 @@ def writeBootLoaderFinal(storage, payload, instClass, ksdata):
     # XXX FIXME: do this from elsewhere?
     storage.bootloader.set_boot_args(storage=storage,
                                      payload=payload)
+
+    if isinstance(storage.bootloader, GRUB2):
+        storage.bootloader.other_os_devices = otherOSDevices(storage)
     try:
         storage.bootloader.write()
     except BootLoaderError as e:
@@ -96,6 +96,10 @@ THREAD_INPUT_BASENAME = "AnaInputThread"
 THREAD_SYNC_TIME_BASENAME = "AnaSyncTime"
 THREAD_EXCEPTION_HANDLING_TEST = "AnaExceptionHandlingTest"
 THREAD_LIVE_PROGRESS = "AnaLiveProgressThread"
+THREAD_LIVE_DOWNLOAD = "AnaLiveDownloadThread"
+THREAD_REPO_PROBE = "AnaRepoProbeThread"
+THREAD_REPO_LOAD = "AnaRepoLoadThread"
+THREAD_DD_CREATEREPO = "AnaDDCreaterepoThread"
 THREAD_SOFTWARE_WATCHER = "AnaSoftwareWatcher"
 THREAD_CHECK_SOFTWARE = "AnaCheckSoftwareThread"
 THREAD_SOURCE_WATCHER = "AnaSourceWatcher"
@@ -110,6 +114,9 @@ THREAD_TIME_INIT = "AnaTimeInitThread"
 THREAD_DASDFMT = "AnaDasdfmtThread"
 THREAD_KEYBOARD_INIT = "AnaKeyboardThread"
 THREAD_ADD_LAYOUTS_INIT = "AnaAddLayoutsInitThread"
+THREAD_PASSWORD_QUALITY = "AnaPasswordQualityThread"
+THREAD_RESCUE_UNLOCK = "AnaRescueUnlockThread"
+THREAD_RESCUE_PROBE = "AnaRescueProbeThread"
 
 # Geolocation constants
 
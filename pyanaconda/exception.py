@@ -25,14 +25,18 @@ from meh import Config
 from meh.handler import ExceptionHandler
 from meh.dump import ReverseExceptionDump
 from pyanaconda import iutil, kickstart
+from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
 import sys
 import os
 import shutil
+import subprocess
+import threading
 import time
 import re
 import errno
 import glob
 import traceback
+from collections import OrderedDict
 import blivet.errors
 from pyanaconda.errors import CmdlineError
 from pyanaconda.ui.communication import hubQ
@@ -50,6 +54,77 @@ from gi.repository import GLib
 import logging
 log = logging.getLogger("anaconda")
 
+# how long (in seconds) collecting a piece of crash data may take
+CRASH_DATA_TIMEOUT = 30
+
+# logs of the current boot, included in the traceback file if there is no syslog
+JOURNAL_FILE = "/tmp/journal.log"
+
+class CrashDataCollector(object):
+    """
+    Collect the data for the crash reports concurrently.
+
+    All the functions are started when an exception is being handled and the
+    python-meh callbacks only wait for their results, each for at most its
+    timeout since the start. A hung command thus costs its timeout instead of
+    the whole report. Plain daemon threads are used, an exception in an
+    AnacondaThread would run the exception handling again.
+
+    """
+
+    def __init__(self):
+        self._functions = OrderedDict()
+        self._threads = {}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, function, timeout=CRASH_DATA_TIMEOUT):
+        """Add a function collecting a piece of crash data called name."""
+        self._functions[name] = (function, timeout)
+
+    def callback(self, name):
+        """Return a python-meh callback returning the data called name."""
+        return lambda: self.result(name)
+
+    def start(self):
+        """Start collecting everything that is not being collected yet."""
+        with self._lock:
+            for name in self._functions:
+                if name in self._threads:
+                    continue
+                thread = threading.Thread(name="AnaCrashData-%s" % name,
+                                          target=self._collect, args=(name,))
+                thread.daemon = True
+                self._threads[name] = (thread, time.time())
+                thread.start()
+
+    def _collect(self, name):
+        start = time.time()
+        try:
+            self._results[name] = self._functions[name][0]()
+        except Exception as e: # pylint: disable=broad-except
+            log.error("Failed to collect %s: %s", name, e)
+            self._results[name] = "Failed to collect %s: %s" % (name, e)
+        log.debug("Collected %s in %.2f seconds", name, time.time() - start)
+
+    def result(self, name):
+        """Wait for the data called name and return it."""
+        self.start()
+        (thread, started) = self._threads[name]
+        timeout = self._functions[name][1]
+        thread.join(max(started + timeout - time.time(), 0))
+        if thread.is_alive():
+            log.error("Collecting %s timed out after %s seconds", name, timeout)
+            return "Timed out after %s seconds" % timeout
+        return self._results[name]
+
+    def wait(self):
+        """Wait for all the data, each piece at most for its timeout."""
+        for name in self._functions:
+            self.result(name)
+
+crash_data = CrashDataCollector()
+
 class AnacondaExceptionHandler(ExceptionHandler):
 
     def __init__(self, confObj, intfClass, exnClass, tty_num, gui_lock, interactive):
@@ -88,6 +163,8 @@ class AnacondaExceptionHandler(ExceptionHandler):
         elif isinstance(value, blivet.errors.UnusableConfigurationError):
             sys.exit(0)
         else:
+            # the data files have to be complete before they are dumped
+            crash_data.wait()
             super(AnacondaExceptionHandler, self).handleException(dump_info)
             return False
 
@@ -105,6 +182,9 @@ class AnacondaExceptionHandler(ExceptionHandler):
         exception_lines = traceback.format_exception(*dump_info.exc_info)
         log.critical("\n".join(exception_lines))
 
+        # start collecting the crash data while deciding what to do
+        crash_data.start()
+
         ty = dump_info.exc_info.type
         value = dump_info.exc_info.value
 
@@ -233,6 +313,11 @@ def initExceptionHandling(anaconda):
 
     if os.path.exists("/tmp/syslog"):
         fileList.extend(["/tmp/syslog"])
+    else:
+        # no syslog, grab output from journalctl and put it also to the
+        # anaconda-tb file
+        crash_data.add("journalctl", journalctl_callback)
+        fileList.extend([JOURNAL_FILE])
 
     if anaconda.opts and anaconda.opts.ksfile:
         fileList.extend([anaconda.opts.ksfile])
@@ -260,17 +345,15 @@ def initExceptionHandling(anaconda):
                   localSkipList=["passphrase", "password", "_oldweak", "_password", "try_passphrase"],
                   fileList=fileList)
 
-    conf.register_callback("lsblk_output", lsblk_callback, attchmnt_only=True)
-    conf.register_callback("nmcli_dev_list", nmcli_dev_list_callback,
+    crash_data.add("lsblk_output", lsblk_callback)
+    crash_data.add("nmcli_dev_list", nmcli_dev_list_callback)
+    conf.register_callback("lsblk_output", crash_data.callback("lsblk_output"),
+                           attchmnt_only=True)
+    conf.register_callback("nmcli_dev_list", crash_data.callback("nmcli_dev_list"),
                            attchmnt_only=True)
     conf.register_callback("type", lambda: "anaconda", attchmnt_only=True)
     conf.register_callback("addons", list_addons_callback, attchmnt_only=False)
 
-    if "/tmp/syslog" not in fileList:
-        # no syslog, grab output from journalctl and put it also to the
-        # anaconda-tb file
-        conf.register_callback("journalctl", journalctl_callback, attchmnt_only=False)
-
     interactive = not anaconda.displayMode == 'c'
     handler = AnacondaExceptionHandler(conf, anaconda.intf.meh_interface,
                                        ReverseExceptionDump, anaconda.intf.tty_num,
@@ -279,29 +362,46 @@ def initExceptionHandling(anaconda):
 
     return conf
 
+def _capture_output(command, argv, timeout=CRASH_DATA_TIMEOUT):
+    """Like iutil.execWithCapture, but kill the command after timeout seconds."""
+
+    proc = iutil.startProgram([command] + argv)
+    try:
+        out = proc.communicate(timeout=timeout)[0]
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        # reap it, crash reporting may go on for a while
+        proc.communicate()
+        raise
+    return out.decode("utf-8", "replace")
+
 def lsblk_callback():
     """Callback to get info about block devices."""
 
-    return iutil.execWithCapture("lsblk", ["--perms", "--fs", "--bytes"])
+    return _capture_output("lsblk", ["--perms", "--fs", "--bytes"])
 
 def nmcli_dev_list_callback():
     """Callback to get info about network devices."""
 
-    return iutil.execWithCapture("nmcli", ["device", "show"])
+    return _capture_output("nmcli", ["device", "show"])
 
 def journalctl_callback():
-    """Callback to get logs from journalctl."""
+    """Callback to save the logs from journalctl to JOURNAL_FILE.
+
+    The lines are written as they come, the file is put to the traceback
+    file from there.
+    """
 
     # regex to filter log messages from anaconda's process (we have that in our
     # logs)
     anaconda_log_line = re.compile(r"\[%d\]:" % os.getpid())
-    ret = ""
-    for line in iutil.execReadlines("journalctl", ["-b"]):
-        if anaconda_log_line.search(line) is None:
-            # not an anaconda's message
-            ret += line + "\n"
+    with open(JOURNAL_FILE, "w") as f:
+        for line in iutil.execReadlines("journalctl", ["-b"]):
+            if anaconda_log_line.search(line) is None:
+                # not an anaconda's message
+                f.write(line + "\n")
 
-    return ret
+    return JOURNAL_FILE
 
 def list_addons_callback():
     """
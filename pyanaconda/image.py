@@ -20,6 +20,7 @@
 from pyanaconda import isys
 import os, os.path, stat, tempfile
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
+from pyanaconda.iso9660 import ISO9660Image, ISO9660Error
 
 from pyanaconda.errors import errorHandler, ERROR_RAISE, InvalidImageSizeError, MissingImageError
 
@@ -32,6 +33,85 @@ log = logging.getLogger("anaconda")
 
 _arch = blivet.arch.getArch()
 
+# Results of probing ISO images, keyed by (path, size, mtime) so an image
+# that has been replaced gets probed again.
+_iso_probe_cache = {}
+
+def _parseDiscArch(discinfo):
+    """ Return the architecture line of a .discinfo file's contents """
+    lines = discinfo.splitlines()
+    # skip timestamp and release description
+    if len(lines) < 3:
+        return None
+    return lines[2].strip()
+
+def _probeIsoImageMount(what):
+    """ Probe an image by loop-mounting it
+
+        Only used for images the in-process reader can't handle.
+
+        :returns: (architecture, has_repodata) or None if the image isn't usable
+    """
+    log.debug("mounting %s on /mnt/install/cdimage", what)
+    try:
+        blivet.util.mount(what, "/mnt/install/cdimage", fstype="iso9660", options="ro")
+    except OSError:
+        return None
+
+    try:
+        if not os.access("/mnt/install/cdimage/.discinfo", os.R_OK):
+            return None
+
+        with open("/mnt/install/cdimage/.discinfo") as f:
+            discArch = _parseDiscArch(f.read())
+        return (discArch, os.access("/mnt/install/cdimage/repodata", os.R_OK))
+    finally:
+        blivet.util.umount("/mnt/install/cdimage")
+
+def probeIsoImage(what):
+    """ Read the .discinfo architecture of an ISO image and check for repodata
+
+        The image is read directly with the ISO9660 reader instead of being
+        mounted. Results are cached by path, size and modification time.
+
+        :param str what: path to the image
+        :returns: (architecture, has_repodata) or None if the image isn't
+                  an install image
+    """
+    try:
+        st = os.stat(what)
+    except OSError:
+        return None
+
+    if not stat.S_ISREG(st.st_mode):
+        return None
+
+    key = (what, st.st_size, st.st_mtime)
+    if key in _iso_probe_cache:
+        return _iso_probe_cache[key]
+
+    result = None
+    try:
+        with ISO9660Image(what) as iso:
+            if iso.exists(".discinfo"):
+                log.debug("Reading .discinfo")
+                discArch = _parseDiscArch(iso.read(".discinfo").decode("utf-8", "replace"))
+                result = (discArch, iso.isdir("repodata"))
+    except ISO9660Error as e:
+        if isys.isIsoImage(what):
+            log.info("Failed to read %s directly (%s), mounting it", what, e)
+            result = _probeIsoImageMount(what)
+            # a failed mount may work next time, don't remember it
+            if result is None:
+                return None
+    except OSError as e:
+        # I/O errors may be transient, try again on the next probe
+        log.debug("Failed to read %s: %s", what, e)
+        return None
+
+    _iso_probe_cache[key] = result
+    return result
+
 def findFirstIsoImage(path):
     """
     Find the first iso image in path
@@ -55,38 +135,21 @@ def findFirstIsoImage(path):
     for fn in files:
         what = path + '/' + fn
         log.debug("Checking %s", what)
-        if not isys.isIsoImage(what):
+        probe = probeIsoImage(what)
+        if not probe:
             continue
 
-        log.debug("mounting %s on /mnt/install/cdimage", what)
-        try:
-            blivet.util.mount(what, "/mnt/install/cdimage", fstype="iso9660", options="ro")
-        except OSError:
-            continue
-
-        if not os.access("/mnt/install/cdimage/.discinfo", os.R_OK):
-            blivet.util.umount("/mnt/install/cdimage")
-            continue
-
-        log.debug("Reading .discinfo")
-        f = open("/mnt/install/cdimage/.discinfo")
-        f.readline() # skip timestamp
-        f.readline() # skip release description
-        discArch = f.readline().strip() # read architecture
-        f.close()
-
+        (discArch, hasRepodata) = probe
         log.debug("discArch = %s", discArch)
         if discArch != arch:
             log.warning("findFirstIsoImage: architectures mismatch: %s, %s",
                         discArch, arch)
-            blivet.util.umount("/mnt/install/cdimage")
             continue
 
         # If there's no repodata, there's no point in trying to
         # install from it.
-        if not os.access("/mnt/install/cdimage/repodata", os.R_OK):
+        if not hasRepodata:
             log.warning("%s doesn't have repodata, skipping", what)
-            blivet.util.umount("/mnt/install/cdimage")
             continue
 
         # warn user if images appears to be wrong size
@@ -97,7 +160,6 @@ def findFirstIsoImage(path):
                 raise exn
 
         log.info("Found disc at %s", fn)
-        blivet.util.umount("/mnt/install/cdimage")
         return fn
 
     return None
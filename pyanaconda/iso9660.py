@@ -0,0 +1,281 @@
+#
+# iso9660.py - read files from ISO9660 images without mounting them
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""A minimal read-only ISO9660 directory reader.
+
+   This is just enough to look at a few small files (.discinfo, .treeinfo)
+   and check for directories (repodata) on an install image without having
+   to loop-mount it. Joliet and Rock Ridge names are used when present, since
+   plain ISO9660 names mangle the leading dot of .discinfo and friends.
+"""
+
+import struct
+from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
+
+import logging
+log = logging.getLogger("anaconda")
+
+ISO_BLOCK_SIZE = 2048
+
+# Volume descriptors start at this sector
+_VD_START = 16
+_VD_PRIMARY = 1
+_VD_SUPPLEMENTARY = 2
+_VD_TERMINATOR = 255
+
+_JOLIET_ESCAPES = (b"%/@", b"%/C", b"%/E")
+
+_FLAG_DIRECTORY = 0x02
+
+class ISO9660Error(Exception):
+    pass
+
+class _DirEntry(object):
+    """A single directory record."""
+    def __init__(self, name, extent, size, is_dir):
+        self.name = name
+        self.extent = extent
+        self.size = size
+        self.is_dir = is_dir
+
+class ISO9660Image(object):
+    """Read-only access to the directory tree of an ISO9660 image.
+
+       Use it as a context manager so the image file gets closed:
+
+           with ISO9660Image("/path/to/image.iso") as iso:
+               if iso.isdir("repodata"):
+                   discinfo = iso.read(".discinfo")
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._dir_cache = {}
+        self._joliet = False
+        self._rock_ridge_skip = None
+
+        try:
+            self._root = self._read_volume_descriptors()
+        except (ISO9660Error, OSError, struct.error):
+            self.close()
+            raise
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _read_block(self, block, count=1):
+        self._file.seek(block * ISO_BLOCK_SIZE)
+        return self._file.read(count * ISO_BLOCK_SIZE)
+
+    def _read_extent(self, extent, size):
+        self._file.seek(extent * ISO_BLOCK_SIZE)
+        data = self._file.read(size)
+        if len(data) != size:
+            raise ISO9660Error("%s is truncated" % self.path)
+        return data
+
+    def _read_volume_descriptors(self):
+        """Find the root directory record, preferring the Joliet tree."""
+        primary = None
+        joliet = None
+
+        block = _VD_START
+        while True:
+            vd = self._read_block(block)
+            if len(vd) < ISO_BLOCK_SIZE or vd[1:6] != b"CD001":
+                break
+
+            vd_type = vd[0]
+            if vd_type == _VD_TERMINATOR:
+                break
+            elif vd_type == _VD_PRIMARY and primary is None:
+                primary = self._parse_record(vd[156:190])
+            elif vd_type == _VD_SUPPLEMENTARY and vd[88:91] in _JOLIET_ESCAPES:
+                joliet = self._parse_record(vd[156:190])
+            block += 1
+
+        if primary is None:
+            raise ISO9660Error("%s is not an ISO9660 image" % self.path)
+
+        if joliet is not None:
+            self._joliet = True
+            return joliet
+
+        # No Joliet, look for Rock Ridge in the root's "." entry
+        root_data = self._read_extent(primary.extent, ISO_BLOCK_SIZE)
+        self._rock_ridge_skip = self._find_susp(root_data)
+        return primary
+
+    @staticmethod
+    def _parse_record(record):
+        """Parse the fixed part of a directory record."""
+        extent, = struct.unpack_from("<I", record, 2)
+        size, = struct.unpack_from("<I", record, 10)
+        return _DirEntry(None, extent, size, bool(record[25] & _FLAG_DIRECTORY))
+
+    @staticmethod
+    def _system_use(record):
+        """Return the system use area of a directory record."""
+        name_len = record[32]
+        start = 33 + name_len
+        if not name_len % 2:
+            start += 1
+        return record[start:record[0]]
+
+    def _find_susp(self, root_data):
+        """Return the SUSP skip length if the image uses Rock Ridge, else None."""
+        record = root_data[:root_data[0]]
+        su = self._system_use(record)
+        if len(su) >= 7 and su[0:2] == b"SP" and su[4:6] == b"\xbe\xef":
+            return su[6]
+        return None
+
+    def _rock_ridge_name(self, record):
+        """Return the Rock Ridge NM name of a record or None."""
+        su = self._system_use(record)[self._rock_ridge_skip:]
+        name = b""
+        found = False
+
+        while su:
+            pos = 0
+            continuation = None
+            while pos + 4 <= len(su):
+                sig = su[pos:pos + 2]
+                length = su[pos + 2]
+                if length < 4:
+                    break
+                if sig == b"NM":
+                    flags = su[pos + 4]
+                    name += su[pos + 5:pos + length]
+                    found = True
+                    if not flags & 0x01:
+                        return name.decode("utf-8", "replace")
+                elif sig == b"CE":
+                    block, = struct.unpack_from("<I", su, pos + 4)
+                    offset, = struct.unpack_from("<I", su, pos + 12)
+                    ce_len, = struct.unpack_from("<I", su, pos + 20)
+                    continuation = (block, offset, ce_len)
+                elif sig == b"ST":
+                    break
+                pos += length
+
+            if continuation is None:
+                break
+            block, offset, ce_len = continuation
+            self._file.seek(block * ISO_BLOCK_SIZE + offset)
+            su = self._file.read(ce_len)
+
+        if found:
+            return name.decode("utf-8", "replace")
+        return None
+
+    def _record_name(self, record):
+        raw = record[33:33 + record[32]]
+        if self._joliet:
+            name = raw.decode("utf-16-be", "replace")
+        else:
+            name = None
+            if self._rock_ridge_skip is not None:
+                name = self._rock_ridge_name(record)
+            if name is None:
+                name = raw.decode("ascii", "replace")
+
+        # Strip the ISO9660 version and the empty extension separator
+        if not self._joliet or ";" in name:
+            name = name.split(";")[0]
+            if name.endswith("."):
+                name = name[:-1]
+        return name
+
+    def _list(self, entry):
+        """Return the {name: _DirEntry} dict for a directory entry."""
+        if entry.extent in self._dir_cache:
+            return self._dir_cache[entry.extent]
+
+        data = self._read_extent(entry.extent, entry.size)
+        entries = {}
+        pos = 0
+        while pos < len(data):
+            length = data[pos]
+            if length == 0:
+                # Records don't cross sector boundaries, skip the padding
+                pos = (pos // ISO_BLOCK_SIZE + 1) * ISO_BLOCK_SIZE
+                continue
+
+            record = data[pos:pos + length]
+            pos += length
+            if record[32] == 1 and record[33] in (0, 1):
+                # "." and ".."
+                continue
+
+            child = self._parse_record(record)
+            child.name = self._record_name(record)
+            entries[child.name] = child
+
+        self._dir_cache[entry.extent] = entries
+        return entries
+
+    def _lookup(self, path):
+        entry = self._root
+        for part in (p for p in path.split("/") if p):
+            if not entry.is_dir:
+                return None
+            entries = self._list(entry)
+            if part in entries:
+                entry = entries[part]
+            elif not (self._joliet or self._rock_ridge_skip is not None):
+                # plain ISO9660 names are upper case
+                entry = entries.get(part.upper())
+                if entry is None:
+                    return None
+            else:
+                return None
+        return entry
+
+    def exists(self, path):
+        """Return True if path exists in the image."""
+        return self._lookup(path) is not None
+
+    def isdir(self, path):
+        """Return True if path is a directory in the image."""
+        entry = self._lookup(path)
+        return entry is not None and entry.is_dir
+
+    def listdir(self, path="/"):
+        """Return the names of the entries in the directory path."""
+        entry = self._lookup(path)
+        if entry is None or not entry.is_dir:
+            raise ISO9660Error("%s: no such directory in %s" % (path, self.path))
+        return list(self._list(entry).keys())
+
+    def read(self, path):
+        """Return the contents of the file path as bytes."""
+        entry = self._lookup(path)
+        if entry is None or entry.is_dir:
+            raise ISO9660Error("%s: no such file in %s" % (path, self.path))
+        return self._read_extent(entry.extent, entry.size)
@@ -33,8 +33,10 @@ import tempfile
 import re
 from urllib.parse import quote, unquote
 import gettext
+import select
 import signal
 import sys
+import time
 
 import requests
 from requests_file import FileAdapter
@@ -231,9 +233,16 @@ def startX(argv, output_redirect=None):
     def sigusr1_preexec():
         signal.signal(signal.SIGUSR1, signal.SIG_IGN)
 
+    # Python runs the handlers between bytecodes, so a SIGUSR1 arriving right
+    # before signal.pause() would leave us waiting for the alarm. A byte is
+    # written to the wakeup fd as soon as a signal arrives, wait for that.
+    (wakeup_r, wakeup_w) = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+    old_wakeup_fd = None
+    start = time.time()
     try:
         old_sigusr1_handler = signal.signal(signal.SIGUSR1, sigusr1_handler)
         old_sigalrm_handler = signal.signal(signal.SIGALRM, sigalrm_handler)
+        old_wakeup_fd = signal.set_wakeup_fd(wakeup_w)
 
         # Start the timer
         signal.alarm(60)
@@ -244,13 +253,19 @@ def startX(argv, output_redirect=None):
 
         # Wait for SIGUSR1
         while not x11_started[0]:
-            signal.pause()
+            eintr_retry_call(select.select, [wakeup_r], [], [])
+            eintr_retry_call(os.read, wakeup_r, 64)
 
+        log.info("%s is ready after %.2f seconds", argv[0], time.time() - start)
     finally:
         # Put everything back where it was
         signal.alarm(0)
+        if old_wakeup_fd is not None:
+            signal.set_wakeup_fd(old_wakeup_fd)
         signal.signal(signal.SIGUSR1, old_sigusr1_handler)
         signal.signal(signal.SIGALRM, old_sigalrm_handler)
+        eintr_ignore(os.close, wakeup_r)
+        eintr_ignore(os.close, wakeup_w)
 
 def _run_program(argv, root='/', stdin=None, stdout=None, env_prune=None, log_output=True,
         binary_output=False, filter_stderr=False):
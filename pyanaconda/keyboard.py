@@ -29,6 +29,7 @@ mutually converting X layouts and VConsole keymaps.
 import os
 import re
 import shutil
+import threading
 
 from pyanaconda import iutil
 from pyanaconda import safe_dbus
@@ -48,6 +49,14 @@ LOCALED_SERVICE = "org.freedesktop.locale1"
 LOCALED_OBJECT_PATH = "/org/freedesktop/locale1"
 LOCALED_IFACE = "org.freedesktop.locale1"
 
+# systemd's table of VConsole keymaps and the matching X11 configurations
+KBD_MODEL_MAP = "/usr/share/systemd/kbd-model-map"
+
+# directories with VConsole keymaps generated from X layouts, named
+# 'layout' or 'layout-variant'
+XKB_KEYMAP_DIRS = ["/usr/share/keymaps/xkb", "/usr/share/kbd/keymaps/xkb",
+                   "/usr/lib/kbd/keymaps/xkb"]
+
 # should match and parse strings like 'cz' or 'cz (qwerty)' regardless of white
 # space
 LAYOUT_VARIANT_RE = re.compile(r'^\s*([/\w]+)\s*' # layout plus
@@ -126,14 +135,13 @@ def normalize_layout_variant(layout_str):
 def populate_missing_items(keyboard):
     """
     Function that populates keyboard.vc_keymap and keyboard.x_layouts if they
-    are missing. By invoking LocaledWrapper's methods this function READS AND
-    WRITES CONFIGURATION FILES (but tries to keep their content unchanged).
+    are missing. The conversions don't change any configuration.
 
     :type keyboard: ksdata.keyboard object
 
     """
 
-    localed = LocaledWrapper()
+    localed = get_localed_wrapper()
 
     if keyboard._keyboard and not (keyboard.vc_keymap or keyboard.x_layouts):
         # we were given just a value in the old format, use it as a vc_keymap
@@ -183,7 +191,7 @@ def write_keyboard_config(keyboard, root, convert=True):
         errors.append("Cannot create directory xorg.conf.d")
 
     if keyboard.x_layouts:
-        localed_wrapper = LocaledWrapper()
+        localed_wrapper = get_localed_wrapper()
 
         if root != "/":
             # writing to a different root, we need to save these values, so that
@@ -217,17 +225,17 @@ def write_keyboard_config(keyboard, root, convert=True):
                                         options)
         else:
             try:
-                # just let systemd-localed write out the conf file
-                localed_wrapper.set_layouts(keyboard.x_layouts,
-                                            keyboard.switch_options)
+                # just let systemd-localed write out the conf files
+                localed_wrapper.set_keyboard(keyboard.vc_keymap, keyboard.x_layouts,
+                                             keyboard.switch_options)
             except InvalidLayoutVariantSpec as ilvs:
                 # some weird value appeared as a requested X layout
                 log.error("Failed to write out config file: %s", ilvs)
 
                 # try default
                 keyboard.x_layouts = [DEFAULT_KEYBOARD]
-                localed_wrapper.set_layouts(keyboard.x_layouts,
-                                            keyboard.switch_options)
+                localed_wrapper.set_keyboard(keyboard.vc_keymap, keyboard.x_layouts,
+                                             keyboard.switch_options)
 
     if keyboard.vc_keymap:
         try:
@@ -279,7 +287,7 @@ def activate_keyboard(keyboard):
 
     """
 
-    localed = LocaledWrapper()
+    localed = get_localed_wrapper()
     c_lays_vars = []
     c_keymap = ""
 
@@ -300,8 +308,9 @@ def activate_keyboard(keyboard):
                         keyboard.vc_keymap)
             keyboard.vc_keymap = None
         else:
-            # activate VConsole keymap and get converted layout and variant
-            converted = localed.set_and_convert_keymap(keyboard.vc_keymap)
+            # get converted layout and variant, the keymap is set below
+            # together with the layouts
+            converted = localed.convert_keymap(keyboard.vc_keymap)
 
             # localed may give us multiple comma-separated layouts+variants
             c_lays_vars = converted.split(",")
@@ -317,7 +326,7 @@ def activate_keyboard(keyboard):
             keyboard.x_layouts.append(keyboard.vc_keymap)
 
     if keyboard.x_layouts:
-        c_keymap = localed.set_and_convert_layout(keyboard.x_layouts[0])
+        c_keymap = localed.convert_layout(keyboard.x_layouts[0])
 
         if not keyboard.vc_keymap:
             keyboard.vc_keymap = c_keymap
@@ -325,6 +334,156 @@ def activate_keyboard(keyboard):
         # write out keyboard configuration for the X session
         write_keyboard_config(keyboard, root="/", convert=False)
 
+class KbdModelMapEntry(object):
+    """One line of the kbd-model-map, "-" fields are empty strings."""
+
+    def __init__(self, keymap, layouts, model, variants, options):
+        self.keymap = keymap
+        self.layouts = layouts
+        self.model = model
+        self.variants = variants
+        self.options = options
+
+    @property
+    def layouts_variants(self):
+        """The X layouts as comma-separated 'layout (variant)' specifications."""
+
+        layouts = self.layouts.split(",")
+        variants = self.variants.split(",") if self.variants else []
+        variants.extend((len(layouts) - len(variants)) * [""])
+        return ",".join(join_layout_variant(layout, variant)
+                        for layout, variant in zip(layouts, variants))
+
+class KeymapConverter(object):
+    """
+    Class converting VConsole keymaps and X layouts to each other the same way
+    systemd-localed does, without asking (and reconfiguring) systemd-localed.
+    The tables are read only once, on the first conversion.
+
+    """
+
+    def __init__(self, model_map=KBD_MODEL_MAP, keymap_dirs=None):
+        self._model_map = model_map
+        self._keymap_dirs = keymap_dirs if keymap_dirs is not None else XKB_KEYMAP_DIRS
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._by_keymap = {}
+        self._by_layout = {}
+        self._xkb_keymaps = set()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+
+            try:
+                with open(self._model_map, "r") as f:
+                    for line in f:
+                        fields = line.split()
+                        if len(fields) < 5 or fields[0].startswith("#"):
+                            continue
+                        entry = KbdModelMapEntry(*("" if field == "-" else field
+                                                   for field in fields[:5]))
+                        self._by_keymap.setdefault(entry.keymap, entry)
+                        first_layout = entry.layouts.split(",")[0]
+                        self._by_layout.setdefault(first_layout, []).append(entry)
+            except IOError as ioerr:
+                log.error("Failed to read %s: %s", self._model_map, ioerr)
+
+            for keymap_dir in self._keymap_dirs:
+                try:
+                    names = os.listdir(keymap_dir)
+                except OSError:
+                    continue
+                for name in names:
+                    for suffix in (".map", ".map.gz"):
+                        if name.endswith(suffix):
+                            self._xkb_keymaps.add(name[:-len(suffix)])
+
+            self._loaded = True
+
+    def convert_keymap(self, keymap):
+        """
+        Return the X layouts and variants matching the given keymap.
+
+        :param keymap: VConsole keymap
+        :type keymap: str
+        :return: comma-separated 'layout (variant)' specifications or "" if
+                 there is no X configuration for the keymap
+        :rtype: str
+
+        """
+
+        self._load()
+        entry = self._by_keymap.get(keymap)
+        if entry is None:
+            return ""
+
+        return entry.layouts_variants
+
+    def convert_layout(self, layout_variant):
+        """
+        Return the VConsole keymap matching the given layout and variant.
+
+        A keymap generated from the layout is preferred, then the kbd-model-map
+        entry matching the most of the layout, variant and options.
+
+        :param layout_variant: 'layout (variant)' or 'layout' specification
+        :type layout_variant: str
+        :return: a keymap matching layout and variant best or ""
+        :rtype: str
+        :raise InvalidLayoutVariantSpec: if layout_variant is not valid
+
+        """
+
+        self._load()
+        (layout, variant) = parse_layout_variant(layout_variant)
+
+        name = "%s-%s" % (layout, variant) if variant else layout
+        if name in self._xkb_keymaps:
+            return name
+
+        best_keymap = ""
+        best_score = 0
+        for entry in self._by_layout.get(layout, []):
+            if entry.layouts == layout:
+                score = 10
+            else:
+                score = 1
+
+            # no X model is given, so all models match
+            score += 1
+            if entry.variants == variant:
+                score += 1
+                # no X options are given
+                if not entry.options:
+                    score += 1
+
+            if score > best_score:
+                best_keymap = entry.keymap
+                best_score = score
+
+        return best_keymap
+
+# the converter used by LocaledWrapper
+keymap_converter = KeymapConverter()
+
+_localed_wrapper = None
+_localed_wrapper_lock = threading.Lock()
+
+def get_localed_wrapper():
+    """
+    Return the LocaledWrapper shared by the functions of this module, so that
+    they use one connection and one copy of systemd-localed's properties.
+
+    """
+
+    global _localed_wrapper
+    with _localed_wrapper_lock:
+        if _localed_wrapper is None:
+            _localed_wrapper = LocaledWrapper()
+        return _localed_wrapper
+
 class LocaledWrapperError(KeyboardConfigError):
     """Exception class for reporting Localed-related problems"""
     pass
@@ -336,65 +495,101 @@ class LocaledWrapper(object):
 
     """
 
-    def __init__(self):
-        try:
-            self._connection = safe_dbus.get_new_system_connection()
-        except GLib.GError as e:
-            if can_touch_runtime_system("raise GLib.GError", touch_live=True):
-                raise
+    def __init__(self, connection=None):
+        """
+        :param connection: connection to the bus with systemd-localed, a new
+                           system bus connection is used if None
+        :type connection: Gio.DBusConnection
 
-            log.error("Failed to get safe_dbus connection: %s", e)
-            self._connection = None
+        """
 
-    @property
-    def keymap(self):
-        try:
-            keymap = safe_dbus.get_property_sync(LOCALED_SERVICE,
-                                                 LOCALED_OBJECT_PATH,
-                                                 LOCALED_IFACE,
-                                                 "VConsoleKeymap",
-                                                 self._connection)
-        except (safe_dbus.DBusPropertyError, safe_dbus.DBusCallError):
+        self._connection = connection
+        if self._connection is None:
+            try:
+                self._connection = safe_dbus.get_new_system_connection()
+            except GLib.GError as e:
+                if can_touch_runtime_system("raise GLib.GError", touch_live=True):
+                    raise
+
+                log.error("Failed to get safe_dbus connection: %s", e)
+
+        # values of all the properties, fetched at once and kept up to date
+        # by the PropertiesChanged signal
+        self._properties = None
+        self._properties_lock = threading.Lock()
+        if self._connection is not None:
+            safe_dbus.subscribe_properties_changed(LOCALED_SERVICE, LOCALED_OBJECT_PATH,
+                                                   self._on_properties_changed,
+                                                   self._connection)
+
+    def _on_properties_changed(self, iface, changed, invalidated):
+        if iface != LOCALED_IFACE:
+            return
+
+        with self._properties_lock:
+            if self._properties is None:
+                return
+            if invalidated:
+                # no values given, get all of them next time
+                self._properties = None
+            else:
+                self._properties.update(changed)
+
+    def _invalidate(self):
+        # The changes localed makes (e.g. conversions) are only known from
+        # the signals, which need a running main loop. Read them again.
+        with self._properties_lock:
+            self._properties = None
+
+    def _get_property(self, name):
+        """
+        Return the value of a systemd-localed property or None if it can't
+        be read.
+
+        """
+
+        with self._properties_lock:
+            if self._properties is None:
+                try:
+                    self._properties = safe_dbus.get_properties_sync(LOCALED_SERVICE,
+                                                                     LOCALED_OBJECT_PATH,
+                                                                     LOCALED_IFACE,
+                                                                     self._connection)
+                except (safe_dbus.DBusPropertyError, safe_dbus.DBusCallError) as e:
+                    log.error("Failed to get the systemd-localed's properties: %s", e)
+                    return None
+
+            value = self._properties.get(name)
+
+        if value is None:
             # no value for the property
             log.error("Failed to get the value for the systemd-localed's "
-                      "VConsoleKeymap property")
+                      "%s property", name)
+        return value
+
+    @property
+    def keymap(self):
+        keymap = self._get_property("VConsoleKeymap")
+        if keymap is None:
             return ""
 
-        # returned GVariant is unpacked to a tuple with a single element
-        return keymap[0]
+        return keymap
 
     @property
     def layouts_variants(self):
-        try:
-            layouts = safe_dbus.get_property_sync(LOCALED_SERVICE,
-                                                  LOCALED_OBJECT_PATH,
-                                                  LOCALED_IFACE,
-                                                  "X11Layout",
-                                                  self._connection)
-        except (safe_dbus.DBusPropertyError, safe_dbus.DBusCallError):
-            # no value for the property
-            log.error("Failed to get the value for the systemd-localed's "
-                      "X11Layout property")
+        layouts = self._get_property("X11Layout")
+        if layouts is None:
             return [""]
 
-        try:
-            variants = safe_dbus.get_property_sync(LOCALED_SERVICE,
-                                                   LOCALED_OBJECT_PATH,
-                                                   LOCALED_IFACE,
-                                                   "X11Variant",
-                                                   self._connection)
-        except (safe_dbus.DBusPropertyError, safe_dbus.DBusCallError):
-            # no value for the property
-            log.error("Failed to get the value for the systemd-localed's "
-                      "X11Variant property")
-            variants = []
+        variants = self._get_property("X11Variant")
 
-        # returned GVariants are unpacked to tuples with single elements
-        # containing comma-separated values
-        layouts = layouts[0].split(",")
+        # the values contain comma-separated layouts and variants
+        layouts = layouts.split(",")
 
         if variants:
-            variants = variants[0].split(",")
+            variants = variants.split(",")
+        else:
+            variants = []
 
         # if there are more layouts than variants, empty strings should be appended
         diff = len(layouts) - len(variants)
@@ -403,20 +598,11 @@ class LocaledWrapper(object):
 
     @property
     def options(self):
-        try:
-            options = safe_dbus.get_property_sync(LOCALED_SERVICE,
-                                                  LOCALED_OBJECT_PATH,
-                                                  LOCALED_IFACE,
-                                                  "X11Options",
-                                                  self._connection)
-        except (safe_dbus.DBusPropertyError, safe_dbus.DBusCallError):
-            # no value for the property
-            log.error("Failed to get the value for the systemd-localed's "
-                      "X11Options property")
+        options = self._get_property("X11Options")
+        if options is None:
             return ""
 
-        # returned GVariant is unpacked to a tuple with a single element
-        return options[0]
+        return options
 
     def set_keymap(self, keymap, convert=False):
         """
@@ -441,6 +627,8 @@ class LocaledWrapper(object):
                                 "SetVConsoleKeyboard", args, self._connection)
         except safe_dbus.DBusCallError as e:
             log.error("Failed to set keymap: %s", e)
+        finally:
+            self._invalidate()
 
     def convert_keymap(self, keymap):
         """
@@ -455,11 +643,10 @@ class LocaledWrapper(object):
 
         """
 
-        # hack around systemd's lack of functionality -- no function to just
-        # convert without changing keyboard configuration
-        orig_keymap = self.keymap
-        ret = self.set_and_convert_keymap(keymap)
-        self.set_keymap(orig_keymap)
+        ret = keymap_converter.convert_keymap(keymap)
+        if not ret:
+            # systemd-localed keeps the current layouts for unknown keymaps
+            ret = ",".join(self.layouts_variants)
 
         return ret
 
@@ -494,6 +681,51 @@ class LocaledWrapper(object):
 
         """
 
+        args = self._x11_keyboard_args(layouts_variants, options, convert)
+        try:
+            safe_dbus.call_sync(LOCALED_SERVICE, LOCALED_OBJECT_PATH, LOCALED_IFACE,
+                                "SetX11Keyboard", args, self._connection)
+        except safe_dbus.DBusCallError as e:
+            log.error("Failed to set layouts: %s", e)
+        finally:
+            self._invalidate()
+
+    def set_keyboard(self, keymap, layouts_variants, options=None):
+        """
+        Method that sets both the VConsole keymap and the X11 layouts,
+        variants and options, without any conversions.
+
+        The layouts are checked before anything is changed.
+
+        :param keymap: VConsole keymap that should be set, not changed if empty
+        :type keymap: str
+        :param layout_variant: list of 'layout (variant)' or 'layout'
+                               specifications of layouts and variants
+        :type layout_variant: list of strings
+        :param options: list of X11 options that should be set
+        :type options: list of strings
+        :raise InvalidLayoutVariantSpec: if one of the layouts is not valid
+
+        """
+
+        x11_args = self._x11_keyboard_args(layouts_variants, options, False)
+        try:
+            if keymap:
+                safe_dbus.call_sync(LOCALED_SERVICE, LOCALED_OBJECT_PATH, LOCALED_IFACE,
+                                    "SetVConsoleKeyboard",
+                                    GLib.Variant('(ssbb)', (keymap, "", False, False)),
+                                    self._connection)
+            safe_dbus.call_sync(LOCALED_SERVICE, LOCALED_OBJECT_PATH, LOCALED_IFACE,
+                                "SetX11Keyboard", x11_args, self._connection)
+        except safe_dbus.DBusCallError as e:
+            log.error("Failed to set keyboard configuration: %s", e)
+        finally:
+            self._invalidate()
+
+    @staticmethod
+    def _x11_keyboard_args(layouts_variants, options, convert):
+        """Return the arguments for the SetX11Keyboard method."""
+
         layouts = []
         variants = []
 
@@ -514,13 +746,8 @@ class LocaledWrapper(object):
         # where convert indicates whether the keymap should be converted
         # to X11 layout and user_interaction indicates whether PolicyKit
         # should ask for credentials or not
-        args = GLib.Variant("(ssssbb)", (layouts_str, "", variants_str, opts_str,
+        return GLib.Variant("(ssssbb)", (layouts_str, "", variants_str, opts_str,
                                          convert, False))
-        try:
-            safe_dbus.call_sync(LOCALED_SERVICE, LOCALED_OBJECT_PATH, LOCALED_IFACE,
-                                "SetX11Keyboard", args, self._connection)
-        except safe_dbus.DBusCallError as e:
-            log.error("Failed to set layouts: %s", e)
 
     def set_and_convert_layout(self, layout_variant):
         """
@@ -549,11 +776,5 @@ class LocaledWrapper(object):
 
         """
 
-        # hack around systemd's lack of functionality -- no function to just
-        # convert without changing keyboard configuration
-        orig_layouts_variants = self.layouts_variants
-        ret = self.set_and_convert_layout(layout_variant)
-        self.set_layouts(orig_layouts_variants)
-
-        return ret
+        return keymap_converter.convert_layout(layout_variant)
 
@@ -27,6 +27,8 @@ import langtable
 import locale as locale_mod
 import glob
 from collections import namedtuple
+import functools
+import json
 import sys
 import io
 
@@ -39,6 +41,10 @@ log = logging.getLogger("anaconda")
 
 LOCALE_CONF_FILE_PATH = "/etc/locale.conf"
 
+# Precomputed langtable answers, see build_catalog()
+LANG_CATALOG_FILE_PATH = "/usr/share/anaconda/langcatalog.json"
+LANG_CATALOG_VERSION = 1
+
 SCRIPTS_SUPPORTED_BY_CONSOLE = {'Latn', 'Cyrl', 'Grek'}
 
 #e.g. 'SR_RS.UTF-8@latin'
@@ -57,6 +63,102 @@ class InvalidLocaleSpec(LocalizationConfigError):
 
     pass
 
+class _LanguageCatalog(object):
+    """
+    Cache of langtable query results.
+
+    Language lists redo the same langtable queries for every row they draw,
+    which makes scrolling stutter on slow machines. The results are kept here
+    instead, keyed by the query type and the langcode asked about. The cache
+    is seeded from the catalog file written by build_catalog() (if there is
+    one) with a single read and filled lazily with anything missing.
+
+    """
+
+    def __init__(self, path=LANG_CATALOG_FILE_PATH):
+        self.path = path
+        self._tables = None
+
+    def _load(self):
+        tables = {}
+        try:
+            with open(self.path, "r") as fobj:
+                data = json.load(fobj)
+            if data.get("version") == LANG_CATALOG_VERSION:
+                tables = data["tables"]
+                log.debug("loaded language catalog from %s", self.path)
+            else:
+                log.warning("ignoring language catalog %s with version %s",
+                            self.path, data.get("version"))
+        except (IOError, ValueError, KeyError) as err:
+            log.debug("no language catalog loaded from %s: %s", self.path, err)
+
+        self._tables = tables
+
+    def lookup(self, table, key, query):
+        """
+        Return the cached value for key in table, running query to get it if
+        it's not known yet.
+
+        :param str table: name of the query type
+        :param str key: langcode (or other value) the query is about
+        :param query: function with no arguments returning the value
+        """
+
+        if self._tables is None:
+            self._load()
+
+        values = self._tables.setdefault(table, {})
+        try:
+            return values[key]
+        except KeyError:
+            value = query()
+            values[key] = value
+            return value
+
+    def store(self, table, key, value):
+        """Replace the cached value for key in table."""
+
+        if self._tables is None:
+            self._load()
+
+        self._tables.setdefault(table, {})[key] = value
+
+    def reset(self):
+        """Drop all cached values, the catalog file will be read again."""
+
+        self._tables = None
+
+    def write(self, path=None):
+        """Write the cached values out as a catalog file."""
+
+        if self._tables is None:
+            self._load()
+
+        with open(path or self.path, "w") as fobj:
+            json.dump({"version": LANG_CATALOG_VERSION, "tables": self._tables},
+                      fobj, sort_keys=True, separators=(",", ":"))
+
+_catalog = _LanguageCatalog()
+
+def _cataloged(table):
+    """
+    Decorator making a langtable query function of one langcode argument
+    answer from the language catalog.
+
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(langcode):
+            value = _catalog.lookup(table, langcode, lambda: fn(langcode))
+            # don't let callers modify the cached lists
+            if isinstance(value, list):
+                return list(value)
+            return value
+        return wrapper
+    return decorator
+
 def parse_langcode(langcode):
     """
     For a given langcode (e.g. 'SR_RS.UTF-8@latin') returns a dictionary
@@ -290,6 +392,7 @@ def setup_locale(locale, lang=None, text_mode=False):
         sys.stdout = io.TextIOWrapper(sys.stdout.detach())
         sys.stderr = io.TextIOWrapper(sys.stderr.detach())
 
+@_cataloged("english_name")
 def get_english_name(locale):
     """
     Function returning english name for the given locale.
@@ -313,6 +416,7 @@ def get_english_name(locale):
 
     return upcase_first_letter(name)
 
+@_cataloged("native_name")
 def get_native_name(locale):
     """
     Function returning native name for the given locale.
@@ -338,18 +442,8 @@ def get_native_name(locale):
 
     return upcase_first_letter(name)
 
-def get_available_translations(localedir=None):
-    """
-    Method that generates (i.e. returns a generator) available translations for
-    the installer in the given localedir.
-
-    :type localedir: str
-    :return: generator yielding available translations (languages)
-    :rtype: generator yielding strings
-
-    """
-
-    localedir = localedir or gettext._default_localedir
+def _find_translations(localedir):
+    """Return the list of languages having translations in localedir."""
 
     # usually there are no message files for en
     messagefiles = sorted(glob.glob(localedir + "/*/LC_MESSAGES/anaconda.mo") +
@@ -357,6 +451,7 @@ def get_available_translations(localedir=None):
     trans_gen = (path.split(os.path.sep)[-3] for path in messagefiles)
 
     langs = set()
+    translations = []
 
     for trans in trans_gen:
         parts = parse_langcode(trans)
@@ -368,8 +463,41 @@ def get_available_translations(localedir=None):
             if not locales:
                 continue
 
-            yield lang
+            translations.append(lang)
+
+    return translations
+
+def get_available_translations(localedir=None):
+    """
+    Method that generates (i.e. returns a generator) available translations for
+    the installer in the given localedir.
+
+    The result is kept in the language catalog together with the modification
+    time of localedir, so a directory with new translations is scanned again.
+
+    :type localedir: str
+    :return: generator yielding available translations (languages)
+    :rtype: generator yielding strings
 
+    """
+
+    localedir = localedir or gettext._default_localedir
+
+    try:
+        mtime = os.stat(localedir).st_mtime
+    except OSError:
+        mtime = None
+
+    (cached_mtime, translations) = _catalog.lookup("translations", localedir,
+                                                   lambda: (mtime, _find_translations(localedir)))
+    if cached_mtime != mtime:
+        translations = _find_translations(localedir)
+        _catalog.store("translations", localedir, (mtime, translations))
+
+    for lang in translations:
+        yield lang
+
+@_cataloged("language_locales")
 def get_language_locales(lang):
     """
     Function returning all locales available for the given language.
@@ -390,6 +518,7 @@ def get_language_locales(lang):
                                   territoryId=parts.get("territory", ""),
                                   scriptId=parts.get("script", ""))
 
+@_cataloged("territory_locales")
 def get_territory_locales(territory):
     """
     Function returning list of locales for the given territory. The list is
@@ -405,6 +534,7 @@ def get_territory_locales(territory):
 
     return langtable.list_locales(territoryId=territory)
 
+@_cataloged("locale_keyboards")
 def get_locale_keyboards(locale):
     """
     Function returning preferred keyboard layouts for the given locale.
@@ -425,6 +555,7 @@ def get_locale_keyboards(locale):
                                     territoryId=parts.get("territory", ""),
                                     scriptId=parts.get("script", ""))
 
+@_cataloged("locale_timezones")
 def get_locale_timezones(locale):
     """
     Function returning preferred timezones for the given locale.
@@ -463,6 +594,7 @@ def get_locale_territory(locale):
 
     return parts.get("territory", None)
 
+@_cataloged("locale_console_fonts")
 def get_locale_console_fonts(locale):
     """
     Function returning preferred console fonts for the given locale.
@@ -482,6 +614,7 @@ def get_locale_console_fonts(locale):
                                        territoryId=parts.get("territory", ""),
                                        scriptId=parts.get("script", ""))
 
+@_cataloged("locale_scripts")
 def get_locale_scripts(locale):
     """
     Function returning preferred scripts (writing systems) for the given locale.
@@ -524,6 +657,39 @@ def get_xlated_timezone(tz_spec_part):
                                      scriptIdQuery=parts.get("script", ""))
     return xlated
 
+def build_catalog(path=LANG_CATALOG_FILE_PATH, localedir=None):
+    """
+    Run the langtable queries the language spokes need for every available
+    translation and write the answers to a catalog file. This is meant to be
+    done when the installation image is built, so that anaconda doesn't have
+    to query langtable at all.
+
+    :param str path: where to write the catalog
+    :param str localedir: directory with the translations
+
+    """
+
+    territories = set()
+    for lang in get_available_translations(localedir):
+        get_english_name(lang)
+        get_native_name(lang)
+        for locale in get_language_locales(lang):
+            get_english_name(locale)
+            get_native_name(locale)
+            get_language_locales(locale)
+            get_locale_keyboards(locale)
+            get_locale_timezones(locale)
+            get_locale_console_fonts(locale)
+            get_locale_scripts(locale)
+            territory = get_locale_territory(locale)
+            if territory:
+                territories.add(territory)
+
+    for territory in territories:
+        get_territory_locales(territory)
+
+    _catalog.write(path)
+
 def write_language_configuration(lang, root):
     """
     Write language configuration to the $root/etc/locale.conf file.
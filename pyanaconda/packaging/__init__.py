@@ -28,7 +28,6 @@
 
 """
 import os
-import requests
 import configparser
 import shutil
 from glob import glob
@@ -36,6 +35,7 @@ from fnmatch import fnmatch
 import threading
 import re
 import functools
+import hashlib
 
 from pyanaconda.iutil import requests_session
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
@@ -46,7 +46,7 @@ if __name__ == "__main__":
 
 from pyanaconda.constants import DRACUT_ISODIR, DRACUT_REPODIR, DD_ALL, DD_FIRMWARE, DD_RPMS, INSTALL_TREE, ISO_DIR
 from pyanaconda.constants import THREAD_STORAGE, THREAD_WAIT_FOR_CONNECTING_NM, THREAD_PAYLOAD
-from pyanaconda.constants import THREAD_PAYLOAD_RESTART
+from pyanaconda.constants import THREAD_PAYLOAD_RESTART, THREAD_DD_CREATEREPO
 from pykickstart.constants import GROUP_ALL, GROUP_DEFAULT, GROUP_REQUIRED
 from pyanaconda.flags import flags
 from pyanaconda.i18n import _, N_
@@ -56,7 +56,6 @@ from pyanaconda import isys
 from pyanaconda.image import findFirstIsoImage
 from pyanaconda.image import mountImage
 from pyanaconda.image import opticalInstallMedia, verifyMedia
-from pyanaconda.iutil import ProxyString, ProxyStringError
 from pyanaconda.threads import threadMgr, AnacondaThread
 from pyanaconda.regexes import VERSION_DIGITS
 
@@ -74,10 +73,17 @@ from blivet import setSysroot
 from pyanaconda.product import productName, productVersion
 USER_AGENT = "%s (anaconda)/%s" %(productName, productVersion)
 
+from pyanaconda.packaging.repoprobe import RepoProbe
+from pyanaconda.packaging.rpmdb import sysrootRpmDB
+
 from distutils.version import LooseVersion
 
 REPO_NOT_SET = False
 
+# Written to the repodata createrepo_c generated for a driver disk repo,
+# contains the digest of the repo's directory listing at that time
+DD_REPO_STAMP = ".anaconda-dd-listing"
+
 def versionCmp(v1, v2):
     """ Compare two version number strings. """
     firstVersion = LooseVersion(v1)
@@ -143,7 +149,11 @@ class Payload(object):
         # A list of verbose error strings from the subclass
         self.verbose_errors = []
 
+        # Repo id -> (seconds, error string or None) of the last metadata load
+        self.repoLoadStatus = {}
+
         self._session = requests_session()
+        self._probe = RepoProbe(self._session, headers={"user-agent": USER_AGENT})
 
     def setup(self, storage, instClass):
         """ Do any payload-specific setup. """
@@ -332,7 +342,10 @@ class Payload(object):
     ## METHODS FOR TREE VERIFICATION
     ##
     def _getTreeInfo(self, url, proxy_url, sslverify):
-        """ Retrieve treeinfo and return the path to the local file.
+        """ Retrieve treeinfo and return its contents.
+
+            The probe results are cached, so asking again for the same url
+            doesn't go to the network.
 
             :param baseurl: url of the repo
             :type baseurl: string
@@ -340,8 +353,8 @@ class Payload(object):
             :type proxy_url: string
             :param sslverify: True if SSL certificate should be verified
             :type sslverify: bool
-            :returns: Path to retrieved .treeinfo file or None
-            :rtype: string or None
+            :returns: the repo probe result or None
+            :rtype: RepoProbeResult or None
         """
         if not url:
             return None
@@ -349,38 +362,18 @@ class Payload(object):
         log.debug("retrieving treeinfo from %s (proxy: %s ; sslverify: %s)",
                   url, proxy_url, sslverify)
 
-        proxies = {}
-        if proxy_url:
-            try:
-                proxy = ProxyString(proxy_url)
-                proxies = {"http": proxy.url,
-                           "https": proxy.url}
-            except ProxyStringError as e:
-                log.info("Failed to parse proxy for _getTreeInfo %s: %s",
-                         proxy_url, e)
-
-        response = None
-        headers = {"user-agent": USER_AGENT}
-        try:
-            response = self._session.get("%s/.treeinfo" % url, headers=headers, proxies=proxies, verify=sslverify)
-        except requests.exceptions.RequestException as e:
-            try:
-                response = self._session.get("%s/treeinfo" % url, headers=headers, proxies=proxies, verify=sslverify)
-            except requests.exceptions.RequestException as e:
-                log.info("Error downloading treeinfo: %s", e)
-                self.verbose_errors.append(str(e))
-                response = None
-
-        if response:
-            # write the local treeinfo file
-            with open("/tmp/.treeinfo", "w") as f:
-                f.write(response.text)
-
-            # and also return the treeinfo contents as a string
-            return response.text
-        else:
+        result = self._probe.probe(url, proxy_url, sslverify)
+        self.verbose_errors.extend(result.errors)
+
+        if result.treeinfo is None:
             return None
 
+        # write the local treeinfo file
+        with open("/tmp/.treeinfo", "w") as f:
+            f.write(result.treeinfo)
+
+        return result
+
     def _getReleaseVersion(self, url):
         """ Return the release version of the tree at the specified URL. """
         try:
@@ -396,8 +389,7 @@ class Payload(object):
             proxy = None
         treeinfo = self._getTreeInfo(url, proxy, not flags.noverifyssl)
         if treeinfo:
-            c = configparser.ConfigParser()
-            c.read(treeinfo)
+            c = treeinfo.treeinfo_config
             try:
                 # Trim off any -Alpha or -Beta
                 version = re.match(VERSION_DIGITS, c.get("general", "version")).group(1)
@@ -409,6 +401,24 @@ class Payload(object):
         log.debug("got a release version of %s", version)
         return version
 
+    def probeRepos(self, repos):
+        """ Check several repos for treeinfo and repodata all at once.
+
+            This warms the probe cache so that the following per-repo checks
+            are answered from memory. Network repos without repodata are
+            logged and reported in verbose_errors.
+
+            :param repos: (url, proxy_url, sslverify) tuples
+            :returns: dict of (url, proxy_url, sslverify) -> RepoProbeResult
+        """
+        results = self._probe.probe_all(repos)
+        for result in results.values():
+            if not result.has_repomd and result.url.startswith(("http:", "https:", "ftp:")):
+                log.warning("no repodata found at %s (%.2fs): %s", result.url,
+                            result.elapsed, ", ".join(result.errors) or "not found")
+                self.verbose_errors.extend(result.errors)
+        return results
+
     ##
     ## METHODS FOR MEDIA MANAGEMENT (XXX should these go in another module?)
     ##
@@ -561,35 +571,26 @@ class Payload(object):
             return
 
         try:
-            import rpm
-        except ImportError:
-            log.info("failed to import rpm -- not adjusting default runlevel")
-        else:
-            ts = rpm.TransactionSet(iutil.getSysroot())
-
             # XXX one day this might need to account for anaconda's display mode
-            if ts.dbMatch("provides", 'service(graphical-login)').count() and \
-               ts.dbMatch('provides', 'xorg-x11-server-Xorg').count() and \
+            if sysrootRpmDB.whatProvides('service(graphical-login)') and \
+               sysrootRpmDB.whatProvides('xorg-x11-server-Xorg') and \
                not flags.usevnc:
                 # We only manipulate the ksdata.  The symlink is made later
                 # during the config write out.
                 self.data.xconfig.startX = True
+        except ImportError:
+            log.info("failed to import rpm -- not adjusting default runlevel")
 
     def dracutSetupArgs(self):
         args = []
         try:
-            import rpm
-        except ImportError:
-            pass
-        else:
-            iutil.resetRpmDb()
-            ts = rpm.TransactionSet(iutil.getSysroot())
-
             # Only add "rhgb quiet" on non-s390, non-serial installs
             if iutil.isConsoleOnVirtualTerminal() and \
-               (ts.dbMatch('provides', 'rhgb').count() or \
-                ts.dbMatch('provides', 'plymouth').count()):
+               (sysrootRpmDB.whatProvides('rhgb') or \
+                sysrootRpmDB.whatProvides('plymouth')):
                 args.extend(["rhgb", "quiet"])
+        except ImportError:
+            pass
 
         return args
 
@@ -753,18 +754,15 @@ class PackagePayload(Payload):
 
         # If a PackagePayload is in use, rpm needs to be available
         try:
-            import rpm
+            kernels = sysrootRpmDB.whatProvides('kernel')
         except ImportError:
             raise PayloadError("failed to import rpm-python, cannot determine kernel versions")
 
         files = []
 
-        ts = rpm.TransactionSet(iutil.getSysroot())
-        mi = ts.dbMatch('providename', 'kernel')
-        for hdr in mi:
-            unicode_fnames = (f.decode("utf-8") for f in hdr.filenames)
+        for pkg in kernels:
             # Find all /boot/vmlinuz- files and strip off vmlinuz-
-            files.extend((f.split("/")[-1][8:] for f in unicode_fnames
+            files.extend((f.split("/")[-1][8:] for f in pkg.files
                 if fnmatch(f, "/boot/vmlinuz-*") or
                    fnmatch(f, "/boot/efi/EFI/%s/vmlinuz-*" % self.instclass.efi_dir)))
 
@@ -1003,6 +1001,102 @@ class PackagePayload(Payload):
         """A list of repo identifiers, not objects themselves."""
         raise NotImplementedError()
 
+    @staticmethod
+    def _driverRepoDigest(repo):
+        """ Return a digest of the names, sizes and mtimes of the files in repo.
+
+            The repodata directory itself is not included.
+        """
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(repo)):
+            if name == "repodata":
+                continue
+            st = os.stat(os.path.join(repo, name))
+            digest.update(("%s %d %d\n" % (name, st.st_size, st.st_mtime_ns)).encode("utf-8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _driverRepoNeedsMetadata(repo, digest):
+        """ Return True if createrepo_c has to be run on the driver disk repo.
+
+            Repodata that came with the driver disk is always used. Repodata
+            generated by an earlier createrepo_c run is reused as long as the
+            directory listing didn't change.
+        """
+        repodata = os.path.join(repo, "repodata")
+        if not os.path.isdir(repodata):
+            return bool(glob(repo+"/*rpm"))
+
+        stamp = os.path.join(repodata, DD_REPO_STAMP)
+        if not os.path.exists(stamp):
+            return False
+
+        with open(stamp, "r") as f:
+            if f.read().strip() == digest:
+                log.debug("Reusing the repodata of %s", repo)
+                return False
+        return True
+
+    @staticmethod
+    def _createDriverRepoMetadata(repo, digest):
+        """ Run createrepo_c on a driver disk repo and stamp the result.
+
+            :raises PayloadSetupError: if createrepo_c failed, the repodata
+                                       is removed then
+        """
+        log.info("Running createrepo on %s", repo)
+        repodata = os.path.join(repo, "repodata")
+        stamp = os.path.join(repodata, DD_REPO_STAMP)
+        if os.path.exists(stamp):
+            os.unlink(stamp)
+
+        try:
+            rc = iutil.execWithRedirect("createrepo_c", [repo])
+            error = "exit code %s" % rc
+        except OSError as e:
+            rc = None
+            error = str(e)
+
+        if rc != 0:
+            # Don't leave partial or stale repodata around to be used
+            shutil.rmtree(repodata, ignore_errors=True)
+            raise PayloadSetupError("createrepo_c failed on %s: %s" % (repo, error))
+
+        if os.path.isdir(repodata):
+            with open(stamp, "w") as f:
+                f.write(digest + "\n")
+
+    @classmethod
+    def _prepareDriverRepos(cls, repos):
+        """ Create the missing or stale repodata of driver disk repos.
+
+            createrepo_c is run for all of them at the same time. A repo it
+            fails on is skipped, the others are still used.
+
+            :param repos: list of (number, path) of the repos
+            :returns: the repos that have repodata
+        """
+        threads = []
+        for (dir_num, repo) in repos:
+            digest = cls._driverRepoDigest(repo)
+            if cls._driverRepoNeedsMetadata(repo, digest):
+                name = threadMgr.add(AnacondaThread(prefix=THREAD_DD_CREATEREPO,
+                                                    target=cls._createDriverRepoMetadata,
+                                                    args=(repo, digest), fatal=False))
+                threads.append((name, repo))
+
+        failed = set()
+        for (name, repo) in threads:
+            try:
+                threadMgr.wait(name)
+            except Exception as e: # pylint: disable=broad-except
+                log.error("Failed to create the repodata of %s, skipping it: %s", repo, e)
+                failed.add(repo)
+
+        # Skip the repos without rpms and the failed ones
+        return [(dir_num, repo) for (dir_num, repo) in repos
+                if repo not in failed and os.path.isdir(repo+"/repodata")]
+
     def addDriverRepos(self):
         """ Add driver repositories and packages
         """
@@ -1010,22 +1104,18 @@ class PackagePayload(Payload):
         # into /run/install/DD-X where X is a number starting at 1. The list of
         # packages that were selected is in /run/install/dd_packages
 
-        # Add repositories
+        # Find the repositories and create the missing or stale repodata
+        repos = []
         dir_num = 0
         while True:
             dir_num += 1
             repo = "/run/install/DD-%d/" % dir_num
             if not os.path.isdir(repo):
                 break
+            repos.append((dir_num, repo))
 
-            # Run createrepo if there are rpms and no repodata
-            if not os.path.isdir(repo+"/repodata"):
-                rpms = glob(repo+"/*rpm")
-                if not rpms:
-                    continue
-                log.info("Running createrepo on %s", repo)
-                iutil.execWithRedirect("createrepo_c", [repo])
-
+        # Add repositories
+        for (dir_num, repo) in self._prepareDriverRepos(repos):
             ks_repo = self.data.RepoData(name="DD-%d" % dir_num,
                                          baseurl="file://"+repo,
                                          enabled=True)
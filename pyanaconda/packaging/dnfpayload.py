@@ -34,6 +34,8 @@ import itertools
 import logging
 import multiprocessing
 import operator
+import queue
+import re
 from pyanaconda import constants
 from pykickstart.constants import GROUP_ALL, GROUP_DEFAULT, KS_MISSING_IGNORE
 import pyanaconda.errors as errors
@@ -46,6 +48,7 @@ import time
 import threading
 from pyanaconda.iutil import ProxyString, ProxyStringError
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
+from pyanaconda.threads import threadMgr, AnacondaThread
 
 log = logging.getLogger("packaging")
 
@@ -71,6 +74,18 @@ REPO_DIRS = ['/etc/yum.repos.d',
              '/tmp/product/anaconda.repos.d']
 YUM_REPOS_DIR = "/etc/yum.repos.d/"
 
+# Maximum number of repos whose metadata is downloaded at the same time
+REPO_LOAD_MAX_THREADS = 4
+
+# Number of resolved software selections kept by checkSoftwareSelection
+DEPSOLVE_CACHE_SIZE = 8
+
+# The attributes of dnf.Base holding the resolved goal and transaction. dnf
+# has no API to put a resolved goal aside, so these are saved and put back to
+# reuse a depsolve. The group changes are not saved, reset() rolls them back
+# in place, they are made again by applying the selection.
+_DEPSOLVE_STATE = ("_goal", "_transaction")
+
 _DNF_INSTALLER_LANGPACK_CONF = DNF_PLUGINCONF_DIR + "/langpacks.conf"
 _DNF_TARGET_LANGPACK_CONF = "/etc/dnf/plugins/langpacks.conf"
 
@@ -79,19 +94,47 @@ def _failure_limbo():
     while True:
         time.sleep(10000)
 
-def _df_map():
-    """Return (mountpoint -> size available) mapping."""
-    output = pyanaconda.iutil.execWithCapture('df', ['--output=target,avail'])
-    output = output.rstrip()
-    lines = output.splitlines()
+# Fraction of the free space that is not used for downloads, per file
+# system type. Copy-on-write file systems need room for their metadata.
+DF_SAFETY_MARGINS = {"btrfs": 0.1}
+
+def _mounts():
+    """Return (mountpoint -> file system type) mapping of the mounted file systems."""
+    mounts = {}
+    with open("/proc/self/mounts") as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 3:
+                continue
+            # spaces and such are escaped as octal numbers
+            mpoint = re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), fields[1])
+            mounts[mpoint] = fields[2]
+    return mounts
+
+def _df_map(candidates, mounts=None):
+    """Return (mountpoint -> size available) mapping.
+
+       Only the candidates that are mounted are checked, so that slow or
+       unresponsive network mounts are never touched.
+
+       :param candidates: mountpoints to check
+       :param dict mounts: mountpoint -> file system type, read from
+                           /proc/self/mounts if None
+    """
+    if mounts is None:
+        mounts = _mounts()
+
     structured = {}
-    for line in lines:
-        items = line.split()
-        key = items[0]
-        val = items[1]
-        if not key.startswith('/'):
+    for mpoint in candidates:
+        if mpoint not in mounts:
+            continue
+        try:
+            st = os.statvfs(mpoint)
+        except OSError as e:
+            log.debug("statvfs of %s failed: %s", mpoint, e)
             continue
-        structured[key] = Size(int(val)*1024)
+        margin = DF_SAFETY_MARGINS.get(mounts[mpoint], 0)
+        structured[mpoint] = Size(int(st.f_bavail * st.f_frsize * (1 - margin)))
     return structured
 
 def _paced(fn):
@@ -198,6 +241,13 @@ class DNFPayload(packaging.PackagePayload):
 
         self._base = None
         self._download_location = None
+        self._df_cache = {}
+        self._df_cache_key = None
+
+        # normalized selection -> saved dnf state of its depsolve
+        self._depsolve_cache = collections.OrderedDict()
+        # Only one depsolve runs at a time
+        self._depsolve_lock = threading.Lock()
         self._configure()
 
         # Protect access to _base.repos to ensure that the dictionary is not
@@ -209,6 +259,7 @@ class DNFPayload(packaging.PackagePayload):
     def unsetup(self):
         super(DNFPayload, self).unsetup()
         self._base = None
+        self._depsolve_cache.clear()
         self._configure()
 
     def _replace_vars(self, url):
@@ -230,11 +281,18 @@ class DNFPayload(packaging.PackagePayload):
         return url
 
 
-    def _add_repo(self, ksrepo):
+    def _probe_key(self, ksrepo):
+        """ Return the (url, proxy, sslverify) tuple to probe a ksrepo with """
+        proxy = ksrepo.proxy or getattr(self.data.method, "proxy", None)
+        return (self._replace_vars(ksrepo.baseurl), proxy,
+                not (ksrepo.noverifyssl or flags.noverifyssl))
+
+    def _add_repo(self, ksrepo, load=True):
         """Add a repo to the dnf repo object
 
            :param ksrepo: Kickstart Repository to add
            :type ksrepo: Kickstart RepoData object.
+           :param bool load: load the metadata to check the repo
            :returns: None
         """
         repo = dnf.repo.Repo(ksrepo.name, DNF_CACHE_DIR)
@@ -290,11 +348,17 @@ class DNFPayload(packaging.PackagePayload):
                 self._base.repos.add(repo)
             repo.enable()
 
+        # Don't make dnf retry a repo the probe already found has no metadata
+        if ksrepo.baseurl and not mirrorlist:
+            probe = self._probe.cached(*self._probe_key(ksrepo))
+            if probe and probe.missing_repomd:
+                raise packaging.MetadataError("repomd.xml not found at %s" % probe.url)
+
         # Load the metadata to verify that the repo is valid
-        try:
-            self._base.repos[repo.id].load()
-        except dnf.exceptions.RepoError as e:
-            raise packaging.MetadataError(e)
+        if load:
+            failed = self._load_repos([repo.id])
+            if repo.id in failed:
+                raise packaging.MetadataError(failed[repo.id])
 
         log.info("added repo: '%s' - %s", ksrepo.name, url or mirrorlist)
 
@@ -451,10 +515,30 @@ class DNFPayload(packaging.PackagePayload):
             pyanaconda.iutil.ipmi_report(constants.IPMI_ABORTED)
             sys.exit(1)
 
+    def _space_map(self):
+        """ Return (mountpoint -> size available) for the download candidates.
+
+            The candidates are DOWNLOAD_MPOINTS and the mountpoints of the
+            installed system. The result is reused for the same software
+            selection as long as the same candidates are mounted.
+        """
+        root_mpoint = pyanaconda.iutil.getSysroot()
+        candidates = set(DOWNLOAD_MPOINTS)
+        if self.storage:
+            candidates.update(root_mpoint + mpoint.rstrip('/')
+                              for mpoint in self.storage.mountpoints if mpoint.startswith('/'))
+
+        mounts = _mounts()
+        key = (self.txID, frozenset(mpoint for mpoint in candidates if mpoint in mounts))
+        if key != self._df_cache_key:
+            self._df_cache = _df_map(candidates, mounts)
+            self._df_cache_key = key
+        return dict(self._df_cache)
+
     def _pick_download_location(self):
         download_size = self._download_space
         install_size = self._spaceRequired()
-        df_map = _df_map()
+        df_map = self._space_map()
         mpoint = _pick_mpoint(df_map, download_size, install_size)
         if mpoint is None:
             msg = "Not enough disk space to download the packages."
@@ -503,14 +587,60 @@ class DNFPayload(packaging.PackagePayload):
         else:
             log.error('kernel: failed to select a kernel from %s', kernels)
 
-    def _sync_metadata(self, dnf_repo):
-        try:
-            dnf_repo.load()
-        except dnf.exceptions.RepoError as e:
-            id_ = dnf_repo.id
-            log.info('_sync_metadata: addon repo error: %s', e)
-            self.disableRepo(id_)
-            self.verbose_errors.append(str(e))
+    def _load_repos(self, repo_ids):
+        """ Download the metadata of several repos at the same time.
+
+            At most REPO_LOAD_MAX_THREADS repos are loaded at once. The time
+            each repo took and its error are kept in repoLoadStatus.
+
+            Loading different repos of one dnf.Base concurrently is safe as
+            each dnf.repo.Repo downloads with its own librepo handle into its
+            own cache directory, the Base itself isn't used until fill_sack.
+            The ids are deduplicated so that no repo is loaded by two threads
+            at once.
+
+            :param repo_ids: ids of the repos to load
+            :returns: dict of repo id -> exception for the repos that failed
+        """
+        pending = queue.Queue()
+        for repo_id in collections.OrderedDict.fromkeys(repo_ids):
+            pending.put(repo_id)
+        failed = {}
+
+        def _worker():
+            while True:
+                try:
+                    repo_id = pending.get_nowait()
+                except queue.Empty:
+                    return
+
+                start = time.time()
+                try:
+                    self._base.repos[repo_id].load()
+                except dnf.exceptions.RepoError as e:
+                    failed[repo_id] = e
+                # only this repo failed, don't lose the others
+                except Exception as e: # pylint: disable=broad-except
+                    log.error("unexpected error loading repo %s", repo_id, exc_info=True)
+                    failed[repo_id] = e
+                elapsed = time.time() - start
+                error = failed.get(repo_id)
+                self.repoLoadStatus[repo_id] = (elapsed, str(error) if error else None)
+                log.info("loaded metadata of repo %s in %.2f seconds%s", repo_id, elapsed,
+                         ": %s" % error if error else "")
+
+        count = min(REPO_LOAD_MAX_THREADS, pending.qsize())
+        if count:
+            start = time.time()
+            names = [threadMgr.add(AnacondaThread(prefix=constants.THREAD_REPO_LOAD,
+                                                  target=_worker, fatal=False))
+                     for _i in range(count)]
+            for name in names:
+                threadMgr.wait(name)
+            log.info("loaded metadata of %d repos in %.2f seconds",
+                     len(repo_ids), time.time() - start)
+
+        return failed
 
     @property
     def baseRepo(self):
@@ -545,7 +675,7 @@ class DNFPayload(packaging.PackagePayload):
     def spaceRequired(self):
         size = self._spaceRequired()
         download_size = self._download_space
-        valid_points = _df_map()
+        valid_points = self._space_map()
         root_mpoint = pyanaconda.iutil.getSysroot()
         for (key, val) in self.storage.mountpoints.items():
             new_key = key
@@ -582,21 +712,81 @@ class DNFPayload(packaging.PackagePayload):
     def _groupHasInstallableMembers(self, grpid):
         return True
 
+    def _selection_key(self):
+        """ Return everything the result of a depsolve depends on. """
+        packages = self.data.packages
+        env = packages.environment
+        if packages.default and self.environments:
+            env = self.environments[0]
+
+        return (env, packages.nocore,
+                frozenset((group.name, group.include) for group in packages.groupList),
+                frozenset(group.name for group in packages.excludedGroupList),
+                frozenset(packages.packageList), frozenset(packages.excludedList),
+                packages.multiLib, packages.instLangs,
+                tuple(self.kernelPackages), tuple(self.requiredPackages),
+                tuple(self.requiredGroups))
+
+    def _save_depsolve(self, key):
+        # A dnf without one of the attributes keeps its state somewhere
+        # else, putting back only part of it would be wrong
+        missing = [attr for attr in _DEPSOLVE_STATE if not hasattr(self._base, attr)]
+        if missing:
+            log.debug("not saving the depsolve, dnf has no %s", ", ".join(missing))
+            return
+
+        self._depsolve_cache[key] = dict((attr, getattr(self._base, attr))
+                                         for attr in _DEPSOLVE_STATE)
+        while len(self._depsolve_cache) > DEPSOLVE_CACHE_SIZE:
+            self._depsolve_cache.popitem(last=False)
+
+    def _restore_depsolve(self, key):
+        """ Put back the resolved goal of a selection, if it was saved.
+
+            The selection has to be applied already, so that the group
+            changes match the goal.
+        """
+        state = self._depsolve_cache.get(key)
+        if state is None:
+            return False
+
+        self._depsolve_cache.move_to_end(key)
+        for (attr, value) in state.items():
+            setattr(self._base, attr, value)
+        return True
+
+    def _invalidate_depsolves(self):
+        """ Forget the saved depsolves, e.g. because the sack changed. """
+        with self._depsolve_lock:
+            self._depsolve_cache.clear()
+
     def checkSoftwareSelection(self):
         log.info("checking software selection")
         self._bump_tx_id()
-        self._base.reset(goal=True)
-        self._apply_selections()
 
-        try:
-            if self._base.resolve():
-                log.debug("checking dependencies: success.")
+        with self._depsolve_lock:
+            # Apply the selection every time, this rebuilds the group changes
+            # and reports the missing packages and groups
+            key = self._selection_key()
+            self._base.reset(goal=True)
+            self._apply_selections()
+
+            if self._restore_depsolve(key):
+                log.info("reusing the dependencies resolved for this selection")
             else:
-                log.debug("empty transaction")
-        except dnf.exceptions.DepsolveError as e:
-            msg = str(e)
-            log.warning(msg)
-            raise packaging.DependencyError(msg)
+                start = time.time()
+                try:
+                    if self._base.resolve():
+                        log.debug("checking dependencies: success.")
+                    else:
+                        log.debug("empty transaction")
+                except dnf.exceptions.DepsolveError as e:
+                    msg = str(e)
+                    log.warning(msg)
+                    raise packaging.DependencyError(msg)
+
+                self._save_depsolve(key)
+                log.info("resolved dependencies in %.2f seconds", time.time() - start)
 
         log.info("%d packages selected totalling %s",
                  len(self._base.transaction), self.spaceRequired)
@@ -607,6 +797,7 @@ class DNFPayload(packaging.PackagePayload):
             log.info("Disabled '%s'", repo_id)
         except KeyError:
             pass
+        self._invalidate_depsolves()
         super(DNFPayload, self).disableRepo(repo_id)
 
     def enableRepo(self, repo_id):
@@ -615,6 +806,7 @@ class DNFPayload(packaging.PackagePayload):
             log.info("Enabled '%s'", repo_id)
         except KeyError:
             pass
+        self._invalidate_depsolves()
         super(DNFPayload, self).enableRepo(repo_id)
 
     def environmentDescription(self, environmentid):
@@ -665,8 +857,14 @@ class DNFPayload(packaging.PackagePayload):
 
     def gatherRepoMetadata(self):
         with self._repos_lock:
-            for repo in self._base.repos.iter_enabled():
-                self._sync_metadata(repo)
+            repo_ids = [repo.id for repo in self._base.repos.iter_enabled()]
+            failed = self._load_repos(repo_ids)
+            for repo_id in repo_ids:
+                if repo_id in failed:
+                    log.info('addon repo %s error: %s', repo_id, failed[repo_id])
+                    self.disableRepo(repo_id)
+                    self.verbose_errors.append(str(failed[repo_id]))
+        self._invalidate_depsolves()
         self._base.fill_sack(load_system_repo=False)
         self._base.read_comps()
         self._refreshEnvironmentAddons()
@@ -784,11 +982,15 @@ class DNFPayload(packaging.PackagePayload):
         shutil.rmtree(DNF_CACHE_DIR, ignore_errors=True)
         shutil.rmtree(DNF_PLUGINCONF_DIR, ignore_errors=True)
         self.txID = None
+        self.repoLoadStatus = {}
+        self._invalidate_depsolves()
         self._base.reset(sack=True, repos=True)
 
     def updateBaseRepo(self, fallback=True, checkmount=True):
         log.info('configuring base repo')
         self.reset()
+        # The sources may have been fixed since they were last probed
+        self._probe.invalidate()
         url, mirrorlist, sslverify = self._setupInstallDevice(self.storage,
                                                               checkmount)
         method = self.data.method
@@ -850,6 +1052,10 @@ class DNFPayload(packaging.PackagePayload):
                     if id_ in enabled:
                         repo.enable()
 
+        # Probe all the add-on repos at once instead of one after another
+        self.probeRepos([self._probe_key(ksrepo) for ksrepo in self.data.repo.dataList()
+                         if ksrepo.baseurl and not ksrepo.mirrorlist])
+
         for ksrepo in self.data.repo.dataList():
             log.debug("repo %s: mirrorlist %s, baseurl %s",
                       ksrepo.name, ksrepo.mirrorlist, ksrepo.baseurl)
@@ -858,7 +1064,14 @@ class DNFPayload(packaging.PackagePayload):
                 raise packaging.PayloadSetupError("Repository %s has no mirror or baseurl set"
                                                   % ksrepo.name)
 
-            self._add_repo(ksrepo)
+            self._add_repo(ksrepo, load=False)
+
+        # Download the metadata of all the add-on repos at once
+        ksrepos = self.data.repo.dataList()
+        failed = self._load_repos([ksrepo.name for ksrepo in ksrepos])
+        for ksrepo in ksrepos:
+            if ksrepo.name in failed:
+                raise packaging.MetadataError(failed[ksrepo.name])
 
         ksnames = [r.name for r in self.data.repo.dataList()]
         ksnames.append(constants.BASE_REPO_NAME)
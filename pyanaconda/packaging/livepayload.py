@@ -31,8 +31,9 @@
 """
 import os
 import stat
+import time
 from time import sleep
-from threading import Lock
+from threading import Lock, Event
 import requests
 from pyanaconda.iutil import ProxyString, ProxyStringError, lowerASCII
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
@@ -42,7 +43,8 @@ import functools
 
 from pyanaconda.packaging import ImagePayload, PayloadSetupError, PayloadInstallError
 
-from pyanaconda.constants import INSTALL_TREE, THREAD_LIVE_PROGRESS
+from pyanaconda.constants import INSTALL_TREE, THREAD_LIVE_PROGRESS, THREAD_LIVE_DOWNLOAD
+from pyanaconda.constants import NETWORK_CONNECTION_TIMEOUT
 from pyanaconda.constants import IMAGE_DIR, TAR_SUFFIX
 
 from pyanaconda import iutil
@@ -58,6 +60,15 @@ from pyanaconda.threads import threadMgr, AnacondaThread
 from pyanaconda.i18n import _
 from pyanaconda.packaging import versionCmp
 
+# Number of connections used to fetch an image that supports range requests
+DOWNLOAD_SEGMENTS = 4
+# Don't split the image into segments smaller than this
+DOWNLOAD_MIN_SEGMENT_SIZE = 64 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# How many times an interrupted segment is resumed before giving up
+DOWNLOAD_RETRIES = 5
+DOWNLOAD_RETRY_DELAY = 2    # in seconds
+
 class LiveImagePayload(ImagePayload):
     """ A LivePayload copies the source image onto the target system. """
     def __init__(self, *args, **kwargs):
@@ -210,6 +221,11 @@ class LiveImagePayload(ImagePayload):
 class DownloadProgress(object):
     """ Provide methods for download progress reporting."""
 
+    def __init__(self):
+        # update may be called from several download threads at once
+        self._lock = Lock()
+        self._start_time = None
+
     def start(self, url, size):
         """ Start of download
 
@@ -221,6 +237,12 @@ class DownloadProgress(object):
         self.url = url
         self.size = size
         self._pct = -1
+        self._start_time = time.time()
+
+    def _throughput(self, bytes_read):
+        """ Return the average download speed so far as a Size per second """
+        elapsed = max(time.time() - self._start_time, 0.001)
+        return Size(int(bytes_read / elapsed))
 
     def update(self, bytes_read):
         """ Download update
@@ -232,11 +254,12 @@ class DownloadProgress(object):
             return
         pct = min(100, int(100 * bytes_read / self.size))
 
-        if pct == self._pct:
-            return
-        self._pct = pct
-        progressQ.send_message(_("Downloading %(url)s (%(pct)d%%)") % \
-                {"url" : self.url, "pct" : pct})
+        with self._lock:
+            if pct == self._pct:
+                return
+            self._pct = pct
+        progressQ.send_message(_("Downloading %(url)s (%(pct)d%%, %(speed)s/s)") % \
+                {"url" : self.url, "pct" : pct, "speed" : self._throughput(bytes_read)})
 
     def end(self, bytes_read):
         """ Download complete
@@ -244,9 +267,207 @@ class DownloadProgress(object):
             :param bytes_read: Bytes read so far
             :type bytes_read:  int
         """
+        log.info("Downloaded %s from %s in %.1f seconds (%s/s)", Size(bytes_read),
+                 self.url, time.time() - self._start_time, self._throughput(bytes_read))
         progressQ.send_message(_("Downloading %(url)s (%(pct)d%%)") % \
                 {"url" : self.url, "pct" : 100})
 
+class RangeRequestError(PayloadInstallError):
+    """ The server sent the whole file instead of the requested range """
+    pass
+
+class SegmentedDownload(object):
+    """ Download a file over several connections using HTTP range requests.
+
+        The file is split into contiguous segments which are fetched in
+        parallel and written in place. A segment interrupted by a dropped
+        connection is resumed from the last byte written instead of starting
+        over. If a hash object is passed the data is hashed in order as the
+        leading segments complete, so no second pass over the file is needed
+        once the download is done. A segment that fails stops the others.
+    """
+    def __init__(self, session, url, path, size, proxies=None, verify=True,
+                 progress=None, hasher=None, segments=DOWNLOAD_SEGMENTS):
+        """
+            :param session: requests session to download with
+            :type session: requests.Session
+            :param str url: url of the file
+            :param str path: local path to write the file to
+            :param int size: size of the file in bytes
+            :param dict proxies: proxies to pass to requests
+            :param bool verify: True if SSL certificate should be verified
+            :param progress: progress reporting object
+            :type progress: DownloadProgress or None
+            :param hasher: hash object to update with the file's data
+            :type hasher: hashlib hash object or None
+            :param int segments: maximum number of parallel connections
+        """
+        self.url = url
+        self.path = path
+        self.size = size
+        self._session = session
+        self._proxies = proxies or {}
+        self._verify = verify
+        self._progress = progress
+        self._hasher = hasher
+        self._hashed = 0
+
+        # Each segment is a [start, end, offset] list, end is exclusive and
+        # offset is the position of the next byte to be written.
+        self._segments = self._split(size, segments)
+        self._lock = Lock()
+        self._hash_lock = Lock()
+        self._cancel = Event()
+
+    @staticmethod
+    def _split(size, segments):
+        """ Split size bytes into at most segments contiguous ranges """
+        count = max(1, min(segments, size // DOWNLOAD_MIN_SEGMENT_SIZE))
+        step = size // count
+        bounds = [i * step for i in range(count)] + [size]
+        return [[start, end, start] for (start, end) in zip(bounds, bounds[1:])]
+
+    @property
+    def bytes_read(self):
+        """ Number of bytes written so far """
+        with self._lock:
+            return sum(offset - start for (start, _end, offset) in self._segments)
+
+    def _contiguous_end(self):
+        """ Return the end of the completely downloaded head of the file """
+        with self._lock:
+            for (_start, end, offset) in self._segments:
+                if offset < end:
+                    return offset
+            return self.size
+
+    def _update_hash(self, wait=False):
+        """ Hash the data that became available at the head of the file.
+
+            The data is read back while it is still in the page cache. Only
+            one thread hashes at a time, others just carry on downloading
+            unless wait is True.
+        """
+        if not self._hasher:
+            return
+
+        if not self._hash_lock.acquire(wait):
+            return
+        try:
+            end = self._contiguous_end()
+            if end <= self._hashed:
+                return
+            with open(self.path, "rb") as f:
+                f.seek(self._hashed)
+                while self._hashed < end:
+                    data = f.read(min(DOWNLOAD_CHUNK_SIZE, end - self._hashed))
+                    if not data:
+                        break
+                    self._hasher.update(data)
+                    self._hashed += len(data)
+        finally:
+            self._hash_lock.release()
+
+    def _fetch_segment(self, segment):
+        """ Download one segment, resuming it if the connection drops """
+        try:
+            self._fetch_segment_data(segment)
+        except Exception:
+            # Don't let the other segments download data nobody will use
+            self._cancel.set()
+            raise
+
+    def _fetch_segment_data(self, segment):
+        retries = 0
+        fd = iutil.eintr_retry_call(os.open, self.path, os.O_WRONLY)
+        try:
+            while segment[2] < segment[1]:
+                last_offset = segment[2]
+                headers = {"Range": "bytes=%d-%d" % (segment[2], segment[1] - 1)}
+                response = None
+                try:
+                    response = self._session.get(self.url, headers=headers, proxies=self._proxies,
+                                                 verify=self._verify, stream=True,
+                                                 timeout=NETWORK_CONNECTION_TIMEOUT)
+                    if response.status_code == 200:
+                        # e.g. a proxy that doesn't pass the ranges on
+                        raise RangeRequestError("range request for %s returned the whole file" %
+                                                self.url)
+                    elif response.status_code != 206:
+                        raise PayloadInstallError("range request for %s returned %s" %
+                                                  (self.url, response.status_code))
+                    for buf in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        if self._cancel.is_set():
+                            return
+                        buf = buf[:segment[1] - segment[2]]
+                        iutil.eintr_retry_call(os.pwrite, fd, buf, segment[2])
+                        with self._lock:
+                            segment[2] += len(buf)
+                        self._update_hash()
+                        if self._progress:
+                            self._progress.update(self.bytes_read)
+                        if segment[2] >= segment[1]:
+                            break
+                except requests.exceptions.RequestException as e:
+                    log.warning("Download of %s interrupted at byte %d: %s",
+                                self.url, segment[2], e)
+                finally:
+                    if response is not None:
+                        response.close()
+
+                # Only count attempts that made no progress at all against
+                # the retry limit, a slow but working link is fine
+                if segment[2] < segment[1]:
+                    if segment[2] == last_offset:
+                        retries += 1
+                    else:
+                        retries = 0
+                    if retries > DOWNLOAD_RETRIES:
+                        raise PayloadInstallError("Failed to download bytes %d-%d of %s" %
+                                                  (segment[2], segment[1] - 1, self.url))
+                    log.info("Resuming download of %s from byte %d", self.url, segment[2])
+                    if self._cancel.wait(DOWNLOAD_RETRY_DELAY * retries):
+                        return
+        finally:
+            iutil.eintr_ignore(os.close, fd)
+
+    def run(self):
+        """ Download the file.
+
+            :raises: RangeRequestError if the server doesn't do range requests
+                     after all, PayloadInstallError if a segment could not be
+                     downloaded
+        """
+        # Allocate the whole file up front so the segments can be written in place
+        with open(self.path, "wb") as f:
+            f.truncate(self.size)
+
+        if self._progress:
+            self._progress.start(self.url, self.size)
+
+        log.info("Downloading %s using %d connections", self.url, len(self._segments))
+        names = [threadMgr.add(AnacondaThread(prefix=THREAD_LIVE_DOWNLOAD, fatal=False,
+                                              target=self._fetch_segment, args=(segment,)))
+                 for segment in self._segments]
+
+        error = None
+        for name in names:
+            try:
+                threadMgr.wait(name)
+            except Exception as e: # pylint: disable=broad-except
+                log.error("Error downloading %s: %s", self.url, e)
+                error = error or e
+        if isinstance(error, RangeRequestError):
+            raise error
+        elif error:
+            raise PayloadInstallError(str(error))
+
+        # Hash whatever the download threads left behind
+        self._update_hash(wait=True)
+
+        if self._progress:
+            self._progress.end(self.bytes_read)
+
 class LiveImageKSPayload(LiveImagePayload):
     """ Install using a live filesystem image from the network """
     def __init__(self, *args, **kwargs):
@@ -255,6 +476,13 @@ class LiveImageKSPayload(LiveImagePayload):
         self._proxies = {}
         self.image_path = iutil.getSysroot()+"/disk.img"
 
+        # Set by _setup_url_image, used to decide how to download the image
+        self._image_size = 0
+        self._accept_ranges = False
+
+        # sha256 of the image computed while downloading it
+        self._image_sha256 = None
+
     @property
     def is_tarfile(self):
         """ Return True if the url ends with a tar suffix """
@@ -275,14 +503,21 @@ class LiveImageKSPayload(LiveImagePayload):
                          self.data.method.proxy, e)
 
         error = None
+        self._image_size = 0
+        self._accept_ranges = False
         try:
-            response = self._session.get(self.data.method.url, proxies=self._proxies, verify=True)
+            # Only look at the headers, the body is fetched in preInstall
+            response = self._session.get(self.data.method.url, proxies=self._proxies, verify=True,
+                                         stream=True)
+            response.close()
 
             # At this point we know we can get the image and what its size is
             # Make a guess as to minimum size needed:
             # Enough space for image and image * 3
             if response.headers.get('content-length'):
-                self._min_size = int(response.headers.get('content-length')) * 4
+                self._image_size = int(response.headers.get('content-length'))
+                self._min_size = self._image_size * 4
+            self._accept_ranges = response.headers.get('accept-ranges', '').lower() == 'bytes'
         except IOError as e:
             log.error("Error opening liveimg: %s", e)
             error = e
@@ -324,44 +559,94 @@ class LiveImageKSPayload(LiveImagePayload):
         # Skip LiveImagePayload's unsetup method
         ImagePayload.unsetup(self)
 
+    def _download_stream(self, progress, hasher):
+        """ Download the image over a single connection """
+        with open(self.image_path, "wb") as f:
+            ssl_verify = not self.data.method.noverifyssl
+            response = self._session.get(self.data.method.url, proxies=self._proxies, verify=ssl_verify, stream=True)
+            total_length = response.headers.get('content-length')
+            if total_length is None:  # no content length header
+                # just download the file in one go and fake the progress reporting once done
+                log.warning("content-length header is missing for the installation image, "
+                            "download progress reporting will not be available")
+                f.write(response.content)
+                if hasher:
+                    hasher.update(response.content)
+                size = f.tell()
+                progress.start(self.data.method.url, size)
+                progress.end(size)
+            else:
+                # requests return headers as strings, so convert total_length to int
+                progress.start(self.data.method.url, int(total_length))
+                bytes_read = 0
+                for buf in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                    if buf:
+                        f.write(buf)
+                        f.flush()
+                        if hasher:
+                            hasher.update(buf)
+                        bytes_read += len(buf)
+                        progress.update(bytes_read)
+                progress.end(bytes_read)
+
     def _preInstall_url_image(self):
-        """ Download the image using Requests with progress reporting"""
+        """ Download the image using Requests with progress reporting
+
+            Servers that support range requests get the image downloaded in
+            segments over several connections, others over a single one. The
+            sha256 of the image is computed during the download if a checksum
+            needs to be verified.
+        """
 
         error = None
         progress = DownloadProgress()
+        hasher = hashlib.sha256() if self.data.method.checksum else None
+        self._image_sha256 = None
         try:
             log.info("Starting image download")
-            with open(self.image_path, "wb") as f:
-                ssl_verify = not self.data.method.noverifyssl
-                response = self._session.get(self.data.method.url, proxies=self._proxies, verify=ssl_verify, stream=True)
-                total_length = response.headers.get('content-length')
-                if total_length is None:  # no content length header
-                    # just download the file in one go and fake the progress reporting once done
-                    log.warning("content-length header is missing for the installation image, "
-                                "download progress reporting will not be available")
-                    f.write(response.content)
-                    size = f.tell()
-                    progress.start(self.data.method.url, size)
-                    progress.end(size)
-                else:
-                    # requests return headers as strings, so convert total_length to int
-                    progress.start(self.data.method.url, int(total_length))
-                    bytes_read = 0
-                    for buf in response.iter_content(1024 * 1024):  # 1 MB chunks
-                        if buf:
-                            f.write(buf)
-                            f.flush()
-                            bytes_read += len(buf)
-                            progress.update(bytes_read)
-                    progress.end(bytes_read)
-                log.info("Image download finished")
-        except requests.exceptions.RequestException as e:
+            segmented = self._image_size and self._accept_ranges
+            if segmented:
+                download = SegmentedDownload(self._session, self.data.method.url,
+                                             self.image_path, self._image_size,
+                                             proxies=self._proxies,
+                                             verify=not self.data.method.noverifyssl,
+                                             progress=progress, hasher=hasher)
+                try:
+                    download.run()
+                except RangeRequestError as e:
+                    log.warning("%s, downloading it over a single connection", e)
+                    segmented = False
+                    hasher = hashlib.sha256() if hasher else None
+
+            if not segmented:
+                self._download_stream(progress, hasher)
+            log.info("Image download finished")
+        except (requests.exceptions.RequestException, PayloadInstallError) as e:
             log.error("Error downloading liveimg: %s", e)
             error = e
         else:
             if not os.path.exists(self.image_path):
                 error = "Failed to download %s, file doesn't exist" % self.data.method.url
                 log.error(error)
+            elif hasher:
+                self._image_sha256 = hasher.hexdigest()
+
+        return error
+
+    def _image_checksum(self):
+        """ Return the sha256 of the image, computing it if the download didn't """
+        if self._image_sha256:
+            return self._image_sha256
+
+        progressQ.send_message(_("Checking image checksum"))
+        sha256 = hashlib.sha256()
+        with open(self.image_path, "rb") as f:
+            while True:
+                data = f.read(DOWNLOAD_CHUNK_SIZE)
+                if not data:
+                    break
+                sha256.update(data)
+        return sha256.hexdigest()
 
     def preInstall(self, *args, **kwargs):
         """ Get image and loopback mount it.
@@ -388,15 +673,7 @@ class LiveImageKSPayload(LiveImagePayload):
         self._adj_size = os.stat(self.image_path)[stat.ST_SIZE]
 
         if self.data.method.checksum:
-            progressQ.send_message(_("Checking image checksum"))
-            sha256 = hashlib.sha256()
-            with open(self.image_path, "rb") as f:
-                while True:
-                    data = f.read(1024*1024)
-                    if not data:
-                        break
-                    sha256.update(data)
-            filesum = sha256.hexdigest()
+            filesum = self._image_checksum()
             log.debug("sha256 of %s is %s", self.data.method.url, filesum)
 
             if lowerASCII(self.data.method.checksum) != filesum:
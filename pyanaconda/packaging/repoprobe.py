@@ -0,0 +1,267 @@
+# repoprobe.py
+# Concurrent, cached treeinfo and repomd probing of repositories.
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""
+    Probe repositories for treeinfo and repomd.xml.
+
+    Every change of the installation source used to re-fetch treeinfo one
+    request after another. RepoProbe checks all the given repositories at
+    once from a handful of threads sharing the payload's keep-alive session,
+    and remembers the results for a while so that the release version and
+    add-on repo checks don't hit the network again for the same url.
+"""
+
+import configparser
+import queue
+import threading
+import time
+import requests
+
+from pyanaconda.constants import THREAD_REPO_PROBE, NETWORK_CONNECTION_TIMEOUT
+from pyanaconda.iutil import ProxyString, ProxyStringError
+from pyanaconda.threads import threadMgr, AnacondaThread
+
+import logging
+log = logging.getLogger("packaging")
+
+# How long (in seconds) a probe result is reused
+PROBE_CACHE_TTL = 300
+
+# Maximum number of repositories probed at the same time
+PROBE_MAX_THREADS = 8
+
+# Only these can be fetched with the requests session
+PROBE_PROTOCOLS = ("http:", "https:", "ftp:", "file:")
+
+class RepoProbeResult(object):
+    """ What probing a repository url found out. """
+    def __init__(self, url, proxy_url):
+        self.url = url
+        self.proxy_url = proxy_url
+        self.treeinfo = None
+        self.has_repomd = False
+        # HTTP status of the repomd.xml request, None if there was no reply
+        self.repomd_status = None
+        self.errors = []
+        self.elapsed = 0.0
+        self.timestamp = time.time()
+        self._treeinfo_config = None
+
+    @property
+    def treeinfo_config(self):
+        """ The treeinfo parsed by ConfigParser, or None """
+        if self.treeinfo is None:
+            return None
+
+        if self._treeinfo_config is None:
+            config = configparser.ConfigParser()
+            try:
+                config.read_string(self.treeinfo)
+            except configparser.Error as e:
+                log.info("Failed to parse treeinfo from %s: %s", self.url, e)
+            self._treeinfo_config = config
+        return self._treeinfo_config
+
+    @property
+    def missing_repomd(self):
+        """ True if the server answered that there is no repomd.xml """
+        return self.repomd_status == 404
+
+    def __repr__(self):
+        return "<RepoProbeResult %s: treeinfo: %s, repomd: %s, %.2fs, errors: %s>" % \
+               (self.url, self.treeinfo is not None, self.has_repomd, self.elapsed, self.errors)
+
+class RepoProbe(object):
+    """ Probe repositories concurrently and cache the results.
+
+        Results are cached per url, proxy and sslverify setting for
+        PROBE_CACHE_TTL seconds or until they are invalidated, the payload
+        does that whenever the base repo is updated. Probes that failed with
+        a network error are not cached.
+    """
+    def __init__(self, session, headers=None, ttl=PROBE_CACHE_TTL):
+        """
+            :param session: requests session shared by all the probes
+            :type session: requests.Session
+            :param dict headers: headers sent with each request
+            :param int ttl: number of seconds a result is valid
+        """
+        self._session = session
+        self._headers = headers or {}
+        self._ttl = ttl
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _proxies(proxy_url):
+        if not proxy_url:
+            return {}
+
+        try:
+            proxy = ProxyString(proxy_url)
+            return {"http": proxy.url, "https": proxy.url}
+        except ProxyStringError as e:
+            log.info("Failed to parse proxy for repo probe %s: %s", proxy_url, e)
+            return {}
+
+    def _get(self, url, proxies, sslverify, result, stream=False):
+        """ GET url, return the response or None if the request failed """
+        try:
+            response = self._session.get(url, headers=self._headers, proxies=proxies,
+                                         verify=sslverify, stream=stream,
+                                         timeout=NETWORK_CONNECTION_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            log.info("Error downloading %s: %s", url, e)
+            result.errors.append(str(e))
+            return None
+
+        if stream:
+            response.close()
+
+        if not response.ok:
+            log.debug("%s returned %s", url, response.status_code)
+        return response
+
+    def _probe(self, url, proxy_url, sslverify):
+        result = RepoProbeResult(url, proxy_url)
+        if not url.startswith(PROBE_PROTOCOLS):
+            return result
+
+        start = time.time()
+        proxies = self._proxies(proxy_url)
+        base = url.rstrip("/")
+
+        for name in (".treeinfo", "treeinfo", "repodata/repomd.xml"):
+            if name == "treeinfo" and result.treeinfo is not None:
+                continue
+            response = self._get("%s/%s" % (base, name), proxies, sslverify, result,
+                                 stream=name.startswith("repodata"))
+            if response is None:
+                # The server can't be reached, don't wait for it again
+                break
+            elif name.startswith("repodata"):
+                result.has_repomd = response.ok
+                result.repomd_status = response.status_code
+            elif response.ok:
+                result.treeinfo = response.text
+
+        result.elapsed = time.time() - start
+        result.timestamp = time.time()
+        log.debug("probed %s", result)
+        return result
+
+    def _cached(self, key):
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result and time.time() - result.timestamp < self._ttl:
+                return result
+            return None
+
+    def _store(self, key, result):
+        # Don't remember network errors, the next try may well succeed
+        if result.errors:
+            return
+        with self._cache_lock:
+            self._cache[key] = result
+
+    @staticmethod
+    def key(url, proxy_url=None, sslverify=True):
+        """ Return the key probe results are cached and returned by """
+        return (url, proxy_url or "", sslverify)
+
+    def cached(self, url, proxy_url=None, sslverify=True):
+        """ Return the cached probe result for url or None """
+        return self._cached(self.key(url, proxy_url, sslverify))
+
+    def probe(self, url, proxy_url=None, sslverify=True):
+        """ Probe one repository url, reusing a cached result if there is one.
+
+            :param str url: base url of the repository
+            :param str proxy_url: Optional full proxy URL or ""
+            :param bool sslverify: True if SSL certificate should be verified
+            :rtype: RepoProbeResult
+        """
+        key = self.key(url, proxy_url, sslverify)
+        result = self._cached(key)
+        if result is None:
+            result = self._probe(url, proxy_url, sslverify)
+            self._store(key, result)
+        return result
+
+    def probe_all(self, repos):
+        """ Probe several repositories at once.
+
+            The same url may be given with different proxy or sslverify
+            settings, each of them is probed separately.
+
+            :param repos: (url, proxy_url, sslverify) tuples
+            :returns: dict of (url, proxy_url, sslverify) -> RepoProbeResult,
+                      the key as returned by RepoProbe.key()
+        """
+        results = {}
+        pending = queue.Queue()
+        for (url, proxy_url, sslverify) in repos:
+            if not url:
+                continue
+            key = self.key(url, proxy_url, sslverify)
+            if key in results:
+                continue
+            result = self._cached(key)
+            if result is None:
+                pending.put(key)
+                # reserve the key so duplicates are only probed once
+                results[key] = None
+            else:
+                results[key] = result
+
+        def _worker():
+            while True:
+                try:
+                    key = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    result = self._probe(*key)
+                except Exception as e: # pylint: disable=broad-except
+                    log.error("probing %s failed", key[0], exc_info=True)
+                    result = RepoProbeResult(key[0], key[1])
+                    result.errors.append(str(e))
+                self._store(key, result)
+                results[key] = result
+
+        count = min(PROBE_MAX_THREADS, pending.qsize())
+        if count:
+            start = time.time()
+            names = [threadMgr.add(AnacondaThread(prefix=THREAD_REPO_PROBE, target=_worker, fatal=False))
+                     for _i in range(count)]
+            for name in names:
+                threadMgr.wait(name)
+            log.info("probed %d repositories in %.2f seconds", len(results), time.time() - start)
+
+        return results
+
+    def invalidate(self, url=None):
+        """ Forget the cached results for url, or all of them """
+        with self._cache_lock:
+            if url is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == url]:
+                    del self._cache[key]
@@ -0,0 +1,174 @@
+# rpmdb.py
+# In-memory index of the installed system's rpm database.
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+"""
+    Answer rpm queries about the installed system from memory.
+
+    After the installation several places (the default systemd target, the
+    dracut arguments, the kernel list, the bootloader configuration) each
+    opened their own TransactionSet on the sysroot and asked it a question
+    or two. SysrootRpmDB reads the headers once, keeps the few things those
+    questions need and answers all of them from that index. The index is
+    rebuilt when the database files change, e.g. because a %post script
+    installed more packages.
+"""
+
+import os
+import threading
+import time
+
+from pyanaconda import iutil
+
+import logging
+log = logging.getLogger("packaging")
+
+# Only files under these directories are indexed
+INDEXED_FILE_PREFIXES = ("/boot/",)
+
+def _str(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return value
+
+class InstalledPackage(object):
+    """ What the index knows about an installed package. """
+    def __init__(self, name, version, release, files):
+        self.name = name
+        self.version = version
+        self.release = release
+        # only the files under INDEXED_FILE_PREFIXES
+        self.files = files
+
+    def __repr__(self):
+        return "<InstalledPackage %s-%s-%s>" % (self.name, self.version, self.release)
+
+class SysrootRpmDB(object):
+    """ Index of the rpm database in the sysroot.
+
+        Importing rpm is left to the first query, an ImportError is passed
+        on to the caller.
+    """
+    def __init__(self, root=None):
+        """
+            :param str root: root of the installed system, the sysroot if None
+        """
+        self._root = root
+        self._lock = threading.RLock()
+        self._key = None
+        self._provides = {}
+        self._names = {}
+        self._files = {}
+
+    @property
+    def root(self):
+        return self._root or iutil.getSysroot()
+
+    def _dbFilesKey(self, dbpath):
+        """ Return something that changes when the database is modified. """
+        key = [self.root]
+        try:
+            names = sorted(os.listdir(dbpath))
+        except OSError:
+            return tuple(key)
+
+        for name in names:
+            # the environment files change on every open
+            if name.startswith("__db."):
+                continue
+            try:
+                st = os.stat(os.path.join(dbpath, name))
+            except OSError:
+                continue
+            key.append((name, st.st_size, st.st_mtime_ns))
+        return tuple(key)
+
+    def _load(self):
+        import rpm
+
+        dbpath = self.root + rpm.expandMacro("%{_dbpath}")
+        key = self._dbFilesKey(dbpath)
+        if key == self._key:
+            return
+
+        start = time.time()
+        provides = {}
+        names = {}
+        files = {}
+
+        iutil.resetRpmDb()
+        ts = rpm.TransactionSet(self.root)
+        for hdr in ts.dbMatch():
+            fnames = (_str(f) for f in hdr[rpm.RPMTAG_FILENAMES])
+            pkg = InstalledPackage(_str(hdr[rpm.RPMTAG_NAME]),
+                                   _str(hdr[rpm.RPMTAG_VERSION]),
+                                   _str(hdr[rpm.RPMTAG_RELEASE]),
+                                   [f for f in fnames if f.startswith(INDEXED_FILE_PREFIXES)])
+            names.setdefault(pkg.name, []).append(pkg)
+            for provide in set(hdr[rpm.RPMTAG_PROVIDENAME]):
+                provides.setdefault(_str(provide), []).append(pkg)
+            for f in pkg.files:
+                files.setdefault(f, []).append(pkg)
+        ts.closeDB()
+
+        self._provides = provides
+        self._names = names
+        self._files = files
+        self._key = key
+        log.debug("indexed %d installed packages in %.2f seconds",
+                  sum(len(p) for p in names.values()), time.time() - start)
+
+    def invalidate(self):
+        """ Forget the index, the next query reads the database again. """
+        with self._lock:
+            self._key = None
+            self._provides = {}
+            self._names = {}
+            self._files = {}
+
+    def whatProvides(self, capability):
+        """ Return the installed packages providing capability.
+
+            :param str capability: the name of a provide, versions are ignored
+            :rtype: list of InstalledPackage
+        """
+        with self._lock:
+            self._load()
+            return list(self._provides.get(capability, []))
+
+    def packages(self, name):
+        """ Return the installed packages called name. """
+        with self._lock:
+            self._load()
+            return list(self._names.get(name, []))
+
+    def fileOwners(self, path):
+        """ Return the installed packages owning path.
+
+            Only works for files under INDEXED_FILE_PREFIXES.
+        """
+        if not path.startswith(INDEXED_FILE_PREFIXES):
+            raise ValueError("%s is not indexed" % path)
+
+        with self._lock:
+            self._load()
+            return list(self._files.get(path, []))
+
+# The rpm database of the system being installed
+sysrootRpmDB = SysrootRpmDB()
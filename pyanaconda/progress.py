@@ -38,7 +38,8 @@ progressQ = QueueFactory("progress")
 
 progressQ.addMessage("init", 1)             # num_steps
 progressQ.addMessage("step", 0)
-progressQ.addMessage("message", 1)          # message
+# only the last message is shown when several are waiting
+progressQ.addMessage("message", 1, coalesce=lambda args: None)  # message
 progressQ.addMessage("complete", 0)
 progressQ.addMessage("quit", 1)             # exit_code
 
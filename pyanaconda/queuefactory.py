@@ -18,8 +18,57 @@
 #
 # Author(s): Chris Lumens <clumens@redhat.com>
 
+import os
 import queue
-from pyanaconda.iutil import lowerASCII, upperASCII
+
+import gi
+gi.require_version("GLib", "2.0")
+from gi.repository import GLib
+
+from pyanaconda.iutil import lowerASCII, upperASCII, eintr_retry_call
+
+class _WatchedQueue(queue.Queue):
+    """A Queue that writes to a pipe when something is put into it, so that
+       a GLib main loop can sleep until there are messages instead of polling.
+
+       Only one byte is written until the reader calls clear_wakeup, no
+       matter how many messages arrive in the meantime.
+    """
+    def __init__(self):
+        queue.Queue.__init__(self)
+        self._wakeup_fd = None
+        self._signaled = False
+
+    def set_wakeup_fd(self, fd):
+        with self.mutex:
+            self._wakeup_fd = fd
+
+    def wakeup(self):
+        """Wake up the reader, called with self.mutex held."""
+        if self._wakeup_fd is None or self._signaled:
+            return
+
+        self._signaled = True
+        try:
+            eintr_retry_call(os.write, self._wakeup_fd, b"\0")
+        except BlockingIOError:
+            # the pipe is full, the reader will wake up anyway
+            pass
+
+    def clear_wakeup(self, fd):
+        """Read the wakeup bytes from the reading end fd of the pipe."""
+        with self.mutex:
+            self._signaled = False
+
+        try:
+            while eintr_retry_call(os.read, fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _put(self, item):
+        queue.Queue._put(self, item)
+        self.wakeup()
 
 class QueueFactory(object):
     """Constructs a new object wrapping a Queue.Queue, complete with constants
@@ -41,6 +90,9 @@ class QueueFactory(object):
        that takes one argument.
 
        Reusing names within the same class is not allowed.
+
+       The main loop can have messages dispatched to it as they arrive with
+       the watch method instead of polling the queue.
     """
     def __init__(self, name):
         self.name = name
@@ -48,7 +100,14 @@ class QueueFactory(object):
         self.__counter = 0
         self.__names = []
 
-        self.q = queue.Queue()
+        self.q = _WatchedQueue()
+
+        # functions returning the coalescing key of a message, by message code
+        self._coalesce = {}
+        # messages taken out of the queue but not dispatched yet
+        self._backlog = []
+        # (read, write) ends of the wakeup pipe
+        self._pipe = None
 
     def _makeMethod(self, constant, methodName, argc):
         def __method(*args):
@@ -61,7 +120,16 @@ class QueueFactory(object):
         __method.__name__ = methodName
         return __method
 
-    def addMessage(self, name, argc):
+    def addMessage(self, name, argc, coalesce=None):
+        """Add a new message type.
+
+           :param str name: name of the message
+           :param int argc: number of arguments of the message
+           :param coalesce: function taking the message arguments and returning
+                            a key.  When several messages with the same key
+                            are waiting, only the last one is dispatched by
+                            drain and watch.
+        """
         if name in self.__names:
             raise AttributeError("%s queue already has a message named %s" % (self.name, name))
 
@@ -76,3 +144,62 @@ class QueueFactory(object):
         setattr(self, method_name, method)
 
         self.__names.append(name)
+        if coalesce:
+            self._coalesce[getattr(self, const_name)] = coalesce
+
+    def drain(self):
+        """Return all waiting messages as a list of (code, args) tuples
+           without blocking.  Messages superseded by a later one with the same
+           coalescing key are left out.
+        """
+        messages = self._backlog
+        self._backlog = []
+
+        while True:
+            try:
+                messages.append(self.q.get_nowait())
+            except queue.Empty:
+                break
+            self.q.task_done()
+
+        if not self._coalesce:
+            return messages
+
+        last = {}
+        for (i, (code, args)) in enumerate(messages):
+            if code in self._coalesce:
+                last[(code, self._coalesce[code](args))] = i
+
+        return [(code, args) for (i, (code, args)) in enumerate(messages)
+                if code not in self._coalesce or last[(code, self._coalesce[code](args))] == i]
+
+    def requeue(self, messages):
+        """Put messages returned by drain that were not handled back, they
+           are returned first by the next drain.
+        """
+        self._backlog = list(messages) + self._backlog
+
+    def watch(self, callback, *args):
+        """Call callback(*args) from the GLib main loop when messages arrive,
+           the callback is expected to get them with drain.  The main loop is
+           only woken up when there are messages.
+
+           :param callback: function to call, if it returns False the watch
+                            is removed
+           :returns: the GLib source id of the watch
+        """
+        if self._pipe is None:
+            self._pipe = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+            self.q.set_wakeup_fd(self._pipe[1])
+
+        def _dispatch(fd, condition):
+            self.q.clear_wakeup(fd)
+            return callback(*args)
+
+        source_id = GLib.io_add_watch(self._pipe[0], GLib.PRIORITY_DEFAULT, GLib.IO_IN, _dispatch)
+
+        # messages may be waiting already, in the queue or the backlog
+        with self.q.mutex:
+            self.q.wakeup()
+
+        return source_id
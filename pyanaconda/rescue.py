@@ -18,27 +18,31 @@
 #
 # Author(s): Samantha N. Bueno <sbueno@redhat.com>
 #
+from blivet import udev
 from blivet.errors import StorageError
 from blivet.devices import LUKSDevice
-from blivet.osinstall import mountExistingSystem, findExistingInstallations
+from blivet.osinstall import mountExistingSystem, parseFSTab, Root
 
 from pyanaconda import iutil
-from pyanaconda.constants import ANACONDA_CLEANUP
+from pyanaconda.constants import ANACONDA_CLEANUP, THREAD_RESCUE_UNLOCK, THREAD_RESCUE_PROBE
 from pyanaconda.constants_text import INPUT_PROCESSED
 from pyanaconda.flags import flags
 from pyanaconda.i18n import _, N_, C_
 from pyanaconda.kickstart import runPostScripts
-from pyanaconda.ui.tui.simpleline import TextWidget, ColumnWidget, CheckboxWidget
+from pyanaconda.ui.tui.simpleline import TextWidget, ColumnWidget, CheckboxWidget, invalidate_frames
 from pyanaconda.ui.tui.spokes import NormalTUISpoke
 from pyanaconda.ui.tui.tuiobject import YesNoDialog, PasswordDialog
 from pyanaconda.storage_utils import try_populate_devicetree
+from pyanaconda.threads import threadMgr, AnacondaThread
 
 from pykickstart.constants import KS_REBOOT, KS_SHUTDOWN
 
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
 
 import os
+import queue
 import shutil
+import tempfile
 import time
 
 import logging
@@ -46,6 +50,208 @@ log = logging.getLogger("anaconda")
 
 __all__ = ["RescueMode", "RootSpoke", "RescueMountSpoke"]
 
+# how many devices are probed or unlocked at once
+RESCUE_MAX_THREADS = 8
+
+# mount options keeping the probes really read-only, a plain "ro" mount still
+# replays the journal
+PROBE_MOUNT_OPTIONS = {"ext3": "noload", "ext4": "noload", "xfs": "norecovery"}
+
+# files parseFSTab reads from the installed system, only /etc/fstab is required
+PROBE_FSTAB_FILES = ("etc/fstab", "etc/crypttab", "etc/blkid/blkid.tab")
+
+def _run_parallel(prefix, func, items):
+    """Call func for every item using a few threads.
+
+    :returns: the results in the order of items, None if func failed
+    :rtype: list
+    """
+    results = [None] * len(items)
+    pending = queue.Queue()
+    for idx, item in enumerate(items):
+        pending.put((idx, item))
+
+    def _worker():
+        while True:
+            try:
+                (idx, item) = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[idx] = func(item)
+            except Exception as e: # pylint: disable=broad-except
+                log.error("%s failed for %s: %s", prefix, item, e)
+
+    names = [threadMgr.add(AnacondaThread(prefix=prefix, target=_worker, fatal=False))
+             for _i in range(min(RESCUE_MAX_THREADS, len(items)))]
+    for name in names:
+        threadMgr.wait(name)
+
+    return results
+
+def _open_luks(device, passphrase):
+    """Try to open the LUKS format of an active device, return whether it worked."""
+    device.format.passphrase = passphrase
+    try:
+        device.format.setup()
+    except StorageError as serr:
+        log.error("Failed to unlock %s: %s", device.name, serr)
+        return False
+    return True
+
+def unlock_luks_devices(devices, passphrase):
+    """Try to unlock all the LUKS devices with passphrase at once.
+
+    :param devices: devices with a LUKS format
+    :param str passphrase: the passphrase to try
+    :returns: the devices that were unlocked
+    :rtype: list
+    """
+    # activating the devices is left to this thread, only the slow key
+    # derivation runs in parallel
+    active = []
+    for device in devices:
+        try:
+            device.setup()
+        except StorageError as serr:
+            log.error("Failed to set up %s: %s", device.name, serr)
+        else:
+            active.append(device)
+
+    start = time.time()
+    results = _run_parallel(THREAD_RESCUE_UNLOCK, lambda d: _open_luks(d, passphrase), active)
+
+    unlocked = []
+    for (device, opened) in zip(active, results):
+        if opened:
+            unlocked.append(device)
+        else:
+            device.format.passphrase = None
+            try:
+                device.teardown()
+            except StorageError as serr:
+                log.error("Failed to tear down %s: %s", device.name, serr)
+
+    log.info("unlocked %d of %d LUKS devices in %.2f seconds", len(unlocked), len(devices),
+             time.time() - start)
+    return unlocked
+
+def _read_release(mountpoint):
+    """Return (arch, product, version) of the system mounted at mountpoint."""
+    try:
+        arch = iutil.execWithCapture("arch", [], root=mountpoint).strip() or None
+    except OSError:
+        arch = None
+
+    product = version = None
+    try:
+        with open(mountpoint + "/etc/redhat-release", "r") as f:
+            release = f.readline().strip()
+    except IOError:
+        pass
+    else:
+        (name, sep, rest) = release.partition(" release ")
+        if sep and rest:
+            product = name
+            version = rest.split()[0]
+
+    return (arch, product, version)
+
+def _installation_name(arch, product, version):
+    if not product or not version or not arch:
+        return _("Unknown Linux")
+    elif "linux" in product.lower():
+        return _("%(product)s %(version)s for %(arch)s") % \
+                {"product": product, "version": version, "arch": arch}
+    else:
+        return _("%(product)s Linux %(version)s for %(arch)s") % \
+                {"product": product, "version": version, "arch": arch}
+
+def _probe_device(device, probe_dir):
+    """Look for an installed system on an active device.
+
+    The device is mounted read-only under probe_dir/mnt and the files
+    parseFSTab needs (PROBE_FSTAB_FILES) are copied to probe_dir so that
+    they can be parsed later.
+
+    :returns: (arch, product, version) or None if there is no system
+    """
+    mountpoint = os.path.join(probe_dir, "mnt")
+    options = ",".join(o for o in (device.format.options, "ro",
+                                   PROBE_MOUNT_OPTIONS.get(device.format.type)) if o)
+    try:
+        os.makedirs(mountpoint)
+        device.format.mount(options=options, mountpoint=mountpoint)
+    except Exception as e: # pylint: disable=broad-except
+        log.debug("Failed to mount %s: %s", device.name, e)
+        return None
+
+    try:
+        if not os.access(mountpoint + "/etc/fstab", os.R_OK):
+            return None
+        for name in PROBE_FSTAB_FILES:
+            if not os.access(os.path.join(mountpoint, name), os.R_OK):
+                continue
+            os.makedirs(os.path.dirname(os.path.join(probe_dir, name)), exist_ok=True)
+            shutil.copyfile(os.path.join(mountpoint, name), os.path.join(probe_dir, name))
+        return _read_release(mountpoint)
+    except (IOError, OSError) as e:
+        log.debug("Failed to probe %s: %s", device.name, e)
+        return None
+    finally:
+        try:
+            device.format.unmount()
+        except Exception as e: # pylint: disable=broad-except
+            log.error("Failed to unmount %s: %s", device.name, e)
+
+def find_existing_installations(devicetree):
+    """Find the installed systems on the devices in devicetree.
+
+    Does what blivet's findExistingInstallations does, but every candidate
+    is mounted at its own directory so that they can be probed in parallel,
+    and without replaying journals.
+
+    :rtype: list of blivet.osinstall.Root
+    """
+    start = time.time()
+    active = []
+    for device in devicetree.leaves:
+        if not device.format.linuxNative or not device.format.mountable or \
+                not device.controllable:
+            continue
+        try:
+            device.setup()
+        except Exception as e: # pylint: disable=broad-except
+            log.debug("Failed to set up %s: %s", device.name, e)
+        else:
+            active.append(device)
+
+    roots = []
+    tmpdir = tempfile.mkdtemp(prefix="rescue-")
+    try:
+        probes = [(device, os.path.join(tmpdir, str(idx))) for (idx, device) in enumerate(active)]
+        releases = _run_parallel(THREAD_RESCUE_PROBE, lambda probe: _probe_device(*probe), probes)
+        for ((device, probe_dir), release) in zip(probes, releases):
+            if release is None:
+                continue
+
+            (mounts, swaps) = parseFSTab(devicetree, chroot=probe_dir)
+            if not mounts and not swaps:
+                # empty /etc/fstab. weird, but it happens.
+                continue
+            roots.append(Root(mounts=mounts, swaps=swaps, name=_installation_name(*release)))
+    finally:
+        for device in active:
+            try:
+                device.teardown()
+            except Exception as e: # pylint: disable=broad-except
+                log.error("Failed to tear down %s: %s", device.name, e)
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    log.info("found %d installations on %d devices in %.2f seconds", len(roots), len(active),
+             time.time() - start)
+    return roots
+
 def makeFStab(instPath=""):
     """Make the fs tab."""
     if os.access("/proc/mounts", os.R_OK):
@@ -65,6 +271,8 @@ def makeFStab(instPath=""):
 
 def run_shell():
     """Launch a shell."""
+    # the messages and the shell end up below the current screen
+    invalidate_frames()
     if flags.imageInstall:
         print(_("Run %s to unmount the system when you are finished.")
                 % ANACONDA_CLEANUP)
@@ -187,12 +395,11 @@ class RescueMode(NormalTUISpoke):
             # decrypt any luks devices
             self._unlock_devices()
 
-            # this sleep may look pointless, but it seems necessary, in
-            # order for some task to complete; otherwise no existing
-            # installations are discovered. IOW, this is a hack.
-            time.sleep(2)
+            # let udev finish with the devices that have just appeared,
+            # otherwise no existing installations are discovered
+            udev.settle()
             # attempt to find previous installations
-            roots = findExistingInstallations(self.storage.devicetree)
+            roots = find_existing_installations(self.storage.devicetree)
             if len(roots) == 1:
                 self._root = roots[0]
             elif len(roots) > 1:
@@ -222,45 +429,34 @@ class RescueMode(NormalTUISpoke):
     def _unlock_devices(self):
         """
             Loop through devices and attempt to unlock any which are detected as
-            LUKS devices.
+            LUKS devices. Every passphrase is tried on all the locked devices.
         """
-        try_passphrase = None
-        for device in self.storage.devices:
-            if device.format.type != "luks":
+        skipped = set()
+        while True:
+            locked = [d for d in self.storage.devices
+                      if d.format.type == "luks" and not d.format.status and d.name not in skipped]
+            if not locked:
+                break
+
+            device = locked[0]
+            p = PasswordDialog(self.app, device.name)
+            self.app.switch_screen_modal(p)
+            if not p.answer:
+                # canceled
+                skipped.add(device.name)
                 continue
 
-            skip = False
-            unlocked = False
-            while not (skip or unlocked):
-                if try_passphrase is None:
-                    p = PasswordDialog(self.app, device.name)
-                    self.app.switch_screen_modal(p)
-                    if p.answer:
-                        passphrase = p.answer.strip()
-                else:
-                    passphrase = try_passphrase
+            unlocked = unlock_luks_devices(locked, p.answer.strip())
+            if not unlocked:
+                continue
 
-                if passphrase is None:
-                    # canceled
-                    skip = True
-                else:
-                    device.format.passphrase = passphrase
-                    try:
-                        device.setup()
-                        device.format.setup()
-                        luks_dev = LUKSDevice(device.format.mapName,
-                                              parents=[device],
-                                              exists=True)
-                        self.storage.devicetree._addDevice(luks_dev)
-                        try_populate_devicetree(self.storage.devicetree)
-                        unlocked = True
-                        # try to use the same passhprase for other devices
-                        try_passphrase = passphrase
-                    except StorageError as serr:
-                        log.error("Failed to unlock %s: %s", device.name, serr)
-                        device.teardown(recursive=True)
-                        device.format.passphrase = None
-                        try_passphrase = None
+            for dev in unlocked:
+                luks_dev = LUKSDevice(dev.format.mapName,
+                                      parents=[dev],
+                                      exists=True)
+                self.storage.devicetree._addDevice(luks_dev)
+            # the unlocked devices may hold more LUKS devices
+            try_populate_devicetree(self.storage.devicetree)
         return True
 
 class RootSpoke(NormalTUISpoke):
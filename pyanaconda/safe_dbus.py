@@ -181,3 +181,62 @@ def get_property_sync(service, obj_path, iface, prop_name,
         raise DBusPropertyError(msg)
 
     return ret
+
+def get_properties_sync(service, obj_path, iface, connection=None):
+    """
+    Get values of all properties of a given object provided by a given service
+    with a single call.
+
+    :param service: DBus service to use
+    :type service: str
+    :param obj_path: object path
+    :type obj_path: str
+    :param iface: interface to use
+    :type iface: str
+    :param connection: connection to use (if None, a new connection is
+                       established)
+    :type connection: Gio.DBusConnection
+    :return: unpacked values of the properties
+    :rtype: dict of property name -> value
+    :raise DBusCallError: when the internal dbus_call_safe_sync invocation
+                          raises an exception
+    :raise DBusPropertyError: when the given object doesn't return properties
+
+    """
+
+    args = GLib.Variant('(s)', (iface,))
+    ret = call_sync(service, obj_path, DBUS_PROPS_IFACE, "GetAll", args,
+                    connection)
+    if not ret:
+        msg = "No properties of the %s object" % obj_path
+        raise DBusPropertyError(msg)
+
+    return ret[0]
+
+def subscribe_properties_changed(service, obj_path, callback, connection):
+    """
+    Call callback when properties of a given object change.
+
+    The signals are delivered by the main loop of the thread-default main
+    context of the calling thread, there are no calls without a main loop.
+
+    :param service: DBus service to watch
+    :type service: str
+    :param obj_path: object path
+    :type obj_path: str
+    :param callback: called with the interface name, a dict of the changed
+                     properties and their (unpacked) values and a list of the
+                     invalidated properties
+    :param connection: connection to use
+    :type connection: Gio.DBusConnection
+    :return: subscription id for Gio.DBusConnection.signal_unsubscribe
+    :rtype: int
+
+    """
+
+    def _on_signal(_connection, _sender, _path, _iface, _signal, params):
+        callback(*params.unpack())
+
+    return connection.signal_subscribe(service, DBUS_PROPS_IFACE, "PropertiesChanged",
+                                       obj_path, None, Gio.DBusSignalFlags.NONE,
+                                       _on_signal)
@@ -23,14 +23,20 @@
 #            Brian C. Lane <bcl@redhat.com>
 #
 import os
+import re
 import shlex
+import stat
 import string # pylint: disable=deprecated-module
 import tempfile
-from pyanaconda.iutil import upperASCII, eintr_retry_call
+from pyanaconda.iutil import upperASCII, eintr_retry_call, eintr_ignore
 from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
 
 _SAFECHARS = frozenset(string.ascii_letters + string.digits + '@%_-+=:,./')
 
+# Everything up to the first # outside of quotes, an unterminated quote ends
+# the match before reaching any #
+_NO_COMMENT_RE = re.compile(r"""(?:[^'"#]+|"[^"]*"|'[^']*')*""")
+
 def unquote(s):
     return ' '.join(shlex.split(s))
 
@@ -55,37 +61,36 @@ def find_comment(s):
 
         Handles comments inside quotes and quotes inside quotes.
     """
-    q = None
-    for i in range(len(s)):
-        if not q and s[i] == '#':
-            return i
-
-        # Ignore quotes inside other quotes
-        if s[i] in "'\"":
-            if s[i] == q:
-                q = None
-            elif q is None:
-                q = s[i]
+    end = _NO_COMMENT_RE.match(s).end()
+    if end < len(s) and s[end] == '#':
+        return end
     return None
 
 
 def write_tmpfile(filename, data):
     # Create a temporary in the same directory as the target file to ensure
     # the new file is on the same filesystem
-    tmpf = tempfile.NamedTemporaryFile(mode="w", delete=False,
-            dir=os.path.dirname(filename) or '.', prefix="." + os.path.basename(filename))
-    tmpf.write(data)
-    tmpf.close()
-
-    # Change the permissions (currently 0600) to match the original file
-    if os.path.exists(filename):
-        m = os.stat(filename).st_mode
-    else:
-        m = 0o0644
-    eintr_retry_call(os.chmod, filename, m)
+    fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(filename) or '.',
+                                   prefix="." + os.path.basename(filename))
+    try:
+        # Change the permissions (currently 0600) to match the original file
+        try:
+            m = stat.S_IMODE(os.stat(filename).st_mode)
+        except FileNotFoundError:
+            m = 0o0644
+        eintr_retry_call(os.fchmod, fd, m)
+
+        with os.fdopen(fd, "w") as tmpf:
+            fd = None
+            tmpf.write(data)
+    except: # pylint: disable=bare-except
+        if fd is not None:
+            eintr_ignore(os.close, fd)
+        os.unlink(tmpname)
+        raise
 
     # Move the temporary file over the top of the original
-    os.rename(tmpf.name, filename)
+    os.rename(tmpname, filename)
 
 class SimpleConfigFile(object):
     """ Edit values in a configuration file without changing comments.
@@ -104,22 +109,27 @@ class SimpleConfigFile(object):
         self.reset()
 
     def reset(self):
+        # (line, key, comment) of every line read, key is None for the lines
+        # that are not KEY=VALUE
         self._lines = []
+        # key -> index of its first line in self._lines
+        self._key_lines = {}
         self.info = {}
 
     def read(self, filename=None):
         """ passing filename will override the filename passed to init.
 
-            save the lines into self._lines and the key/value pairs into
-            self.info
+            save the parsed lines into self._lines and the key/value pairs
+            into self.info
         """
         filename = filename or self.filename
         with open(filename) as f:
             for line in f:
-                self._lines.append(line)
-                key, value, _comment = self._parseline(line)
+                key, value, comment = self._parseline(line)
                 if key:
                     self.info[key] = value
+                    self._key_lines.setdefault(key, len(self._lines))
+                self._lines.append((line, key, comment))
 
     def write(self, filename=None, use_tmp=True):
         """ passing filename will override the filename passed to init.
@@ -188,24 +198,17 @@ class SimpleConfigFile(object):
         """ Return the file that was read, replacing existing keys with new values
             removing keys that have been deleted and adding new keys.
         """
-        oldkeys = []
-        s = ""
-        for line in self._lines:
-            key, _value, comment = self._parseline(line)
+        lines = []
+        for (line, key, comment) in self._lines:
             if key is None:
-                s += line
-            else:
-                if key not in self.info:
-                    continue
-                oldkeys.append(key)
-                s += self._kvpair(key, comment)
+                lines.append(line)
+            elif key in self.info:
+                lines.append(self._kvpair(key, comment))
 
         # Add new keys
-        for key in self.info:
-            if key not in oldkeys:
-                s += self._kvpair(key)
+        lines.extend(self._kvpair(key) for key in self.info if key not in self._key_lines)
 
-        return s
+        return "".join(lines)
 
 
 def simple_replace(fname, keys, add=True, add_comment="# Added by Anaconda"):
@@ -222,21 +225,31 @@ def simple_replace(fname, keys, add=True, add_comment="# Added by Anaconda"):
     When add is True any keys that haven't been found will be appended
     to the end of the file along with the add_comment.
     """
-    # Helper to return the line or the first matching key's string
-    def _replace(l):
-        r = [s for k,s in keys if l.startswith(k)]
-        if r:
-            return r[0]
-        else:
-            return l
-
-    # Replace lines that match any of the keys
+    # Index of the first occurrence of every key and the lengths of the keys,
+    # a line starts with a key if its prefix of that length is the key
+    first = {}
+    for idx, (k, _s) in enumerate(keys):
+        first.setdefault(k, idx)
+    lengths = sorted(set(len(k) for k in first))
+
+    # Helper to return the indexes of the keys the line starts with
+    def _matches(l):
+        return [first[l[:n]] for n in lengths if n <= len(l) and l[:n] in first]
+
+    # Replace lines that match any of the keys with the first key's string
+    lines = []
     with open(fname, "r") as f:
-        lines = [_replace(l.strip()) for l in f]
+        for l in f:
+            l = l.strip()
+            matches = _matches(l)
+            lines.append(keys[min(matches)][1] if matches else l)
 
     # Add any strings that weren't already in the file
     if add:
-        append = [s for k,s in keys if not any(l.startswith(k) for l in lines)]
+        found = set()
+        for l in lines:
+            found.update(_matches(l))
+        append = [s for k,s in keys if first[k] not in found]
         if append:
             lines += [add_comment]
             lines += append
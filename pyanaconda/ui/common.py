@@ -23,6 +23,7 @@
 import os
 import imp
 import inspect
+import json
 import sys
 import types
 
@@ -30,11 +31,17 @@ from abc import ABCMeta, abstractproperty
 
 from pyanaconda.constants import ANACONDA_ENVIRON, FIRSTBOOT_ENVIRON
 from pyanaconda.errors import RemovedModuleError
+from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
 from pykickstart.constants import FIRSTBOOT_RECONFIG, DISPLAY_MODE_TEXT
 
 import logging
 log = logging.getLogger("anaconda")
 
+# Prebuilt index of the classes in the UI module directories, written by
+# scripts/makeuimanifest when the installation image is built
+UI_MANIFEST_FILE_PATH = "/usr/share/anaconda/ui-manifest.json"
+UI_MANIFEST_VERSION = 1
+
 class UIObject(object):
     """This is the base class from which all other UI classes are derived.  It
        thus contains only attributes and methods that are common to everything
@@ -539,23 +546,12 @@ class Hub(object, metaclass=ABCMeta):
         """
         log.debug("Left hub: %s", self.__class__.__name__)
 
-def collect(module_pattern, path, pred):
-    """Traverse the directory (given by path), import all files as a module
-       module_pattern % filename and find all classes within that match
-       the given predicate.  This is then returned as a list of classes.
-
-       It is suggested you use collect_categories or collect_spokes instead of
-       this lower-level method.
-
-       :param module_pattern: the full name pattern (pyanaconda.ui.gui.spokes.%s)
-                              we want to assign to imported modules
-       :type module_pattern: string
+def _scan_modules(module_pattern, path):
+    """Import all files in the directory path as modules module_pattern % filename
+       and return the classes they contain as a list of
+       (module name, [(class name, class), ...]) tuples.
 
-       :param path: the directory we are picking up modules from
-       :type path: string
-
-       :param pred: function which marks classes as good to import
-       :type pred: function with one argument returning True or False
+       This does the actual work for collect, which caches the result.
     """
 
     retval = []
@@ -661,18 +657,179 @@ def collect(module_pattern, path, pred):
             if mod_info and mod_info[0]:
                 mod_info[0].close()
 
-        p = lambda obj: inspect.isclass(obj) and pred(obj)
-
         # if __all__ is defined in the module, use it
         if not hasattr(module, "__all__"):
-            members = inspect.getmembers(module, p)
+            members = inspect.getmembers(module, inspect.isclass)
         else:
             members = [(name, getattr(module, name))
                        for name in module.__all__
-                       if p(getattr(module, name))]
+                       if inspect.isclass(getattr(module, name))]
 
-        for (_name, val) in members:
-            retval.append(val)
+        retval.append((mod_name, members))
+
+    return retval
+
+class _ModuleRegistry(object):
+    """Index of the classes found in the UI module directories.
+
+       Hubs collect their categories and spokes on every start, once for each
+       category, from the GUI or TUI directories plus every add-on. Each
+       directory is scanned only once and the classes it contains are kept
+       along with the directory's mtime, so the scan is only repeated when
+       modules are added or removed.
+
+       Directories listed in the manifest file (see write_manifest) with a
+       matching mtime are not scanned at all, only the modules known to
+       contain classes are imported. Directories missing from it, like those
+       of add-ons, are scanned as usual.
+    """
+
+    def __init__(self, manifest_path=UI_MANIFEST_FILE_PATH):
+        self.manifest_path = manifest_path
+        self._manifest = None
+        self._index = {}
+
+    @staticmethod
+    def _mtime(path):
+        # whole seconds, squashfs doesn't keep anything finer
+        return int(os.stat(path).st_mtime)
+
+    def _load_manifest(self):
+        manifest = {}
+        try:
+            with open(self.manifest_path, "r") as fobj:
+                data = json.load(fobj)
+            if data.get("version") == UI_MANIFEST_VERSION:
+                for entry in data["paths"]:
+                    manifest[(entry["pattern"], entry["path"])] = entry
+                log.debug("loaded UI manifest from %s", self.manifest_path)
+            else:
+                log.warning("ignoring UI manifest %s with version %s",
+                            self.manifest_path, data.get("version"))
+        except (IOError, ValueError, KeyError, TypeError) as err:
+            log.debug("no UI manifest loaded from %s: %s", self.manifest_path, err)
+
+        self._manifest = manifest
+
+    def _from_manifest(self, module_pattern, path, mtime):
+        """Return the modules listed in the manifest for path or None if
+           the directory has to be scanned.
+        """
+        if self._manifest is None:
+            self._load_manifest()
+
+        entry = self._manifest.get((module_pattern, path))
+        if not entry or entry["mtime"] != mtime:
+            return None
+
+        modules = []
+        for (mod_name, class_names) in entry["modules"]:
+            name = module_pattern % mod_name
+            try:
+                module = sys.modules.get(name)
+                if not module:
+                    __import__(name)
+                    module = sys.modules[name]
+                members = [(n, getattr(module, n)) for n in class_names]
+            except (ImportError, RemovedModuleError, AttributeError) as err:
+                log.debug("UI manifest entry %s is stale: %s", name, err)
+                return None
+
+            # the module comes from somewhere else (updates image), scan instead
+            if os.path.dirname(module.__file__) != path:
+                return None
+
+            modules.append((mod_name, members))
+
+        return modules
+
+    def modules(self, module_pattern, path):
+        """Return the (module name, [(class name, class), ...]) list of the
+           directory path, see _scan_modules.
+        """
+        try:
+            mtime = self._mtime(path)
+        # when the directory "path" does not exist
+        except OSError:
+            return []
+
+        key = (module_pattern, path)
+        cached = self._index.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        modules = self._from_manifest(module_pattern, path, mtime)
+        if modules is None:
+            modules = _scan_modules(module_pattern, path)
+
+        self._index[key] = (mtime, modules)
+        return modules
+
+    def reset(self):
+        """Forget everything, including the manifest."""
+        self._manifest = None
+        self._index = {}
+
+    def write_manifest(self, mask_paths, manifest_path=None):
+        """Scan the (mask, path) directories and write them to a manifest file.
+
+           :param mask_paths: list of (mask, path) tuples to index
+           :param str manifest_path: file to write, the registry's manifest by default
+        """
+        entries = []
+        for (mask, path) in mask_paths:
+            if not os.path.isdir(path) or \
+               any(e["pattern"] == mask and e["path"] == path for e in entries):
+                continue
+
+            modules = _scan_modules(mask, path)
+            entries.append({"pattern": mask, "path": path, "mtime": self._mtime(path),
+                            "modules": [[mod_name, [name for (name, _cls) in members]]
+                                        for (mod_name, members) in modules]})
+
+        manifest_path = manifest_path or self.manifest_path
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w") as fobj:
+            json.dump({"version": UI_MANIFEST_VERSION, "paths": entries},
+                      fobj, sort_keys=True, separators=(",", ":"))
+        os.rename(tmp_path, manifest_path)
+
+_registry = _ModuleRegistry()
+
+def write_manifest(mask_paths, path=UI_MANIFEST_FILE_PATH):
+    """Write the UI manifest for the (mask, path) directories, this is meant
+       to be done when the installation image is built.
+
+       :param mask_paths: list of (mask, path) tuples to index
+       :param str path: where to write the manifest
+    """
+    _registry.write_manifest(mask_paths, path)
+
+def collect(module_pattern, path, pred):
+    """Traverse the directory (given by path), import all files as a module
+       module_pattern % filename and find all classes within that match
+       the given predicate.  This is then returned as a list of classes.
+
+       The directory is only traversed the first time, later calls pick the
+       classes from the module registry.
+
+       It is suggested you use collect_categories or collect_spokes instead of
+       this lower-level method.
+
+       :param module_pattern: the full name pattern (pyanaconda.ui.gui.spokes.%s)
+                              we want to assign to imported modules
+       :type module_pattern: string
+
+       :param path: the directory we are picking up modules from
+       :type path: string
+
+       :param pred: function which marks classes as good to import
+       :type pred: function with one argument returning True or False
+    """
+
+    retval = []
+    for (_mod_name, members) in _registry.modules(module_pattern, path):
+        retval.extend(val for (_name, val) in members if pred(val))
 
     return retval
 
@@ -725,7 +882,14 @@ def collectCategoriesAndSpokes(paths, klass, displaymode):
     else:
         categories = sorted(filter(lambda c: c.displayOnHubGUI == klass.__name__, collect_categories(paths["categories"], displaymode)),
                             key=lambda c: c.sortOrder)
+
+    # collect the spokes of all categories at once
+    spokes = {}
+    for mask, path in paths["spokes"]:
+        for spoke in collect(mask, path, lambda obj: getattr(obj, "category", None) is not None):
+            spokes.setdefault(spoke.category.__name__, []).append(spoke)
+
     for c in categories:
-        ret[c] = collect_spokes(paths["spokes"], c.__name__)
+        ret[c] = spokes.get(c.__name__, [])
 
     return ret
@@ -149,17 +149,11 @@ class GUIObject(common.UIObject):
         self.skipTo = None
         self.applyOnSkip = False
 
-        self.builder = Gtk.Builder()
-        self.builder.set_translation_domain(self.translationDomain)
+        # The UI file is loaded the first time the builder is used, see the
+        # builder property.
+        self._builder = None
         self._window = None
 
-        if self.builderObjects:
-            self.builder.add_objects_from_file(self._findUIFile(), self.builderObjects)
-        else:
-            self.builder.add_from_file(self._findUIFile())
-
-        self.builder.connect_signals(self)
-
         # Keybinder from GI needs to be initialized before use
         Keybinder.init()
         Keybinder.bind("<Shift>Print", self._handlePrntScreen, [])
@@ -172,6 +166,41 @@ class GUIObject(common.UIObject):
         # this indicates if the screen is the last spoke to be processed for a hub
         self.lastAutostepSpoke = False
 
+    @property
+    def builder(self):
+        """The Gtk.Builder holding the objects from uiFile.
+
+           Parsing the UI file is what makes creating a GUIObject expensive, so
+           it is only done when the builder is first needed. Spokes on a hub
+           that are never entered don't have to pay for it before the hub is
+           shown.
+        """
+        if self._builder is None:
+            builder = Gtk.Builder()
+            builder.set_translation_domain(self.translationDomain)
+
+            if self.builderObjects:
+                builder.add_objects_from_file(self._findUIFile(), self.builderObjects)
+            else:
+                builder.add_from_file(self._findUIFile())
+
+            self._builder = builder
+            builder.connect_signals(self)
+            self._builderLoaded()
+
+        return self._builder
+
+    @builder.setter
+    def builder(self, value):
+        self._builder = value
+
+    def _builderLoaded(self):
+        """Called once the objects from uiFile have been loaded.  Subclasses
+           can override this to connect to signals of their window without
+           forcing the UI file to be loaded in __init__.
+        """
+        pass
+
     def _findUIFile(self):
         path = os.environ.get("UIPATH", "./:/tmp/updates/:/tmp/updates/ui/:/usr/share/anaconda/ui/")
         dirs = path.split(":")
@@ -23,14 +23,20 @@
 # functionality. See also pyanaconda.ui.helpers.
 
 from abc import ABCMeta, abstractproperty, abstractmethod
+import hashlib
+import threading
 
 import gi
 gi.require_version("Gtk", "3.0")
+gi.require_version("GLib", "2.0")
 
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
 
+from pyanaconda.constants import THREAD_PASSWORD_QUALITY
+from pyanaconda.threads import threadMgr, AnacondaThread
+from pyanaconda.users import validatePassword
 from pyanaconda.ui.helpers import InputCheck, InputCheckHandler
-from pyanaconda.ui.gui.utils import timed_action
+from pyanaconda.ui.gui.utils import timed_action, gtk_call_once
 
 class GUIInputCheck(InputCheck):
     """ Add timer awareness to an InputCheck.
@@ -206,3 +212,105 @@ class GUISpokeInputCheckHandler(GUIInputCheckHandler, metaclass=ABCMeta):
             return False
         else:
             return True
+
+# validatePassword changes the shared PWQSettings, only check one password at a time
+_validate_lock = threading.Lock()
+
+class PasswordQualityChecker(object):
+    """ Evaluate the quality of a password outside of the main loop.
+
+        check() waits for the typing to pause, runs validatePassword in a
+        thread and passes the result to the callback in the main loop.
+        Results are kept per password hash, user and minimal length for
+        the life of the checker, so a password is only ever checked once.
+    """
+
+    def __init__(self, callback, delay=150):
+        """
+            :param callback: called in the main loop with the result of
+                             validatePassword for the last checked password
+            :param int delay: milliseconds to wait for another keystroke
+        """
+        self._callback = callback
+        self._delay = delay
+        self._results = {}
+        self._running = {}
+        self._lock = threading.Lock()
+        self._timer_id = None
+        self._current = None
+
+    @staticmethod
+    def _key(password, user, minlen):
+        return (hashlib.sha256(password.encode("utf-8")).hexdigest(), user, minlen)
+
+    def check(self, password, user, minlen):
+        """ Start checking password, replacing any check not yet started. """
+        key = self._key(password, user, minlen)
+        self._current = key
+
+        if self._timer_id is not None:
+            GLib.source_remove(self._timer_id)
+            self._timer_id = None
+
+        with self._lock:
+            result = self._results.get(key)
+
+        if result is not None:
+            self._callback(result)
+        else:
+            self._timer_id = GLib.timeout_add(self._delay, self._start, key,
+                                              password, user, minlen)
+
+    def _start(self, key, password, user, minlen):
+        self._timer_id = None
+        with self._lock:
+            if key in self._results or key in self._running:
+                return False
+            self._running[key] = threading.Event()
+
+        threadMgr.add(AnacondaThread(prefix=THREAD_PASSWORD_QUALITY, fatal=False,
+                                     target=self._evaluate,
+                                     args=(key, password, user, minlen)))
+        return False
+
+    def _validate(self, key, password, user, minlen):
+        with _validate_lock:
+            result = validatePassword(password, user, minlen=minlen)
+        with self._lock:
+            self._results[key] = result
+        return result
+
+    def _evaluate(self, key, password, user, minlen):
+        try:
+            result = self._validate(key, password, user, minlen)
+        finally:
+            with self._lock:
+                done = self._running.pop(key)
+            done.set()
+
+        gtk_call_once(self._finished, key, result)
+
+    def _finished(self, key, result):
+        # Ignore the results of passwords that have been typed over since
+        if key == self._current:
+            self._callback(result)
+
+    def result(self, password, user, minlen):
+        """ Return the result of validatePassword for password.
+
+            Wait for a running check of the same password, or check it in
+            the calling thread if no check was started yet.
+        """
+        key = self._key(password, user, minlen)
+        with self._lock:
+            result = self._results.get(key)
+            running = self._running.get(key)
+
+        if result is None and running is not None:
+            running.wait()
+            with self._lock:
+                result = self._results.get(key)
+
+        if result is None:
+            result = self._validate(key, password, user, minlen)
+        return result
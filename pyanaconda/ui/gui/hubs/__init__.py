@@ -19,6 +19,8 @@
 # Red Hat Author(s): Chris Lumens <clumens@redhat.com>
 #
 
+import time
+
 import gi
 gi.require_version("GLib", "2.0")
 
@@ -97,6 +99,10 @@ class Hub(GUIObject, common.Hub):
         self._notReadySpokes = []
         self._spokes = {}
 
+        # Spokes that were created but not initialized yet, see _createBox
+        self._pendingSpokes = []
+        self._createStart = None
+
         # Used to store the last result of _updateContinue
         self._warningMsg = None
 
@@ -111,6 +117,8 @@ class Hub(GUIObject, common.Hub):
 
         from gi.repository import Gtk, AnacondaWidgets
 
+        self._createStart = time.time()
+
         cats_and_spokes = self._collectCategoriesAndSpokes()
         categories = cats_and_spokes.keys()
 
@@ -128,11 +136,10 @@ class Hub(GUIObject, common.Hub):
                 if not any(spokeClass.should_run(environ, self.data) for environ in self._environs):
                     continue
 
-                # Create the new spoke and populate its UI with whatever data.
-                # From here on, this Spoke will always exist.
+                # Create the new spoke.  From here on, this Spoke will always
+                # exist.  Its UI file is not loaded yet, that happens when it is
+                # initialized after the hub is shown.
                 spoke = spokeClass(self.data, self.storage, self.payload, self.instclass)
-                spoke.window.set_beta(self.window.get_beta())
-                spoke.window.set_property("distribution", distributionText().upper())
 
                 # If a spoke is not showable, it is unreachable in the UI.  We
                 # might as well get rid of it.
@@ -145,6 +152,7 @@ class Hub(GUIObject, common.Hub):
                 # This allows being able to jump between two spokes without
                 # having to directly involve the hub.
                 self._spokes[spokeClass.__name__] = spoke
+                self._pendingSpokes.append(spoke)
 
                 # If a spoke is indirect, it is reachable but not directly from
                 # a hub.  This is for things like the custom partitioning spoke,
@@ -154,31 +162,21 @@ class Hub(GUIObject, common.Hub):
                 # NOTE:  This only makes sense for NormalSpokes.  Other kinds
                 # of spokes do not involve a hub.
                 if spoke.indirect:
-                    spoke.initialize()
                     continue
 
+                # The title and icon are class attributes, so the selector can
+                # be shown before the spoke is initialized.
                 spoke.selector = AnacondaWidgets.SpokeSelector(C_("GUI|Spoke", spoke.title),
                         spoke.icon)
 
                 # Set all selectors to insensitive before initialize runs.  The call to
                 # _updateCompleteness later will take care of setting it straight.
                 spoke.selector.set_sensitive(False)
-                spoke.initialize()
-
-                if not spoke.ready:
-                    self._notReadySpokes.append(spoke)
-
-                # Set some default values on the associated selector that
-                # affect its display on the hub.
-                self._updateCompleteness(spoke, update_continue=False)
                 spoke.selector.connect("button-press-event", self._on_spoke_clicked, spoke)
                 spoke.selector.connect("key-release-event", self._on_spoke_clicked, spoke)
 
-                # If this is a kickstart install, attempt to execute any provided ksdata now.
-                if flags.automatedInstall and spoke.ready and spoke.changed and \
-                   spoke.visitedSinceApplied:
-                    spoke.execute()
-                    spoke.visitedSinceApplied = False
+                # Not ready until initialized
+                self._notReadySpokes.append(spoke)
 
                 selectors.append(spoke.selector)
 
@@ -211,6 +209,54 @@ class Hub(GUIObject, common.Hub):
 
         self._updateContinue()
 
+        # Initialize the spokes one at a time from the main loop, so the hub
+        # shows up and takes input before all of them have loaded their UI.
+        # Indirect spokes go last, they are only entered from other spokes.
+        self._pendingSpokes.sort(key=lambda s: s.indirect)
+        log.debug("%s created with %d spokes in %.2f seconds", self.__class__.__name__,
+                  len(self._spokes), time.time() - self._createStart)
+        GLib.idle_add(self._initializePendingSpoke)
+
+    def _initializeSpoke(self, spoke):
+        """Load the spoke's UI, initialize it and update its selector."""
+        self._pendingSpokes.remove(spoke)
+
+        spoke.window.set_beta(self.window.get_beta())
+        spoke.window.set_property("distribution", distributionText().upper())
+        spoke.initialize()
+
+        if spoke.indirect:
+            return
+
+        if spoke.ready:
+            self._notReadySpokes.remove(spoke)
+
+        # Set some default values on the associated selector that
+        # affect its display on the hub.
+        self._updateCompleteness(spoke)
+
+        # If this is a kickstart install, attempt to execute any provided ksdata now.
+        if flags.automatedInstall and spoke.ready and spoke.changed and \
+           spoke.visitedSinceApplied:
+            spoke.execute()
+            spoke.visitedSinceApplied = False
+
+    def _initializePendingSpoke(self):
+        if not self._pendingSpokes:
+            return False
+
+        self._initializeSpoke(self._pendingSpokes[0])
+
+        if self._pendingSpokes:
+            return True
+
+        log.debug("all spokes on %s initialized %.2f seconds after the hub was created",
+                  self.__class__.__name__, time.time() - self._createStart)
+
+        # handle the messages held back while spokes were being initialized
+        self._update_spokes()
+        return False
+
     def _updateCompleteness(self, spoke, update_continue=True):
         spoke.selector.set_sensitive(spoke.sensitive and spoke.ready)
         spoke.selector.set_property("status", spoke.status)
@@ -260,9 +306,11 @@ class Hub(GUIObject, common.Hub):
 
     def _update_spokes(self):
         from pyanaconda.ui.communication import hubQ
-        import queue
 
-        q = hubQ.q
+        # Keep the messages until all spokes are initialized, just like if
+        # they were all initialized before the hub was shown.
+        if self._pendingSpokes:
+            return True
 
         if not self._spokes and self.window.get_may_continue():
             # no spokes, move on
@@ -271,17 +319,11 @@ class Hub(GUIObject, common.Hub):
 
         click_continue = False
         # Grab all messages that may have appeared since last time this method ran.
-        while True:
-            try:
-                (code, args) = q.get(False)
-            except queue.Empty:
-                break
-
+        for (code, args) in hubQ.drain():
             # The first argument to all codes is the name of the spoke we are
             # acting on.  If no such spoke exists, throw the message away.
             spoke = self._spokes.get(args[0], None)
             if not spoke or spoke.__class__.__name__ not in self._spokes:
-                q.task_done()
                 continue
 
             if code == hubQ.HUB_CODE_NOT_READY:
@@ -329,8 +371,6 @@ class Hub(GUIObject, common.Hub):
                 spoke.selector.set_property("status", args[1])
                 log.debug("setting %s status to: %s", spoke, args[1])
 
-            q.task_done()
-
         # queue is now empty, should continue be clicked?
         if self._autoContinue and click_continue and self.window.get_may_continue():
             # enqueue the emit to the Gtk message queue
@@ -340,10 +380,18 @@ class Hub(GUIObject, common.Hub):
         return True
 
     def refresh(self):
+        from pyanaconda.ui.communication import hubQ
+
         GUIObject.refresh(self)
         self._createBox()
 
-        GLib.timeout_add(100, self._update_spokes)
+        # _update_spokes runs whenever there are new messages
+        hubQ.watch(self._update_spokes)
+
+        # A hub without spokes moves on by itself as soon as it may continue
+        if not self._spokes:
+            self.window.get_continue_button().connect("notify::sensitive",
+                                                      lambda *args: self._update_spokes())
 
     ### SIGNAL HANDLERS
 
@@ -363,6 +411,11 @@ class Hub(GUIObject, common.Hub):
         if selector:
             selector.grab_focus()
 
+        # The spoke may be entered (autostep, skipTo) before its turn to be
+        # initialized came.
+        if spoke in self._pendingSpokes:
+            self._initializeSpoke(spoke)
+
         # On automated kickstart installs, our desired behavior is to display
         # the hub while background processes work, then skip to the progress
         # hub immediately after everything's done.
@@ -403,7 +456,7 @@ class Hub(GUIObject, common.Hub):
 
         # Now update the selector with the current status and completeness.
         for sp in self._spokes.values():
-            if not sp.indirect:
+            if not sp.indirect and sp not in self._pendingSpokes:
                 self._updateCompleteness(sp, update_continue=False)
 
         self._updateContinue()
@@ -24,10 +24,10 @@
 import gi
 gi.require_version("GLib", "2.0")
 gi.require_version("Gtk", "3.0")
+gi.require_version("GdkPixbuf", "2.0")
 
-from gi.repository import GLib, Gtk
+from gi.repository import GLib, Gtk, GdkPixbuf
 
-import itertools
 import os
 import sys
 import glob
@@ -37,12 +37,16 @@ from pyanaconda.localization import find_best_locale_match
 from pyanaconda.product import productName
 from pyanaconda.flags import flags
 from pyanaconda import iutil
+from pyanaconda.progress import progressQ
 from pyanaconda.constants import THREAD_INSTALL, THREAD_CONFIGURATION, DEFAULT_LANG, IPMI_FINISHED
 from pykickstart.constants import KS_SHUTDOWN, KS_REBOOT
 
 from pyanaconda.ui.gui.hubs import Hub
 from pyanaconda.ui.gui.utils import gtk_action_nowait, gtk_call_once
 
+import logging
+log = logging.getLogger("anaconda")
+
 __all__ = ["ProgressHub"]
 
 class ProgressHub(Hub):
@@ -64,6 +68,16 @@ class ProgressHub(Hub):
 
         self._rnotes_id = None
 
+        # release notes image files, shown one at a time on self._rnotesPage
+        self._rnotes = []
+        self._rnotesIndex = 0
+        self._rnotesPage = None
+        self._rnotesImage = None
+        # (path, pixbuf) of the image to be shown next
+        self._rnotesNext = None
+        # size-allocate handler waiting for the notebook to get its size
+        self._rnotesAllocId = None
+
     def _do_configuration(self, widget=None, reenable_ransom=True):
         from pyanaconda.install import doConfiguration
         from pyanaconda.threads import threadMgr, AnacondaThread
@@ -80,7 +94,7 @@ class ProgressHub(Hub):
 
         self._restart_spinner()
 
-        GLib.timeout_add(250, self._update_progress, self._configuration_done)
+        progressQ.watch(self._update_progress, self._configuration_done)
         threadMgr.add(AnacondaThread(name=THREAD_CONFIGURATION, target=doConfiguration,
                                      args=(self.storage, self.payload, self.data, self.instclass)))
 
@@ -91,20 +105,9 @@ class ProgressHub(Hub):
         self._rnotes_id = GLib.timeout_add_seconds(60, self._cycle_rnotes)
 
     def _update_progress(self, callback=None):
-        from pyanaconda.progress import progressQ
-        import queue
-
-        q = progressQ.q
-
         # Grab all messages may have appeared since last time this method ran.
-        while True:
-            # Attempt to get a message out of the queue for how we should update
-            # the progress bar.  If there's no message, don't error out.
-            try:
-                (code, args) = q.get(False)
-            except queue.Empty:
-                break
-
+        messages = progressQ.drain()
+        for (i, (code, args)) in enumerate(messages):
             if code == progressQ.PROGRESS_CODE_INIT:
                 self._init_progress_bar(args[0])
             elif code == progressQ.PROGRESS_CODE_STEP:
@@ -112,7 +115,8 @@ class ProgressHub(Hub):
             elif code == progressQ.PROGRESS_CODE_MESSAGE:
                 self._update_progress_message(args[0])
             elif code == progressQ.PROGRESS_CODE_COMPLETE:
-                q.task_done()
+                # leave whatever came after for the next watch
+                progressQ.requeue(messages[i + 1:])
 
                 # we are done, stop the progress indication
                 gtk_call_once(self._progressBar.set_fraction, 1.0)
@@ -124,13 +128,11 @@ class ProgressHub(Hub):
                     callback()
 
                 # There shouldn't be any more progress bar updates, so return False
-                # to indicate this method should be removed from the idle loop.
+                # to indicate this method should stop watching the queue.
                 return False
             elif code == progressQ.PROGRESS_CODE_QUIT:
                 sys.exit(args[0])
 
-            q.task_done()
-
         return True
 
 
@@ -197,17 +199,72 @@ class ProgressHub(Hub):
 
         return best_lang_pixmaps
 
-    def _cycle_rnotes(self):
-        # Change the ransom notes image every minute by grabbing the next
-        # image's filename.  Note that self._rnotesPages is an infinite list,
-        # so this will cycle through the images indefinitely.
+    def _notebook_allocated(self):
+        """Return whether the notebook has its size, it doesn't until it is shown."""
+        return self._progressNotebook.get_allocated_width() > 1 and \
+               self._progressNotebook.get_allocated_height() > 1
+
+    def _load_rnote(self, path):
+        """Decode a ransom notes image, scaled down to fit the notebook.
+
+           The notebook has to be allocated already.
+        """
+        width = self._progressNotebook.get_allocated_width()
+        height = self._progressNotebook.get_allocated_height()
+
         try:
-            nxt = next(self._rnotesPages)
-        except StopIteration:
-            # there are no rnotes
-            pass
-        else:
-            self._progressNotebook.set_current_page(nxt)
+            (_fmt, img_width, img_height) = GdkPixbuf.Pixbuf.get_file_info(path)
+            if img_width > width or img_height > height:
+                return GdkPixbuf.Pixbuf.new_from_file_at_scale(path, width, height, True)
+
+            return GdkPixbuf.Pixbuf.new_from_file(path)
+        except (GLib.Error, TypeError) as e:
+            log.error("failed to load ransom notes image %s: %s", path, e)
+            return None
+
+    def _prefetch_rnote(self):
+        path = self._rnotes[self._rnotesIndex]
+        self._rnotesNext = (path, self._load_rnote(path))
+        return False
+
+    def _show_next_rnote(self):
+        # Only the image shown and the next one are decoded, the next one in
+        # the background once the current one is up.
+        if self._rnotes and (len(self._rnotes) > 1 or self._rnotesNext is None):
+            path = self._rnotes[self._rnotesIndex]
+            if self._rnotesNext and self._rnotesNext[0] == path:
+                pixbuf = self._rnotesNext[1]
+            else:
+                pixbuf = self._load_rnote(path)
+
+            self._rnotesImage.set_from_pixbuf(pixbuf)
+            self._rnotesNext = (path, pixbuf)
+
+            self._rnotesIndex = (self._rnotesIndex + 1) % len(self._rnotes)
+            if len(self._rnotes) > 1:
+                GLib.idle_add(self._prefetch_rnote, priority=GLib.PRIORITY_LOW)
+
+        return False
+
+    def _on_notebook_allocated(self, notebook, allocation):
+        if allocation.width <= 1 or allocation.height <= 1:
+            return
+
+        notebook.disconnect(self._rnotesAllocId)
+        self._rnotesAllocId = None
+        # don't change the image while the sizes are being allocated
+        GLib.idle_add(self._show_next_rnote)
+
+    def _cycle_rnotes(self):
+        # Change the ransom notes image every minute.  The images are scaled
+        # to the notebook, so the first one waits until it has its size.
+        if self._notebook_allocated():
+            self._show_next_rnote()
+        elif self._rnotesAllocId is None:
+            self._rnotesAllocId = self._progressNotebook.connect("size-allocate",
+                                                                 self._on_notebook_allocated)
+
+        self._progressNotebook.set_current_page(self._rnotesPage)
 
         return True
 
@@ -235,26 +292,13 @@ class ProgressHub(Hub):
         lbl.set_text(_("%s is now successfully installed and ready for you to use!\n"
                 "Go ahead and reboot to start using it!") % productName)
 
-        rnotes = self._get_rnotes()
-        # Get the start of the pages we're about to add to the notebook
-        rnotes_start = self._progressNotebook.get_n_pages()
-        if rnotes:
-            # Add a new page in the notebook for each ransom note image.
-            for f in rnotes:
-                img = Gtk.Image.new_from_file(f)
-                img.show()
-                self._progressNotebook.append_page(img, None)
-
-            # An infinite list of the page numbers containing ransom notes images.
-            self._rnotesPages = itertools.cycle(range(rnotes_start,
-                self._progressNotebook.get_n_pages()))
-        else:
-            # Add a blank page to the notebook and we'll just cycle to that
-            # over and over again.
-            blank = Gtk.Box()
-            blank.show()
-            self._progressNotebook.append_page(blank, None)
-            self._rnotesPages = itertools.cycle([rnotes_start])
+        # Look up the images for the current language once.  They are only
+        # decoded when it is their turn to be shown, see _cycle_rnotes.  With
+        # no images the page just stays blank.
+        self._rnotes = sorted(self._get_rnotes())
+        self._rnotesImage = Gtk.Image()
+        self._rnotesImage.show()
+        self._rnotesPage = self._progressNotebook.append_page(self._rnotesImage, None)
 
     def refresh(self):
         from pyanaconda.install import doInstall
@@ -263,7 +307,7 @@ class ProgressHub(Hub):
         Hub.refresh(self)
 
         self._start_ransom_notes()
-        GLib.timeout_add(250, self._update_progress, self._install_done)
+        progressQ.watch(self._update_progress, self._install_done)
         threadMgr.add(AnacondaThread(name=THREAD_INSTALL, target=doInstall,
                                      args=(self.storage, self.payload, self.data, self.instclass)))
 
@@ -40,6 +40,9 @@ class StandaloneSpoke(GUIObject, common.StandaloneSpoke):
         GUIObject.__init__(self, data)
         common.StandaloneSpoke.__init__(self, storage, payload, instclass)
 
+    def _builderLoaded(self):
+        GUIObject._builderLoaded(self)
+
         # Add a continue-clicked handler to save the data before leaving the window
         self.window.connect("continue-clicked", self._on_continue_clicked)
 
@@ -62,6 +65,9 @@ class NormalSpoke(GUIObject, common.NormalSpoke):
         GUIObject.__init__(self, data)
         common.NormalSpoke.__init__(self, storage, payload, instclass)
 
+    def _builderLoaded(self):
+        GUIObject._builderLoaded(self)
+
         # Add a help handler
         self.window.connect_after("help-button-clicked", self._on_help_clicked)
 
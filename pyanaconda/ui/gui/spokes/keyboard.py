@@ -283,10 +283,11 @@ class KeyboardSpoke(NormalSpoke):
         self._add_dialog = None
         self._ready = False
 
-        self._upButton = self.builder.get_object("upButton")
-        self._downButton = self.builder.get_object("downButton")
-        self._removeButton = self.builder.get_object("removeLayoutButton")
-        self._previewButton = self.builder.get_object("previewButton")
+        # set in initialize, so that the UI file isn't loaded before
+        self._upButton = None
+        self._downButton = None
+        self._removeButton = None
+        self._previewButton = None
 
     def apply(self):
         # the user has confirmed (seen) the configuration
@@ -326,6 +327,11 @@ class KeyboardSpoke(NormalSpoke):
 
     def initialize(self):
         NormalSpoke.initialize(self)
+        self._upButton = self.builder.get_object("upButton")
+        self._downButton = self.builder.get_object("downButton")
+        self._removeButton = self.builder.get_object("removeLayoutButton")
+        self._previewButton = self.builder.get_object("previewButton")
+
         self._add_dialog = AddLayoutDialog(self.data)
         self._add_dialog.initialize()
 
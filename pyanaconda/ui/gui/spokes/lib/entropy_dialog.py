@@ -19,7 +19,6 @@
 # Red Hat Author(s): Vratislav Podzimek <vpodzime@redhat.com>
 #
 
-import time
 import math
 
 import gi
@@ -29,16 +28,18 @@ gi.require_version("GLib", "2.0")
 from gi.repository import Gtk, GLib
 
 from pyanaconda.i18n import P_
-from pyanaconda.constants import MAX_ENTROPY_WAIT
 from pyanaconda.ui.gui import GUIObject
 from pyanaconda.ui.gui.utils import gtk_action_wait
-from blivet.util import get_current_entropy
+from pyanaconda.ui.lib.entropy import EntropyWaiter
 
 __all__ = ["run_entropy_dialog"]
 
 # in milliseconds
 LOOP_TIMEOUT = 250
 
+# in seconds
+STOP_TYPING_TIMEOUT = 3
+
 @gtk_action_wait
 def run_entropy_dialog(ksdata, desired_entropy):
     """Show dialog with waiting for entropy"""
@@ -58,45 +59,63 @@ class EntropyDialog(GUIObject):
         self._desired_entropy = desired_entropy
         self._progress_bar = self.builder.get_object("progressBar")
         self._terminate = False
-        self._started = 0
+        self._waiter = None
+        self._watch_id = None
         self.force_cont = False
-        self._num_loops = 0
 
     def run(self):
         self.window.show_all()
 
-        # XXX: Is it better to rely on Gtk running the self._update_progress
-        # method every ~250msec or rely on NTP not changing system time right
-        # now and use time.time()?
-        self._num_loops = 0
-        GLib.timeout_add(LOOP_TIMEOUT, self._update_progress)
-        Gtk.main()
+        with EntropyWaiter(self._desired_entropy) as self._waiter:
+            # the progress is refreshed periodically, but the dialog is done
+            # as soon as the kernel tells us there is enough entropy
+            fd = self._waiter.fileno()
+            if fd is not None:
+                self._watch_id = GLib.io_add_watch(fd, GLib.PRIORITY_DEFAULT, GLib.IO_IN,
+                                                   self._entropy_ready)
+            if self._update_progress():
+                GLib.timeout_add(LOOP_TIMEOUT, self._update_progress)
+            Gtk.main()
+
+            # the waiter closes the file descriptor
+            if self._watch_id is not None:
+                GLib.source_remove(self._watch_id)
+                self._watch_id = None
         self.window.destroy()
 
+    def _entropy_ready(self, _fd, _condition):
+        # the periodic update takes over if there is still not enough entropy
+        self._watch_id = None
+        self._update_progress()
+        return False
+
+    def _quit(self):
+        Gtk.main_quit()
+        return False
+
     def _update_progress(self):
         if self._terminate:
-            # give users time to realize they should stop typing
-            time.sleep(3)
-            Gtk.main_quit()
-            # remove the method from idle queue
+            # already waiting for the user to stop typing
             return False
-        else:
-            self._num_loops += 1
-            current_entropy = get_current_entropy()
-            current_fraction = min(float(current_entropy) / self._desired_entropy, 1.0)
-            remaining = (MAX_ENTROPY_WAIT * 1000 - self._num_loops * LOOP_TIMEOUT) / 1000 / 60.0
 
-            self._progress_bar.set_fraction(current_fraction)
-            self._progress_bar.set_text("%(pct)d %% (%(rem)d %(min)s remaining)" % {"pct": (int(current_fraction * 100)),
-                                                                                    "rem": math.ceil(remaining),
-                                                                                    "min": P_("minute", "minutes", int(remaining))})
+        current_entropy = self._waiter.entropy
+        current_fraction = min(float(current_entropy) / self._desired_entropy, 1.0)
+        remaining = self._waiter.remaining / 60.0
 
-            # if we have enough our time ran out, terminate the dialog, but let
-            # the progress_bar refresh in the main loop
-            self._terminate = (current_entropy >= self._desired_entropy) or (remaining <= 0)
+        self._progress_bar.set_fraction(current_fraction)
+        self._progress_bar.set_text("%(pct)d %% (%(rem)d %(min)s remaining)" % {"pct": (int(current_fraction * 100)),
+                                                                                "rem": math.ceil(remaining),
+                                                                                "min": P_("minute", "minutes", int(remaining))})
 
-            self.force_cont = (remaining <= 0)
+        # if we have enough or our time ran out, terminate the dialog, but give
+        # users time to realize they should stop typing without blocking the
+        # main loop
+        self._terminate = (current_entropy >= self._desired_entropy) or (remaining <= 0)
+        self.force_cont = (current_entropy < self._desired_entropy)
 
-            # keep updating
-            return True
+        if self._terminate:
+            GLib.timeout_add_seconds(STOP_TYPING_TIMEOUT, self._quit)
+            return False
 
+        # keep updating
+        return True
@@ -1403,12 +1403,8 @@ class NetworkSpoke(FirstbootSpokeMixIn, NormalSpoke):
 
     def __init__(self, *args, **kwargs):
         NormalSpoke.__init__(self, *args, **kwargs)
-        self.network_control_box = NetworkControlBox(self.builder, nmclient, spoke=self)
-        self.network_control_box.hostname = self.data.network.hostname
-        self.network_control_box.connect("nm-state-changed",
-                                         self.on_nm_state_changed)
-        self.network_control_box.connect("device-state-changed",
-                                         self.on_device_state_changed)
+        # created in initialize, it needs the objects from the UI file
+        self.network_control_box = None
         # true if network settings change (hostname excluded)
         self._network_change = False
 
@@ -1444,6 +1440,12 @@ class NetworkSpoke(FirstbootSpokeMixIn, NormalSpoke):
     def initialize(self):
         register_secret_agent(self)
         NormalSpoke.initialize(self)
+        self.network_control_box = NetworkControlBox(self.builder, nmclient, spoke=self)
+        self.network_control_box.hostname = self.data.network.hostname
+        self.network_control_box.connect("nm-state-changed",
+                                         self.on_nm_state_changed)
+        self.network_control_box.connect("device-state-changed",
+                                         self.on_device_state_changed)
         self.network_control_box.initialize()
         if not can_touch_runtime_system("hide hint to use network configuration in DE"):
             self.builder.get_object("network_config_vbox").set_no_show_all(True)
@@ -1508,13 +1510,8 @@ class NetworkStandaloneSpoke(StandaloneSpoke):
 
     def __init__(self, *args, **kwargs):
         StandaloneSpoke.__init__(self, *args, **kwargs)
-        self.network_control_box = NetworkControlBox(self.builder, nmclient, spoke=self)
-        self.network_control_box.hostname = self.data.network.hostname
-        parent = self.builder.get_object("AnacondaStandaloneWindow-action_area5")
-        parent.add(self.network_control_box.vbox)
-
-        self.network_control_box.connect("nm-state-changed",
-                                         self.on_nm_state_changed)
+        # created in initialize, it needs the objects from the UI file
+        self.network_control_box = None
 
         self._initially_available = self.completed
         log.debug("network standalone spoke (init): completed: %s", self._initially_available)
@@ -1549,6 +1546,13 @@ class NetworkStandaloneSpoke(StandaloneSpoke):
     def initialize(self):
         register_secret_agent(self)
         StandaloneSpoke.initialize(self)
+        self.network_control_box = NetworkControlBox(self.builder, nmclient, spoke=self)
+        self.network_control_box.hostname = self.data.network.hostname
+        parent = self.builder.get_object("AnacondaStandaloneWindow-action_area5")
+        parent.add(self.network_control_box.vbox)
+
+        self.network_control_box.connect("nm-state-changed",
+                                         self.on_nm_state_changed)
         self.network_control_box.initialize()
 
     def refresh(self):
@@ -22,11 +22,11 @@
 
 from pyanaconda.flags import flags
 from pyanaconda.i18n import _, CN_
-from pyanaconda.users import cryptPassword, validatePassword
+from pyanaconda.users import cryptPassword
 
 from pyanaconda.ui.gui.spokes import NormalSpoke
 from pyanaconda.ui.categories.user_settings import UserSettingsCategory
-from pyanaconda.ui.gui.helpers import GUISpokeInputCheckHandler
+from pyanaconda.ui.gui.helpers import GUISpokeInputCheckHandler, PasswordQualityChecker
 from pyanaconda.ui.common import FirstbootSpokeMixIn
 from pyanaconda.ui.helpers import InputCheck
 
@@ -90,9 +90,8 @@ class PasswordSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler)
         self._waiveStrengthClicks = 0
         self._waiveASCIIClicks = 0
 
-        # Password validation data
-        self._pwq_error = None
-        self._pwq_valid = True
+        # Password validation data, shared by the strength bar and check
+        self._pwq_checker = PasswordQualityChecker(self._setPwQuality)
 
         self._kickstarted = self.data.rootpw.seen
         if self._kickstarted:
@@ -199,18 +198,22 @@ class PasswordSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler)
         """Update the password quality information.
 
            This function is called by the ::changed signal handler on the
-           password field.
+           password field. The strength bar is updated by _setPwQuality
+           once the password has been checked.
         """
 
-        pwtext = self.pw.get_text()
-
         # Reset the counters used for the "press Done twice" logic
         self._waiveStrengthClicks = 0
         self._waiveASCIIClicks = 0
 
-        self._pwq_valid, strength, self._pwq_error = validatePassword(pwtext, "root", minlen=self.policy.minlen)
+        self._pwq_checker.check(self.pw.get_text(), "root", self.policy.minlen)
+
+    def _setPwQuality(self, result):
+        """Show the result of the password quality check in the strength bar."""
+
+        _valid, strength, _error = result
 
-        if not pwtext:
+        if not self.pw.get_text():
             val = 0
         elif strength < 50:
             val = 1
@@ -234,7 +237,9 @@ class PasswordSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler)
     def _checkPasswordStrength(self, inputcheck):
         """Update the error message based on password strength.
 
-           Convert the strength set by _updatePwQuality into an error message.
+           Convert the result of the password quality check into an error
+           message. The check started by _updatePwQuality has usually
+           finished by now, otherwise wait for it.
         """
 
         pw = self.pw.get_text()
@@ -244,20 +249,20 @@ class PasswordSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler)
         if (not pw and not confirm) and self._kickstarted:
             return InputCheck.CHECK_OK
 
+        valid, pwstrength, error = self._pwq_checker.result(pw, "root", self.policy.minlen)
+
         # Check for validity errors
-        if (not self._pwq_valid) and (self._pwq_error):
-            return self._pwq_error
+        if (not valid) and (error):
+            return error
 
         # use strength from policy, not bars
-        _valid, pwstrength, _error = validatePassword(pw, "root", minlen=self.policy.minlen)
-
         if pwstrength < self.policy.minquality:
             # If Done has been clicked twice, waive the check
             if self._waiveStrengthClicks > 1:
                 return InputCheck.CHECK_OK
             elif self._waiveStrengthClicks == 1:
-                if self._pwq_error:
-                    return _(PASSWORD_WEAK_CONFIRM_WITH_ERROR) % self._pwq_error
+                if error:
+                    return _(PASSWORD_WEAK_CONFIRM_WITH_ERROR) % error
                 else:
                     return _(PASSWORD_WEAK_CONFIRM)
             else:
@@ -267,8 +272,8 @@ class PasswordSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler)
                 else:
                     done_msg = _(PASSWORD_DONE_TWICE)
 
-                if self._pwq_error:
-                    return _(PASSWORD_WEAK_WITH_ERROR) % self._pwq_error + " " + done_msg
+                if error:
+                    return _(PASSWORD_WEAK_WITH_ERROR) % error + " " + done_msg
                 else:
                     return _(PASSWORD_WEAK) % done_msg
         else:
@@ -76,14 +76,9 @@ class SoftwareSelectionSpoke(NormalSpoke):
         self.selectedGroups = []
         self.excludedGroups = []
 
-        self._environmentListBox = self.builder.get_object("environmentListBox")
-        self._addonListBox = self.builder.get_object("addonListBox")
-
-        # Connect viewport scrolling with listbox focus events
-        environmentViewport = self.builder.get_object("environmentViewport")
-        addonViewport = self.builder.get_object("addonViewport")
-        self._environmentListBox.set_focus_vadjustment(environmentViewport.get_vadjustment())
-        self._addonListBox.set_focus_vadjustment(addonViewport.get_vadjustment())
+        # set in initialize, so that the UI file isn't loaded before
+        self._environmentListBox = None
+        self._addonListBox = None
 
         # Used to store how the user has interacted with add-ons for the default add-on
         # selection logic. The dictionary keys are group IDs, and the values are selection
@@ -320,6 +315,16 @@ class SoftwareSelectionSpoke(NormalSpoke):
 
     def initialize(self):
         NormalSpoke.initialize(self)
+
+        self._environmentListBox = self.builder.get_object("environmentListBox")
+        self._addonListBox = self.builder.get_object("addonListBox")
+
+        # Connect viewport scrolling with listbox focus events
+        environmentViewport = self.builder.get_object("environmentViewport")
+        addonViewport = self.builder.get_object("addonViewport")
+        self._environmentListBox.set_focus_vadjustment(environmentViewport.get_vadjustment())
+        self._addonListBox.set_focus_vadjustment(addonViewport.get_vadjustment())
+
         threadMgr.add(AnacondaThread(name=constants.THREAD_SOFTWARE_WATCHER,
                       target=self._initialize))
 
@@ -47,6 +47,7 @@ from pyanaconda.ui.categories.software import SoftwareCategory
 from pyanaconda.ui.gui.utils import blockedHandler, fire_gtk_action, find_first_child
 from pyanaconda.iutil import ProxyString, ProxyStringError, cmp_obj_attrs
 from pyanaconda.ui.gui.utils import gtk_call_once, really_hide, really_show, fancy_set_sensitive
+from pyanaconda.ui.gui.utils import escape_markup
 from pyanaconda.threads import threadMgr, AnacondaThread
 from pyanaconda.packaging import PackagePayload, payloadMgr
 from pyanaconda.regexes import REPO_NAME_VALID, URL_PARSE, HOSTNAME_PATTERN_WITHOUT_ANCHORS
@@ -403,6 +404,7 @@ class SourceSpoke(NormalSpoke, GUISpokeInputCheckHandler):
         self._ready = False
         self._error = False
         self._error_msg = ""
+        self._repo_warning = ""
         self._proxyUrl = ""
         self._proxyChange = False
         self._cdrom = None
@@ -707,6 +709,7 @@ class SourceSpoke(NormalSpoke, GUISpokeInputCheckHandler):
         # Reset the error state from previous payloads
         self._error = False
         self._error_msg = ""
+        self._repo_warning = ""
 
         hubQ.send_message(self.__class__.__name__, _(constants.PAYLOAD_STATUS_PACKAGE_MD))
 
@@ -714,6 +717,16 @@ class SourceSpoke(NormalSpoke, GUISpokeInputCheckHandler):
         hubQ.send_message(self.__class__.__name__, _(constants.PAYLOAD_STATUS_GROUP_MD))
 
     def _payload_finished(self):
+        # Let the user know about the repos that were disabled because their
+        # metadata couldn't be downloaded
+        failed = sorted(repo_id for (repo_id, (_elapsed, error)) in self.payload.repoLoadStatus.items()
+                        if error)
+        if failed:
+            self._repo_warning = _("Failed to download metadata for the following repositories, "
+                                   "they were disabled: %s.") % escape_markup(", ".join(failed))
+            if self.payload.verbose_errors:
+                self._repo_warning += _(CLICK_FOR_DETAILS)
+
         hubQ.send_ready("SoftwareSelectionSpoke", False)
         hubQ.send_ready(self.__class__.__name__, False)
 
@@ -920,6 +933,9 @@ class SourceSpoke(NormalSpoke, GUISpokeInputCheckHandler):
         elif self._error:
             self.clear_info()
             self.set_error(self._error_msg)
+        elif self._repo_warning:
+            self.clear_info()
+            self.set_info(self._repo_warning)
 
     def _setup_no_updates(self):
         """ Setup the state of the No Updates checkbox.
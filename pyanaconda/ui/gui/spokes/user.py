@@ -24,14 +24,15 @@ import re
 import os
 from pyanaconda.flags import flags
 from pyanaconda.i18n import _, CN_
-from pyanaconda.users import cryptPassword, validatePassword, guess_username
+from pyanaconda.users import cryptPassword, guess_username
 
 from pyanaconda.ui.gui.spokes import NormalSpoke
 from pyanaconda.ui.gui import GUIObject
 from pyanaconda.ui.categories.user_settings import UserSettingsCategory
 from pyanaconda.ui.common import FirstbootSpokeMixIn
 from pyanaconda.ui.helpers import InputCheck
-from pyanaconda.ui.gui.helpers import GUISpokeInputCheckHandler, GUIDialogInputCheckHandler
+from pyanaconda.ui.gui.helpers import GUISpokeInputCheckHandler, GUIDialogInputCheckHandler,\
+        PasswordQualityChecker
 
 from pyanaconda.constants import ANACONDA_ENVIRON, FIRSTBOOT_ENVIRON,\
         PASSWORD_EMPTY_ERROR, PASSWORD_CONFIRM_ERROR_GUI, PASSWORD_STRENGTH_DESC,\
@@ -252,10 +253,9 @@ class UserSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler):
             self.username: True
             }
 
-        # Updated during the password changed event and used by the password
-        # field validity checker
-        self._pwq_error = None
-        self._pwq_valid = True
+        # Started by the password changed event, used by the strength bar
+        # and the password field validity checker
+        self._pwq_checker = PasswordQualityChecker(self._setPwQuality)
 
         self.pw_bar = self.builder.get_object("password_bar")
         self.pw_label = self.builder.get_object("password_label")
@@ -398,18 +398,21 @@ class UserSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler):
 
     def _updatePwQuality(self):
         """This method updates the password indicators according
-        to the password entered by the user.
+        to the password entered by the user. The indicators are set by
+        _setPwQuality when the password has been checked.
         """
-        pwtext = self.pw.get_text()
-        username = self.username.get_text()
-
         # Reset the counters used for the "press Done twice" logic
         self._waiveStrengthClicks = 0
         self._waiveASCIIClicks = 0
 
-        self._pwq_valid, strength, self._pwq_error = validatePassword(pwtext, username)
+        self._pwq_checker.check(self.pw.get_text(), self.username.get_text(),
+                                self.policy.minlen)
+
+    def _setPwQuality(self, result):
+        """Show the result of the password quality check in the strength bar."""
+        _valid, strength, _error = result
 
-        if not pwtext:
+        if not self.pw.get_text():
             val = 0
         elif strength < 50:
             val = 1
@@ -517,9 +520,9 @@ class UserSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler):
     def _checkPasswordStrength(self, inputcheck):
         """Update the error message based on password strength.
 
-           The password strength has already been checked in _updatePwQuality, called
-           previously in the signal chain. This method converts the data set from there
-           into an error message.
+           The password strength check has already been started in _updatePwQuality,
+           called previously in the signal chain. This method converts its result
+           into an error message, waiting for the check if it is still running.
 
            The password strength check can be waived by pressing "Done" twice. This
            is controlled through the self._waiveStrengthClicks counter. The counter
@@ -531,22 +534,22 @@ class UserSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler):
                 ((not self.pw.get_text()) and (self._user.password_kickstarted)):
             return InputCheck.CHECK_OK
 
-        # If the password failed the validity check, fail this check
-        if (not self._pwq_valid) and (self._pwq_error):
-            return self._pwq_error
-
-        # use strength from policy, not bars
         pw = self.pw.get_text()
         username = self.username.get_text()
-        _valid, pwstrength, _error = validatePassword(pw, username, minlen=self.policy.minlen)
+        valid, pwstrength, error = self._pwq_checker.result(pw, username, self.policy.minlen)
+
+        # If the password failed the validity check, fail this check
+        if (not valid) and (error):
+            return error
 
+        # use strength from policy, not bars
         if pwstrength < self.policy.minquality:
             # If Done has been clicked twice, waive the check
             if self._waiveStrengthClicks > 1:
                 return InputCheck.CHECK_OK
             elif self._waiveStrengthClicks == 1:
-                if self._pwq_error:
-                    return _(PASSWORD_WEAK_CONFIRM_WITH_ERROR) % self._pwq_error
+                if error:
+                    return _(PASSWORD_WEAK_CONFIRM_WITH_ERROR) % error
                 else:
                     return _(PASSWORD_WEAK_CONFIRM)
             else:
@@ -556,8 +559,8 @@ class UserSpoke(FirstbootSpokeMixIn, NormalSpoke, GUISpokeInputCheckHandler):
                 else:
                     done_msg = _(PASSWORD_DONE_TWICE)
 
-                if self._pwq_error:
-                    return _(PASSWORD_WEAK_WITH_ERROR) % self._pwq_error + " " + done_msg
+                if error:
+                    return _(PASSWORD_WEAK_WITH_ERROR) % error + " " + done_msg
                 else:
                     return _(PASSWORD_WEAK) % done_msg
         else:
@@ -24,6 +24,7 @@ data entropy.
 
 """
 
+import os
 import time
 import select
 import sys
@@ -33,12 +34,159 @@ import math
 
 from pyanaconda.progress import progress_message
 from pyanaconda.constants import MAX_ENTROPY_WAIT
-from pyanaconda.iutil import eintr_retry_call
+from pyanaconda.iutil import eintr_retry_call, eintr_ignore
+from pyanaconda.iutil import open   # pylint: disable=redefined-builtin
 from pykickstart.constants import DISPLAY_MODE_GRAPHICAL
 from blivet.util import get_current_entropy
 
 from pyanaconda.i18n import _, P_
 
+import logging
+log = logging.getLogger("anaconda")
+
+RANDOM_DEVICE = "/dev/random"
+READ_WAKEUP_THRESHOLD = "/proc/sys/kernel/random/read_wakeup_threshold"
+
+# how often (in seconds) the entropy is checked if the kernel cannot tell us
+FALLBACK_POLL_INTERVAL = 0.1
+
+class EntropyWaiter(object):
+    """
+    Wait for the kernel's entropy pool to reach the desired level.
+
+    /dev/random becomes readable once the pool holds at least
+    read_wakeup_threshold bits. The threshold is raised to the desired level
+    for the time of the wait, so poll() returns as soon as there is enough
+    entropy instead of after a fixed interval. If that is not possible the
+    entropy is checked every FALLBACK_POLL_INTERVAL seconds.
+
+    Use as a context manager, the original threshold is restored and the time
+    spent waiting is logged on exit.
+
+    """
+
+    def __init__(self, desired_entropy, max_wait=MAX_ENTROPY_WAIT):
+        """
+        :param desired_entropy: entropy level to wait for
+        :type desired_entropy: int
+        :param max_wait: how long (in seconds) to wait at most
+        :type max_wait: int
+
+        """
+
+        self.desired_entropy = desired_entropy
+        self.max_wait = max_wait
+        self._start = None
+        self._fd = None
+        self._poll = None
+        self._orig_threshold = None
+
+    def __enter__(self):
+        self._start = time.time()
+        try:
+            with open(READ_WAKEUP_THRESHOLD) as f:
+                threshold = int(f.read())
+            if threshold < self.desired_entropy:
+                with open(READ_WAKEUP_THRESHOLD, "w") as f:
+                    f.write("%d\n" % self.desired_entropy)
+                self._orig_threshold = threshold
+            self._fd = eintr_retry_call(os.open, RANDOM_DEVICE, os.O_RDONLY | os.O_NONBLOCK)
+        except (IOError, OSError, ValueError) as e:
+            log.info("cannot wait for entropy on %s, checking it periodically: %s",
+                     RANDOM_DEVICE, e)
+            self._close()
+        else:
+            self._poll = select.poll()
+            self._poll.register(self._fd, select.POLLIN)
+
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self._close()
+        log.info("waited %.2f seconds for %d bits of entropy, %d available",
+                 self.elapsed, self.desired_entropy, self.entropy)
+        return False
+
+    def _close(self):
+        self._poll = None
+        if self._fd is not None:
+            eintr_ignore(os.close, self._fd)
+            self._fd = None
+
+        if self._orig_threshold is not None:
+            try:
+                with open(READ_WAKEUP_THRESHOLD, "w") as f:
+                    f.write("%d\n" % self._orig_threshold)
+            except IOError as e:
+                log.warning("failed to restore %s: %s", READ_WAKEUP_THRESHOLD, e)
+            self._orig_threshold = None
+
+    @property
+    def entropy(self):
+        """Currently available entropy"""
+        return get_current_entropy()
+
+    @property
+    def elapsed(self):
+        """Seconds since the wait started"""
+        if self._start is None:
+            return 0
+        return time.time() - self._start
+
+    @property
+    def remaining(self):
+        """Seconds left until the wait times out"""
+        return max(self.max_wait - self.elapsed, 0)
+
+    @property
+    def timed_out(self):
+        return self.remaining <= 0
+
+    @property
+    def done(self):
+        """Whether there is enough entropy or the time ran out"""
+        return self.entropy >= self.desired_entropy or self.timed_out
+
+    def fileno(self):
+        """
+        File descriptor that becomes readable when there is enough entropy or
+        None if the kernel cannot tell us.
+
+        """
+
+        if self._poll is None:
+            return None
+        return self._fd
+
+    def wait(self, timeout):
+        """
+        Wait until there is enough entropy, at most timeout seconds (and not
+        beyond the waiter's own time limit).
+
+        :param timeout: how long to wait (in seconds)
+        :type timeout: float
+        :returns: the available entropy
+        :rtype: int
+
+        """
+
+        deadline = time.time() + min(timeout, self.remaining)
+        while True:
+            cur_entr = self.entropy
+            now = time.time()
+            if cur_entr >= self.desired_entropy or now >= deadline:
+                return cur_entr
+
+            if self._poll is not None:
+                if eintr_retry_call(self._poll.poll, (deadline - now) * 1000) and \
+                        self.entropy < self.desired_entropy:
+                    # readable with too little entropy, the kernel doesn't
+                    # honour the threshold so don't spin on it
+                    log.debug("%s ignores %s", RANDOM_DEVICE, READ_WAKEUP_THRESHOLD)
+                    self._close()
+            else:
+                time.sleep(min(deadline - now, FALLBACK_POLL_INTERVAL))
+
 def wait_for_entropy(msg, desired_entropy, ksdata):
     """
     Show UI dialog/message for waiting for desired random data entropy.
@@ -64,6 +212,10 @@ def wait_for_entropy(msg, desired_entropy, ksdata):
 def _tui_wait(msg, desired_entropy):
     """Tell user we are waiting for entropy"""
 
+    from pyanaconda.ui.tui.simpleline import invalidate_frames
+
+    # the messages end up below the current screen
+    invalidate_frames()
     print(msg)
     print(_("Entropy can be increased by typing randomly on keyboard"))
     print(_("After %d minutes, the installation will continue regardless of the "
@@ -85,26 +237,26 @@ def _tui_wait(msg, desired_entropy):
         else:
             raise
 
-    # wait for the entropy to become high enough or time has run out
-    cur_entr = get_current_entropy()
-    secs = 0
-    while cur_entr < desired_entropy and secs <= MAX_ENTROPY_WAIT:
-        remaining = (MAX_ENTROPY_WAIT - secs) / 60.0
-        print(_("Available entropy: %(av_entr)s, Required entropy: %(req_entr)s [%(pct)d %%] (%(rem)d %(min)s remaining)")
-                % {"av_entr": cur_entr, "req_entr": desired_entropy,
-                   "pct": int((float(cur_entr) / desired_entropy) * 100),
-                   "min": P_("minute", "minutes", remaining),
-                   "rem": math.ceil(remaining)})
-        time.sleep(1)
-        cur_entr = get_current_entropy()
-        secs += 1
+    # wait for the entropy to become high enough or time has run out, the
+    # waiter returns as soon as there is enough, otherwise report progress
+    # every second
+    with EntropyWaiter(desired_entropy) as waiter:
+        cur_entr = waiter.entropy
+        while cur_entr < desired_entropy and not waiter.timed_out:
+            remaining = waiter.remaining / 60.0
+            print(_("Available entropy: %(av_entr)s, Required entropy: %(req_entr)s [%(pct)d %%] (%(rem)d %(min)s remaining)")
+                    % {"av_entr": cur_entr, "req_entr": desired_entropy,
+                       "pct": int((float(cur_entr) / desired_entropy) * 100),
+                       "min": P_("minute", "minutes", remaining),
+                       "rem": math.ceil(remaining)})
+            cur_entr = waiter.wait(1)
 
     # print the final state as well
     print(_("Available entropy: %(av_entr)s, Required entropy: %(req_entr)s [%(pct)d %%]")
             % {"av_entr": cur_entr, "req_entr": desired_entropy,
                "pct": int((float(cur_entr) / desired_entropy) * 100)})
 
-    if secs <= MAX_ENTROPY_WAIT:
+    if cur_entr >= desired_entropy:
         print(_("Enough entropy gathered, please stop typing."))
         force_cont = False
     else:
@@ -112,8 +264,10 @@ def _tui_wait(msg, desired_entropy):
         force_cont = True
 
     # we are done
-    # first let the user notice we are done and stop typing
-    time.sleep(5)
+    # first let the user notice we are done and stop typing, nobody is typing
+    # without a terminal though
+    if termios_attrs_changed:
+        time.sleep(5)
 
     # and then just read everything from the input buffer and revert the
     # termios state
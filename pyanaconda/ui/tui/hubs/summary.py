@@ -22,6 +22,7 @@
 
 from pyanaconda.ui.lib.space import FileSystemSpaceChecker, DirInstallSpaceChecker
 from pyanaconda.ui.tui.hubs import TUIHub
+from pyanaconda.ui.tui.simpleline import invalidate_frames
 from pyanaconda.flags import flags
 from pyanaconda.errors import CmdlineError
 from pyanaconda.i18n import N_, _, C_
@@ -52,6 +53,7 @@ class SummaryHub(TUIHub):
             return False
 
         if flags.automatedInstall:
+            invalidate_frames()
             sys.stdout.write(_("Starting automated install"))
             sys.stdout.flush()
             spokes = self._keys.values()
@@ -77,6 +79,7 @@ class SummaryHub(TUIHub):
         # size < available fs space
         if flags.automatedInstall:
             if self._checker and not self._checker.check():
+                invalidate_frames()
                 print(self._checker.error_message)
             if not incompleteSpokes:
                 self.close()
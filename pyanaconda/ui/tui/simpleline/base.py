@@ -19,13 +19,12 @@
 # Red Hat Author(s): Martin Sivak <msivak@redhat.com>
 #
 
-__all__ = ["App", "UIScreen", "Widget"]
+__all__ = ["App", "UIScreen", "Widget", "invalidate_frames"]
 
 import sys
 import queue
 import getpass
 import threading
-import functools
 from pyanaconda.threads import threadMgr, AnacondaThread
 from pyanaconda.ui.communication import hubQ
 from pyanaconda import constants, iutil
@@ -33,6 +32,20 @@ from pyanaconda.i18n import _, N_, C_
 
 RAW_INPUT_LOCK = threading.Lock()
 
+# bumped whenever something is printed outside of the screens' frames
+_frames_invalidated = 0
+
+
+def invalidate_frames():
+    """Make the next frame show the whole screen, not just its changes.
+
+    Call this after printing anything outside of the screens' frames, the
+    changed lines of a frame make no sense below such output.  It is not
+    tied to an App, so code that doesn't know the App can call it too.
+    """
+    global _frames_invalidated
+    _frames_invalidated += 1
+
 
 def send_exception(queue_instance, ex):
     queue_instance.put((hubQ.HUB_CODE_EXCEPTION, [ex]))
@@ -81,6 +94,10 @@ class App(object):
 
         self._header = title
         self._redraw = True
+        # the next frame has to be shown completely, not just its changes
+        self._full_redraw = True
+        # (screen, lines, _frames_invalidated) of the last frame that was shown
+        self._last_frame = None
         self._spacer = "\n".join(2*[width*"="])
         self._width = width
         self.quit_question = yes_or_no_question
@@ -214,6 +231,8 @@ class App(object):
 
         # set the third item to True so new loop gets started
         self._screens.append((ui, args, self.START_MAINLOOP))
+        # the dialog is shown below whatever the caller printed
+        invalidate_frames()
         self._do_redraw()
 
     def schedule_screen(self, ui, args=None):
@@ -277,6 +296,7 @@ class App(object):
             self._mainloop()
             # after the mainloop ends, set the redraw flag
             # and skip the input processing once, to redisplay the screen first
+            invalidate_frames()
             self.redraw()
             input_needed = False
         elif self._redraw:
@@ -314,6 +334,7 @@ class App(object):
 
         # ask for redraw by default
         self._redraw = True
+        self._full_redraw = True
 
         # initial state
         last_screen = None
@@ -351,8 +372,9 @@ class App(object):
                     continue
 
                 # None means prompt handled the input by itself
-                # ask for redraw and continue
+                # (and possibly printed messages), ask for redraw and continue
                 if prompt is None:
+                    invalidate_frames()
                     self.redraw()
                     continue
 
@@ -360,8 +382,10 @@ class App(object):
                 c = self.raw_input(prompt)
 
                 # process the input, if it wasn't processed (valid)
-                # increment the error counter
+                # increment the error counter, the screen has probably
+                # printed why
                 if not self.input(self._screens[-1][1], c):
+                    invalidate_frames()
                     error_counter += 1
                 else:
                     # input was successfully processed, but no other screen was
@@ -370,7 +394,7 @@ class App(object):
 
                 # redraw the screen after 5 bad inputs
                 if error_counter >= 5:
-                    self.redraw()
+                    self.redraw(full=True)
 
             # propagate higher to end all loops
             # not really needed here, but we might need
@@ -448,6 +472,7 @@ class App(object):
         # global refresh command
         # TRANSLATORS: 'r' to refresh
         if self._screens and (key == C_('TUI|Spoke Navigation', 'r')):
+            self._full_redraw = True
             self._do_redraw()
             return True
 
@@ -471,9 +496,50 @@ class App(object):
 
         return False
 
-    def redraw(self):
-        """Set the redraw flag so the screen is refreshed as soon as possible."""
+    def redraw(self, full=False):
+        """Set the redraw flag so the screen is refreshed as soon as possible.
+
+        :param full: show the whole screen even if only some of its lines changed
+        :type full: bool
+        """
         self._redraw = True
+        if full:
+            self._full_redraw = True
+
+    def frame_damage(self, screen, lines):
+        """Compare a newly rendered frame with the last one shown.
+
+        Slow serial and 3270 consoles can't move the cursor around, but
+        printing the whole screen after every input is what makes text mode
+        crawl on them. When the same screen is redrawn and only a few of its
+        lines changed, just those lines are printed.  That only works if
+        nothing else was printed since, see invalidate_frames.
+
+        :param screen: the screen the frame belongs to
+        :type screen: UIScreen instance
+
+        :param lines: all lines of the new frame
+        :type lines: list(str)
+
+        :return: None if the whole frame has to be shown, otherwise the list
+                 of changed lines (empty when nothing changed)
+        :rtype: list(str) or None
+        """
+        last = self._last_frame
+        self._last_frame = (screen, lines, _frames_invalidated)
+
+        if self._full_redraw or last is None or last[0] is not screen \
+           or len(last[1]) != len(lines) or last[2] != _frames_invalidated:
+            self._full_redraw = False
+            return None
+
+        changed = [new for (old, new) in zip(last[1], lines) if old != new]
+
+        # too much changed, the lines wouldn't make sense without the rest
+        if len(changed) * 2 > len(lines):
+            return None
+
+        return changed
 
     @property
     def header(self):
@@ -546,8 +612,12 @@ class UIScreen(object):
 
         """
 
+        self._print_long_lines(widget.get_lines())
+
+    def _print_long_lines(self, lines):
+        """Prints lines of a possibly long widget, see _print_long_widget."""
+
         pos = 0
-        lines = widget.get_lines()
         num_lines = len(lines)
 
         if num_lines < self._screen_height - 2:
@@ -573,18 +643,42 @@ class UIScreen(object):
 
     def show_all(self):
         """Prepares all elements of self._window for output and then prints
-        them on the screen."""
+        them on the screen.
+
+        When the screen was shown last and only a few lines changed since,
+        only the changed lines are printed.
+        """
 
+        blocks = []
         for w in self._window:
             if hasattr(w, "render"):
                 w.render(self.app.width)
             if isinstance(w, Widget):
-                self._print_long_widget(w)
-            elif isinstance(w, bytes):
-                print(w)
+                blocks.append((w.get_lines(), True))
             else:
-                # not a widget or string, just print its string representation
-                print(str(w))
+                # not a widget, just print its string representation
+                blocks.append((str(w).split("\n"), False))
+
+        frame = [line for (lines, _widget) in blocks for line in lines]
+        damage = self.app.frame_damage(self, frame)
+        if damage is not None:
+            if damage:
+                print(u"\n".join(damage))
+            return
+
+        # print the whole frame, collecting lines so they are written at once
+        pending = []
+        for (lines, widget) in blocks:
+            if widget and len(lines) >= self._screen_height - 2:
+                if pending:
+                    print(u"\n".join(pending))
+                    pending = []
+                self._print_long_lines(lines)
+            else:
+                pending.extend(lines)
+
+        if pending:
+            print(u"\n".join(pending))
     show = show_all
 
     def hide(self):
@@ -641,6 +735,10 @@ class Widget(object):
     def __init__(self, max_width=None, default=None):
         """Initializes base Widgets buffer.
 
+           The buffer is a list of strings, one per row. The width of the
+           widest row is kept up to date by write and draw, so it does not
+           have to be computed again every time it is asked for.
+
            :param max_width: server as a hint about screen size to write method with default arguments
            :type max_width: int
 
@@ -649,8 +747,10 @@ class Widget(object):
            """
 
         self._buffer = []
+        self._width = 0
         if default:
-            self._buffer = [[c for c in l] for l in default.split("\n")]
+            self._buffer = default.split("\n")
+            self._width = max(len(l) for l in self._buffer)
         self._max_width = max_width
         self._cursor = (0, 0) # row, col
 
@@ -663,16 +763,18 @@ class Widget(object):
     def width(self):
         """The current width of the internal buffer
            (id of the first empty column)."""
-        return functools.reduce(lambda acc, l: max(acc, len(l)), self._buffer, 0)
+        return self._width
 
     def clear(self):
         """Clears this widgets buffer and resets cursor."""
         self._buffer = list()
+        self._width = 0
         self._cursor = (0, 0)
 
     @property
     def content(self):
-        """This has to return list (rows) of lists (columns) with one character elements."""
+        """This has to return list (rows) of strings, indexing a row returns
+           one character elements."""
         return self._buffer
 
     def render(self, width):
@@ -693,7 +795,23 @@ class Widget(object):
            :rtype: list(str)
            """
 
-        return [str(u"".join(line)) for line in self._buffer]
+        return list(self._buffer)
+
+    def _put(self, row, col, text):
+        """Overwrite the buffer with text starting at row, col.
+
+           Missing rows are added and the row is padded with spaces
+           when it is shorter than col.
+        """
+        if row >= len(self._buffer):
+            self._buffer.extend([u""] * (row - len(self._buffer) + 1))
+
+        line = self._buffer[row]
+        if len(line) < col:
+            line += u" " * (col - len(line))
+        line = line[:col] + text + line[col + len(text):]
+        self._buffer[row] = line
+        self._width = max(self._width, len(line))
 
     def setxy(self, row, col):
         """Sets cursor position.
@@ -738,18 +856,11 @@ class Widget(object):
         if col is None:
             col = self._cursor[1]
 
-        # fill up rows to accomodate for w.height
-        if self.height < row + w.height:
-            for _i in range(row + w.height - self.height):
-                self._buffer.append(list())
-
-        # append columns to accomodate for w.width
-        for l in range(row, row + w.height):
-            l_len = len(self._buffer[l])
-            w_len = len(w.content[l - row])
-            if l_len < col + w_len:
-                self._buffer[l] += ((col + w_len - l_len) * list(u" "))
-            self._buffer[l][col:col + w_len] = w.content[l - row][:]
+        for l, line in enumerate(w.content):
+            # widgets overriding content may still return lists of characters
+            if not isinstance(line, str):
+                line = u"".join(line)
+            self._put(row + l, col, line)
 
         # move the cursor to new spot
         if block:
@@ -788,41 +899,37 @@ class Widget(object):
         if width is None and self._max_width:
             width = self._max_width - col
 
+        if block:
+            newline_col = col
+        else:
+            newline_col = 0
+
         x = row
         y = col
 
-        # emulate typing machine
-        for c in text:
+        # emulate typing machine, one row segment at a time
+        for i, part in enumerate(text.split("\n")):
             # process newline
-            if c == "\n":
+            if i:
                 x += 1
-                if block:
-                    y = col
-                else:
-                    y = 0
-                continue
+                y = newline_col
 
-            # if the line is not in buffer, create it
-            if x >= len(self._buffer):
-                for _i in range(x - len(self._buffer) + 1):
-                    self._buffer.append(list())
-
-            # if the line's length is not enough, fill it with spaces
-            if y >= len(self._buffer[x]):
-                self._buffer[x] += ((y - len(self._buffer[x]) + 1) * list(u" "))
-
-
-            # "type" character
-            self._buffer[x][y] = c
-
-            # shift to the next char
-            y += 1
-            if not width is None and y >= col + width:
-                x += 1
-                if block:
-                    y = col
+            while part:
+                if width is None:
+                    chunk = part
                 else:
-                    y = 0
+                    # at least one character gets typed before wrapping
+                    chunk = part[:max(1, col + width - y)]
+                part = part[len(chunk):]
+
+                # "type" the characters
+                self._put(x, y, chunk)
+
+                # shift to the next free column, wrap when needed
+                y += len(chunk)
+                if not width is None and y >= col + width:
+                    x += 1
+                    y = newline_col
 
         self._cursor = (x, y)
 
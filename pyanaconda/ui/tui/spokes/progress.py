@@ -29,7 +29,7 @@ from pykickstart.constants import KS_SHUTDOWN, KS_REBOOT
 
 from pyanaconda.ui.tui.spokes import StandaloneTUISpoke
 from pyanaconda.ui.tui.hubs.summary import SummaryHub
-from pyanaconda.ui.tui.simpleline.base import ExitAllMainLoops
+from pyanaconda.ui.tui.simpleline.base import ExitAllMainLoops, invalidate_frames
 
 __all__ = ["ProgressSpoke"]
 
@@ -113,6 +113,7 @@ class ProgressSpoke(StandaloneTUISpoke):
         from pyanaconda.threads import threadMgr, AnacondaThread
 
         # We print this here because we don't really use the window object
+        invalidate_frames()
         print(_(self.title))
 
         threadMgr.add(AnacondaThread(name=THREAD_INSTALL, target=doInstall,
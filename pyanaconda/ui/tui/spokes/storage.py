@@ -30,7 +30,7 @@ from gi.repository import BlockDev as blockdev
 from pyanaconda.ui.lib.disks import getDisks, applyDiskSelection, checkDiskSelection
 from pyanaconda.ui.categories.system import SystemCategory
 from pyanaconda.ui.tui.spokes import NormalTUISpoke
-from pyanaconda.ui.tui.simpleline import TextWidget, CheckboxWidget
+from pyanaconda.ui.tui.simpleline import TextWidget, CheckboxWidget, invalidate_frames
 from pyanaconda.ui.tui.tuiobject import YesNoDialog
 from pyanaconda.storage_utils import AUTOPART_CHOICES, sanity_check, SanityError, SanityWarning
 
@@ -197,6 +197,7 @@ class StorageSpoke(NormalTUISpoke):
 
         # Join the initialization thread to block on it
         # This print is foul.  Need a better message display
+        invalidate_frames()
         print(_(PAYLOAD_STATUS_PROBING_STORAGE))
         threadMgr.wait(THREAD_STORAGE_WATCHER)
 
@@ -340,6 +341,7 @@ class StorageSpoke(NormalTUISpoke):
 
         for disk in to_format:
             try:
+                invalidate_frames()
                 print(_("Formatting /dev/%s. This may take a moment.") % disk.name)
                 blockdev.s390.dasd_format(disk.name)
             except blockdev.S390Error as err:
@@ -384,6 +386,7 @@ class StorageSpoke(NormalTUISpoke):
         self.storage.config.clearNonExistent = self.data.autopart.autopart
 
     def execute(self):
+        invalidate_frames()
         print(_("Generating updated storage configuration"))
         try:
             doKickstartStorage(self.storage, self.data, self.instclass)
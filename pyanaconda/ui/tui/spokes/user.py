@@ -23,6 +23,7 @@
 from pyanaconda.ui.categories.user_settings import UserSettingsCategory
 from pyanaconda.ui.tui.spokes import EditTUISpoke
 from pyanaconda.ui.tui.spokes import EditTUISpokeEntry as Entry
+from pyanaconda.ui.tui.simpleline import invalidate_frames
 from pyanaconda.ui.common import FirstbootSpokeMixIn
 from pyanaconda.users import guess_username
 from pyanaconda.flags import flags
@@ -95,6 +96,8 @@ class UserSpoke(FirstbootSpokeMixIn, EditTUISpoke):
         self.args._groups = ", ".join(self.args.groups)
 
         # if we have any errors, display them
+        if self.errors:
+            invalidate_frames()
         while self.errors:
             print(self.errors.pop())
 
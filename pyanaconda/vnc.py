@@ -37,6 +37,22 @@ stdoutLog = logging.getLogger("anaconda.stdout")
 
 XVNC_BINARY_NAME = "Xvnc"
 
+# how long (in seconds) to wait for the network connection to get an address
+VNC_IP_TIMEOUT = 5
+
+# delays (in seconds) between the attempts to connect to a listening viewer,
+# they double from the first to the maximum one until the time runs out
+VNC_CONNECT_DELAY = 1
+VNC_CONNECT_MAX_DELAY = 16
+VNC_CONNECT_TIMEOUT = 150
+
+# VNC startup states, each is logged with the time it took to reach it
+VNC_STATE_STARTING = "starting"
+VNC_STATE_NETWORK = "network ready"
+VNC_STATE_SERVER = "server ready"
+VNC_STATE_CONNECTED = "connected to the viewer"
+VNC_STATE_LISTENING = "listening"
+
 
 def shutdownServer():
     """Try to shutdown any running XVNC server
@@ -71,11 +87,20 @@ class VncServer:
         self.connxinfo = None
         self.anaconda = None
         self.log = logging.getLogger("anaconda.stdout")
+        self.state = None
+        self._start_time = None
 
         self.desktop = _("%(productName)s %(productVersion)s installation")\
                        % {'productName': product.productName,
                           'productVersion': product.productVersion}
 
+    def _setState(self, state):
+        """Move the startup to state and log how long it took to get there."""
+        if self._start_time is None:
+            self._start_time = time.time()
+        self.state = state
+        log.info("VNC startup: %s after %.2f seconds", state, time.time() - self._start_time)
+
     def setVNCPassword(self):
         """Set the vnc server password. Output to file. """
 
@@ -96,14 +121,15 @@ class VncServer:
     def initialize(self):
         """Here is were all the relative vars get initialized. """
 
-        # Network may be slow. Try for 5 seconds
-        tries = 5
-        while tries:
+        # Network may be slow to get an address. Look again with growing
+        # delays for up to VNC_IP_TIMEOUT seconds.
+        deadline = time.time() + VNC_IP_TIMEOUT
+        delay = 0.1
+        self.ip = network.getFirstRealIP()
+        while not self.ip and time.time() < deadline:
+            time.sleep(max(min(delay, deadline - time.time()), 0))
+            delay *= 2
             self.ip = network.getFirstRealIP()
-            if self.ip:
-                break
-            time.sleep(1)
-            tries -= 1
 
         if not self.ip:
             return
@@ -154,7 +180,6 @@ class VncServer:
     def connectToView(self):
         """Attempt to connect to self.vncconnecthost"""
 
-        maxTries = 10
         self.log.info(_("Attempting to connect to vnc client on host %s..."), self.vncconnecthost)
 
         if self.vncconnectport != "":
@@ -164,7 +189,13 @@ class VncServer:
 
         vncconfigcommand = [self.root+"/usr/bin/vncconfig", "-display", ":%s" % constants.X_DISPLAY_NUMBER, "-connect", hostarg]
 
-        for _i in range(maxTries):
+        # the viewer may not be listening yet, retry soon at first and then
+        # less and less often
+        deadline = time.time() + VNC_CONNECT_TIMEOUT
+        delay = VNC_CONNECT_DELAY
+        tries = 0
+        while True:
+            tries += 1
             vncconfp = iutil.startProgram(vncconfigcommand, stdout=subprocess.PIPE, stderr=subprocess.PIPE) # vncconfig process
             err = vncconfp.communicate()[1].decode("utf-8")
 
@@ -172,8 +203,13 @@ class VncServer:
                 self.log.info(_("Connected!"))
                 return True
             elif err.startswith("connecting") and err.endswith("failed\n"):
-                self.log.info(_("Will try to connect again in 15 seconds..."))
-                time.sleep(15)
+                if time.time() + delay > deadline:
+                    break
+                self.log.info(P_("Will try to connect again in %d second...",
+                                 "Will try to connect again in %d seconds...",
+                                 delay), delay)
+                time.sleep(delay)
+                delay = min(delay * 2, VNC_CONNECT_MAX_DELAY)
                 continue
             else:
                 log.critical(err)
@@ -181,7 +217,7 @@ class VncServer:
                 sys.exit(1)
         self.log.error(P_("Giving up attempting to connect after %d try!\n",
                           "Giving up attempting to connect after %d tries!\n",
-                          maxTries), maxTries)
+                          tries), tries)
         return False
 
     def startVncConfig(self):
@@ -208,6 +244,7 @@ class VncServer:
 
     def startServer(self):
         self.log.info(_("Starting VNC..."))
+        self._setState(VNC_STATE_STARTING)
         network.wait_for_connectivity()
 
         # Lets call it from here for now.
@@ -217,6 +254,7 @@ class VncServer:
             stdoutLog.critical("Could not initialize the VNC server: %s", e)
             iutil.ipmi_report(constants.IPMI_ABORTED)
             sys.exit(1)
+        self._setState(VNC_STATE_NETWORK)
 
         if self.password and (len(self.password) < 6 or len(self.password) > 8):
             self.changeVNCPasswdWindow()
@@ -245,6 +283,7 @@ class VncServer:
             sys.exit(1)
 
         self.log.info(_("The VNC server is now running."))
+        self._setState(VNC_STATE_SERVER)
 
         # Lets tell the user what we are going to do.
         if self.vncconnecthost != "":
@@ -266,10 +305,15 @@ class VncServer:
         # Lets try to configure the vnc server to whatever the user specified
         if self.vncconnecthost != "":
             connected = self.connectToView()
-            if not connected:
+            if connected:
+                # the viewer gets its first frame now
+                self._setState(VNC_STATE_CONNECTED)
+            else:
                 self.VNCListen()
+                self._setState(VNC_STATE_LISTENING)
         else:
             self.VNCListen()
+            self._setState(VNC_STATE_LISTENING)
 
         # Start vncconfig for copy/paste
         self.startVncConfig()
@@ -12,6 +12,9 @@ except ImportError:
 import os
 import tempfile
 import shutil
+import subprocess
+import threading
+import time
 
 import sys
 sys.path.append(os.path.normpath(os.path.dirname(__file__)+'/../../dracut'))
@@ -240,6 +243,18 @@ class TestSaveRepo(FileTestCaseBase):
         self.assertEqual(set(os.listdir(saved)), set(["fake-something.rpm"]))
         self.assertEqual(saved, os.path.join(self.destdir, "DD-1"))
 
+    def test_tree(self):
+        """save_repo: copies subdirectories and keeps symlinks"""
+        makerepo(self.srcdir)
+        repo = find_repos(self.srcdir)[0]
+        makefiles(repo+'/repodata/repomd.xml', repo+'/fake-something.rpm')
+        os.symlink('fake-something.rpm', repo+'/fake.rpm')
+        saved = save_repo(repo, target=self.destdir)
+        self.assertEqual(set(iter_files(saved)),
+                         set([saved+'/repodata/repomd.xml', saved+'/fake-something.rpm',
+                              saved+'/fake.rpm']))
+        self.assertEqual(os.readlink(saved+'/fake.rpm'), 'fake-something.rpm')
+
 from driver_updates import mount, umount, mounted
 class MountTestCase(unittest.TestCase):
     @mock.patch('driver_updates.mkdir_seq')
@@ -335,47 +350,121 @@ class DDUtilsTestCase(unittest.TestCase):
 
 from driver_updates import extract_drivers, grab_driver_files, load_drivers
 
-@mock.patch("driver_updates.ensure_dir")
+def fake_dd_extract(rpm_path, outdir, *args, **kwargs):
+    """write the files a package would contain, named after the rpm"""
+    name = os.path.basename(rpm_path)
+    with open(makefile(outdir+"/lib/firmware/owner"), "w") as outf:
+        outf.write(name)
+    makefile(outdir+"/usr/share/"+name)
+
 @mock.patch("driver_updates.save_repo")
 @mock.patch("driver_updates.append_line")
-@mock.patch("driver_updates.dd_extract")
-class ExtractDriversTestCase(unittest.TestCase):
-    def test_drivers(self, mock_extract, mock_append, mock_save, *args):
+@mock.patch("driver_updates.dd_extract", side_effect=fake_dd_extract)
+class ExtractDriversTestCase(FileTestCaseBase):
+    def setUp(self):
+        FileTestCaseBase.setUp(self)
+        self.outdir = self.tmpdir+'/updates'
+        self.pkglist = self.tmpdir+'/dd_packages'
+
+    def extract(self, **kwargs):
+        return extract_drivers(outdir=self.outdir, pkglist=self.pkglist, **kwargs)
+
+    def extracted_sources(self, mock_extract):
+        return [c[0][0] for c in mock_extract.call_args_list]
+
+    def test_drivers(self, mock_extract, mock_append, mock_save):
         """extract_drivers: save repo, write pkglist"""
-        extract_drivers(drivers=[fake_enhancement, fake_module])
+        self.assertTrue(self.extract(drivers=[fake_enhancement, fake_module]))
         # extracts all listed modules
-        mock_extract.assert_has_calls([
-            mock.call(fake_enhancement.source, "/updates"),
-            mock.call(fake_module.source, "/updates")
-        ], any_order=True)
-        pkglist = "/run/install/dd_packages"
-        mock_append.assert_called_once_with(pkglist, fake_module.name)
+        self.assertEqual(sorted(self.extracted_sources(mock_extract)),
+                         sorted([fake_enhancement.source, fake_module.source]))
+        mock_append.assert_called_once_with(self.pkglist, fake_module.name)
         mock_save.assert_called_once_with(fake_module.repo)
 
-    def test_enhancements(self, mock_extract, mock_append, mock_save, *args):
+    def test_enhancements(self, mock_extract, mock_append, mock_save):
         """extract_drivers: extract selected drivers, don't save enhancements"""
-        extract_drivers(drivers=[fake_enhancement])
-        mock_extract.assert_called_once_with(
-            fake_enhancement.source, "/updates"
-        )
+        self.assertFalse(self.extract(drivers=[fake_enhancement]))
+        self.assertEqual(self.extracted_sources(mock_extract), [fake_enhancement.source])
         self.assertFalse(mock_append.called)
         self.assertFalse(mock_save.called)
 
-    def test_repo(self, mock_extract, mock_append, mock_save, *args):
+    def test_repo(self, mock_extract, mock_append, mock_save):
         """extract_drivers(repos=[...]) extracts all drivers from named repos"""
         with mock.patch("driver_updates.dd_list", side_effect=[
             [fake_enhancement],
             [fake_enhancement, fake_module]]):
-            extract_drivers(repos=['enh_repo', 'mod_repo'])
-        mock_extract.assert_has_calls([
-            mock.call(fake_enhancement.source, "/updates"),
-            mock.call(fake_enhancement.source, "/updates"),
-            mock.call(fake_module.source, "/updates")
-        ])
-        pkglist = "/run/install/dd_packages"
-        mock_append.assert_called_once_with(pkglist, fake_module.name)
+            self.extract(repos=['enh_repo', 'mod_repo'])
+        self.assertEqual(sorted(self.extracted_sources(mock_extract)),
+                         sorted([fake_enhancement.source]*2 + [fake_module.source]))
+        mock_append.assert_called_once_with(self.pkglist, fake_module.name)
         mock_save.assert_called_once_with(fake_module.repo)
 
+    def test_merge_order(self, mock_extract, mock_append, mock_save):
+        """extract_drivers: later packages win, staging dirs are removed"""
+        drivers = [Driver(source="/repo/dd-%02d.rpm" % i, name="dd-%02d" % i,
+                          flags="modules", repo="/repo") for i in range(20)]
+        self.extract(drivers=drivers)
+        self.assertEqual(sorted(os.listdir(self.outdir)), ["lib", "usr"])
+        self.assertEqual(len(os.listdir(self.outdir+"/usr/share")), 20)
+        with open(self.outdir+"/lib/firmware/owner") as inf:
+            self.assertEqual(inf.read(), "dd-19.rpm")
+
+    def test_error(self, mock_extract, mock_append, mock_save):
+        """extract_drivers: a failed dd_extract stops the extraction"""
+        error = subprocess.CalledProcessError(1, "dd_extract")
+        mock_extract.side_effect = [None, error]
+        with mock.patch("driver_updates.MAX_WORKERS", 1):
+            self.assertRaises(subprocess.CalledProcessError, self.extract,
+                              drivers=[fake_enhancement, fake_module, fake_module])
+        self.assertEqual(mock_extract.call_count, 2)
+        self.assertEqual(os.listdir(self.outdir), [])
+        self.assertFalse(mock_append.called)
+
+from driver_updates import parallel_map, merge_tree
+class ParallelMapTestCase(unittest.TestCase):
+    def test_order(self):
+        """parallel_map: results are in the order of the items"""
+        self.assertEqual(parallel_map(lambda x: x*2, range(50), workers=4),
+                         [x*2 for x in range(50)])
+        self.assertEqual(parallel_map(lambda x: x, []), [])
+
+    def test_workers(self):
+        """parallel_map: no more than workers calls run at the same time"""
+        lock = threading.Lock()
+        running = [0, 0]
+        def func(_x):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+        parallel_map(func, range(20), workers=3)
+        self.assertTrue(1 < running[1] <= 3)
+
+    def test_error(self):
+        """parallel_map: the error of the earliest item is raised"""
+        def func(x):
+            if x in (3, 7):
+                raise ValueError(x)
+            return x
+        with self.assertRaises(ValueError) as cm:
+            parallel_map(func, range(10), workers=1)
+        self.assertEqual(cm.exception.args, (3,))
+
+class MergeTreeTestCase(FileTestCaseBase):
+    def test_basic(self):
+        """merge_tree: move files into destdir, merging subdirectories"""
+        self.makefiles("src/sub/file1", "src/file2", "dest/sub/file3", "dest/file2")
+        os.symlink("sub", self.srcdir+"link")
+        with open(self.srcdir+"file2", "w") as outf:
+            outf.write("srcfile")
+        merge_tree(self.srcdir, self.destdir)
+        self.assertEqual(os.listdir(self.srcdir), [])
+        self.assertEqual(sorted(os.listdir(self.destdir+"sub")), ["file1", "file3"])
+        self.assertEqual(open(self.destdir+"file2").read(), "srcfile")
+        self.assertEqual(os.readlink(self.destdir+"link"), "sub")
+
 class GrabDriverFilesTestCase(FileTestCaseBase):
     def test_basic(self):
         """grab_driver_files: copy drivers into place, return module list"""
@@ -417,6 +506,12 @@ class LoadDriversTestCase(unittest.TestCase):
             mock.call(["modprobe", "-a"] + modnames)
         ])
 
+    @mock.patch("driver_updates.subprocess.call")
+    def test_no_modules(self, call):
+        """load_drivers: don't run depmod without new modules"""
+        load_drivers([])
+        self.assertFalse(call.called)
+
 from driver_updates import process_driver_disk
 class ProcessDriverDiskTestCase(unittest.TestCase):
     def setUp(self):
@@ -438,7 +533,7 @@ class ProcessDriverDiskTestCase(unittest.TestCase):
             __enter__=mock.MagicMock(side_effect=self.fakemount), # mount
             __exit__=mock.MagicMock(return_value=None),           # umount
         )
-        self.modlist = []
+        self.modlist = ['funk', 'lolfs']
         # set up our patches
         patches = (
             mock.patch("driver_updates.mounted", return_value=mounted_ctx),
@@ -480,6 +575,16 @@ class ProcessDriverDiskTestCase(unittest.TestCase):
         self.mocks['grab_driver_files'].assert_called_once_with()
         self.mocks['load_drivers'].assert_called_once_with(self.modlist)
 
+    def test_multiple_isos(self):
+        """process_driver_disk: load the drivers from all the .isos at once"""
+        dev = '/dev/fake'
+        self.frepo['/mnt/DD-1'] = []
+        self.fiso['/mnt/DD-1'] += ['first.iso', 'second.iso']
+        self.frepo['/mnt/DD-3'] = ['/mnt/DD-3/repo1']
+        process_driver_disk(dev)
+        self.assertEqual(self.mocks['grab_driver_files'].call_count, 2)
+        self.mocks['load_drivers'].assert_called_once_with(self.modlist*2)
+
     def test_no_drivers(self):
         """process_driver_disk: don't run depmod etc. if no new drivers"""
         dev = '/dev/fake'
@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+#
+# caching-proxy.py - Caching proxy and mirror shared by the kickstart tests
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Usage: caching-proxy.py <cache directory> <statistics file>
+# Like httpd.py, it will print the port number it is listening on and the
+# child process PID, and then fork to the background and exit from the parent.
+#
+# The server is a HTTP proxy (url --proxy=http://host:port) and a mirror at
+# the same time, a request for /<scheme>/<host>/<path> is served from
+# <scheme>://<host>/<path>. Packages and repodata files named by their
+# checksum are cached by their file name, so a package downloaded from one
+# mirror is a hit for all the others, and kept forever. Everything else is
+# cached by URL for METADATA_MAX_AGE seconds. The data itself is stored once
+# per content in objects/<sha256>.
+#
+# The statistics of the server's run are kept up to date in the statistics
+# file as JSON.
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from http.server import HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from proxy import ProxyHandler
+
+# for how long (in seconds) the other files are cached
+METADATA_MAX_AGE = 60 * 60
+
+# files whose content never changes for the same name
+IMMUTABLE_RE = re.compile(r'(\.rpm|/repodata/[0-9a-f]{32,}-[^/]+)$')
+
+CHUNK_SIZE = 64 * 1024
+
+class Cache(object):
+    """ Content-addressed store of downloaded files
+
+        keys/<sha256 of the key> contains the sha256 of the content, which is
+        in objects/<sha256 of the content>.
+    """
+    def __init__(self, cachedir):
+        self._keys = os.path.join(cachedir, "keys")
+        self._objects = os.path.join(cachedir, "objects")
+        os.makedirs(self._keys, exist_ok=True)
+        os.makedirs(self._objects, exist_ok=True)
+
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "errors": 0,
+                      "bytes_cached": 0, "bytes_downloaded": 0}
+
+    def count(self, **counts):
+        with self._stats_lock:
+            for (name, value) in counts.items():
+                self.stats[name] += value
+            return dict(self.stats)
+
+    def _key(self, url):
+        """ Return the key file for url and whether the content can change """
+        path = urlsplit(url).path
+        if IMMUTABLE_RE.search(path):
+            key = "file:" + os.path.basename(path)
+            immutable = True
+        else:
+            key = "url:" + url
+            immutable = False
+        return (os.path.join(self._keys, hashlib.sha256(key.encode("utf-8")).hexdigest()),
+                immutable)
+
+    def _lock(self, keyfile):
+        # Only one download of the same thing at a time, the others wait for it
+        with self._locks_lock:
+            return self._locks.setdefault(keyfile, threading.Lock())
+
+    def _lookup(self, keyfile, immutable):
+        try:
+            if not immutable and time.time() - os.stat(keyfile).st_mtime > METADATA_MAX_AGE:
+                return None
+            with open(keyfile) as f:
+                path = os.path.join(self._objects, f.read().strip())
+        except OSError:
+            return None
+
+        if not os.path.exists(path):
+            return None
+        return path
+
+    def _download(self, url):
+        (fd, tmpname) = tempfile.mkstemp(dir=self._objects, prefix=".download-")
+        checksum = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as f, urlopen(url) as response:
+                while True:
+                    buf = response.read(CHUNK_SIZE)
+                    if not buf:
+                        break
+                    checksum.update(buf)
+                    f.write(buf)
+        except: # pylint: disable=bare-except
+            os.unlink(tmpname)
+            raise
+
+        path = os.path.join(self._objects, checksum.hexdigest())
+        os.rename(tmpname, path)
+        return path
+
+    def get(self, url):
+        """ Return the path of the cached content of url and whether it was a
+            hit, download it if it is not cached.
+        """
+        (keyfile, immutable) = self._key(url)
+        with self._lock(keyfile):
+            path = self._lookup(keyfile, immutable)
+            if path:
+                return (path, True)
+
+            path = self._download(url)
+            (fd, tmpname) = tempfile.mkstemp(dir=self._keys, prefix=".key-")
+            with os.fdopen(fd, "w") as f:
+                f.write(os.path.basename(path))
+            os.rename(tmpname, keyfile)
+            return (path, False)
+
+class CachingProxyHandler(ProxyHandler):
+    def authenticate(self):
+        # Anyone running the tests may use the cache
+        return True
+
+    def _url(self):
+        if self.path.startswith('/'):
+            # Mirror request, /<scheme>/<host>/<path>
+            scheme, _sep, rest = self.path[1:].partition('/')
+            return "%s://%s" % (scheme, rest)
+        return self.path
+
+    def _serve(self, body):
+        cache = self.server.cache
+        try:
+            (path, hit) = cache.get(self._url())
+        except (OSError, ValueError) as e:
+            self.server.write_stats(cache.count(errors=1))
+            self.send_error(getattr(e, "code", 502), str(e))
+            return
+
+        size = os.path.getsize(path)
+        self.send_response(200)
+        self.send_header('Content-Length', str(size))
+        self.end_headers()
+        if body:
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile)
+
+        if hit:
+            stats = cache.count(hits=1, bytes_cached=size)
+        else:
+            stats = cache.count(misses=1, bytes_downloaded=size)
+        self.server.write_stats(stats)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+class CachingProxyServer(ThreadingMixIn, HTTPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, cachedir, stats_file):
+        # Bind to any free port
+        HTTPServer.__init__(self, ('', 0), CachingProxyHandler)
+        self.cache = Cache(cachedir)
+        self._stats_file = stats_file
+        self._stats_lock = threading.Lock()
+        self.write_stats(self.cache.stats)
+
+    def write_stats(self, stats):
+        with self._stats_lock:
+            tmpname = self._stats_file + ".tmp"
+            with open(tmpname, 'w') as f:
+                json.dump(stats, f)
+            os.rename(tmpname, self._stats_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: caching-proxy.py <cache directory> <statistics file>", file=sys.stderr)
+        sys.exit(1)
+
+    server = CachingProxyServer(os.path.abspath(sys.argv[1]), os.path.abspath(sys.argv[2]))
+
+    # Fork to the background
+    pid = os.fork()
+    if pid == 0:
+        # dup the standard file descriptors to /dev/null
+        # pylint: disable=interruptible-system-call, ignorable-system-call
+        os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), 2)
+
+        server.serve_forever()
+
+    # Print the port and the PID to stdout
+    print("%d %d" % (server.server_port, pid))
+
+    # That's it
+    sys.exit(0)
@@ -2,6 +2,9 @@
 
 # Start a super-simple proxy server on localhost
 # A list of proxied requests will be saved to /tmp/proxy.log
+#
+# ProxyHandler is also used by caching-proxy.py, the server only starts when
+# this is run as a script.
 
 # Ignore any interruptible calls
 # pylint: disable=interruptible-system-call
@@ -16,9 +19,6 @@ from base64 import b64decode
 
 import logging
 log = logging.getLogger("proxy_test")
-log_handler = logging.FileHandler('/tmp/proxy.log')
-log.setLevel(logging.INFO)
-log.addHandler(log_handler)
 
 class ProxyHandler(SimpleHTTPRequestHandler):
     def send_authenticate(self):
@@ -119,4 +119,9 @@ class ProxyServer(socketserver.TCPServer):
     def __init__(self):
         socketserver.TCPServer.__init__(self, ('', 8080), ProxyHandler)
 
-ProxyServer().serve_forever()
+if __name__ == "__main__":
+    log_handler = logging.FileHandler('/tmp/proxy.log')
+    log.setLevel(logging.INFO)
+    log.addHandler(log_handler)
+
+    ProxyServer().serve_forever()
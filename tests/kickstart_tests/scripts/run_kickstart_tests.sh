@@ -35,6 +35,12 @@
 # You can control what logs are held onto after the test is complete via the
 # KEEPIT= variable, explained below.  By default, nothing is kept.
 #
+# If KSTEST_CACHE_DIR= is set, a caching proxy keeping its data in that
+# directory is started and the url command of every test that does not use a
+# proxy of its own goes through it.  Keep the directory between runs to start
+# with a warm cache.  The cache statistics are printed at the end as a CACHE:
+# line, which run_report.sh summarizes.
+#
 # Finally, you can run tests across multiple computers at the same time by
 # putting all the hostnames into TEST_REMOTES= as a space separated list.
 # Do not add localhost manually, as it will always be added for you.  You
@@ -105,6 +111,23 @@ if [[ -e $HOME/.kstests.defaults.sh ]]; then
     . $HOME/.kstests.defaults.sh
 fi
 
+# Start the caching proxy shared by all the tests.
+if [[ -n "${KSTEST_CACHE_DIR}" ]]; then
+    mkdir -p ${KSTEST_CACHE_DIR}
+    cache_stats=$(mktemp --tmpdir kstest-cache-stats.XXXXXXXX)
+    cache_info="$(kickstart_tests/scripts/caching-proxy.py ${KSTEST_CACHE_DIR} ${cache_stats})"
+    cache_port="$(echo "$cache_info" | cut -d ' ' -f 1)"
+    cache_pid="$(echo "$cache_info" | cut -d ' ' -f 2)"
+    export KSTEST_CACHE_PROXY="http://$(kickstart_tests/scripts/find-ip):${cache_port}"
+
+    stop_cache() {
+        kill ${cache_pid}
+        python3 -c 'import json, sys; print("CACHE:%(hits)d:%(misses)d:%(errors)d:%(bytes_cached)d:%(bytes_downloaded)d" % json.load(open(sys.argv[1])))' ${cache_stats}
+        rm -f ${cache_stats}
+    }
+    trap stop_cache EXIT
+fi
+
 # Build up a list of substitutions to perform on kickstart files.
 sed_args=$(printenv | while read line; do
     key="$(echo $line | cut -d'=' -f1)"
@@ -157,6 +180,12 @@ export KSTESTDIR=${PWD}/kickstart_tests
 for t in ${tests}; do
     ks=${t/.sh/.ks.in}
     sed ${sed_args} ${ks} > ${t/.sh/.ks}
+
+    # Send the installation source through the cache unless the test has its
+    # own proxy.
+    if [[ -n "${KSTEST_CACHE_PROXY}" ]]; then
+        sed -i -e "/^url / { /--proxy/! s|\$| --proxy=${KSTEST_CACHE_PROXY}| }" ${t/.sh/.ks}
+    fi
 done
 
 # collect the prerequisite list for the requested tests. If there is
@@ -21,6 +21,17 @@ BEGIN {
 
              printf("%-30s | %-10s | %s\n", $2, result, explanation);
            }
+/^CACHE:/ { cache_hits = $2; cache_misses = $3; cache_errors = $4;
+            cache_bytes = $5; download_bytes = $6;
+            have_cache = 1;
+          }
 END {
+    if (have_cache) {
+        requests = cache_hits + cache_misses;
+        printf("\nCache: %d hits, %d misses, %d errors (%d%% hit rate), %.1f MB from the cache, %.1f MB downloaded\n",
+               cache_hits, cache_misses, cache_errors,
+               requests ? 100 * cache_hits / requests : 0,
+               cache_bytes / 1048576, download_bytes / 1048576);
+    }
     printf("\n\n");
 }
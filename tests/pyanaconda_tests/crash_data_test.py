@@ -0,0 +1,72 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from pyanaconda import exception
+from pyanaconda.exception import CrashDataCollector
+from unittest import mock
+import subprocess
+import unittest
+import threading
+import time
+
+class CrashDataCollectorTests(unittest.TestCase):
+    def concurrent_test(self):
+        """Test that the crash data is collected concurrently"""
+        # each function only returns once both of them are running
+        barrier = threading.Barrier(2, timeout=5)
+        def _collect(name):
+            barrier.wait()
+            return name
+
+        collector = CrashDataCollector()
+        collector.add("first", lambda: _collect("first"))
+        collector.add("second", lambda: _collect("second"))
+        callback = collector.callback("second")
+
+        collector.start()
+        self.assertEqual(callback(), "second")
+        self.assertEqual(collector.result("first"), "first")
+
+    def timeout_test(self):
+        """Test that a hung function costs only its timeout"""
+        event = threading.Event()
+        collector = CrashDataCollector()
+        collector.add("hung", lambda: event.wait(10), timeout=0.2)
+        collector.add("broken", lambda: 1 / 0)
+        collector.add("fine", lambda: "data")
+
+        start = time.time()
+        collector.wait()
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(collector.result("hung"), "Timed out after 0.2 seconds")
+        self.assertTrue(collector.result("broken").startswith("Failed to collect broken"))
+        self.assertEqual(collector.result("fine"), "data")
+        event.set()
+
+    def capture_timeout_test(self):
+        """Test that a command killed after its timeout is reaped"""
+        procs = []
+        def _start(argv):
+            procs.append(subprocess.Popen(argv, stdout=subprocess.PIPE))
+            return procs[-1]
+
+        with mock.patch("pyanaconda.exception.iutil.startProgram", side_effect=_start):
+            self.assertRaises(subprocess.TimeoutExpired, exception._capture_output,
+                              "sleep", ["10"], timeout=0.2)
+            self.assertIsNotNone(procs[0].returncode)
+            self.assertEqual(exception._capture_output("echo", ["data"]), "data\n")
@@ -0,0 +1,169 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from pyanaconda.threads import initThreading
+initThreading()
+
+from pyanaconda.packaging import dnfpayload
+from blivet.size import Size
+from unittest import mock
+import unittest
+import os
+
+MOUNTS = """rootfs / rootfs rw 0 0
+tmpfs /tmp tmpfs rw,seclabel 0 0
+server:/export /mnt/nfs\\040share nfs4 rw 0 0
+/dev/sda2 /mnt/sysimage btrfs rw 0 0
+"""
+
+class DFMapTests(unittest.TestCase):
+    def mounts_test(self):
+        """Test reading the mounted file systems"""
+        with mock.patch("pyanaconda.packaging.dnfpayload.open", mock.mock_open(read_data=MOUNTS)):
+            mounts = dnfpayload._mounts()
+        self.assertEqual(mounts, {"/": "rootfs", "/tmp": "tmpfs",
+                                  "/mnt/nfs share": "nfs4", "/mnt/sysimage": "btrfs"})
+
+    @mock.patch("os.statvfs")
+    def df_map_test(self, statvfs):
+        """Test that only mounted candidates are checked, with safety margins"""
+        statvfs.return_value = os.statvfs_result((4096, 4096, 0, 0, 1000, 0, 0, 0, 0, 255))
+        mounts = {"/tmp": "tmpfs", "/mnt/sysimage": "btrfs", "/mnt/nfs": "nfs4"}
+
+        df = dnfpayload._df_map(["/tmp", "/mnt/sysimage", "/mnt/sysimage/home"], mounts)
+        self.assertEqual(df, {"/tmp": Size(4096000), "/mnt/sysimage": Size(3686400)})
+        self.assertEqual(sorted(c[0][0] for c in statvfs.call_args_list), ["/mnt/sysimage", "/tmp"])
+
+class FakePersistor(object):
+    """dnf's GroupPersistor, rolled back in place"""
+    def __init__(self):
+        self.groups = set()
+
+    def rollback(self):
+        self.groups.clear()
+
+class FakeBase(object):
+    """The parts of dnf.Base a depsolve uses"""
+    def __init__(self):
+        self.repos = {"updates": mock.Mock()}
+        self._group_persistor = FakePersistor()
+        self._goal = []
+        self._transaction = None
+        self.resolved = 0
+
+    @property
+    def transaction(self):
+        return self._transaction
+
+    def reset(self, goal=False):
+        if goal:
+            self._goal = []
+            self._group_persistor.rollback()
+            self._transaction = None
+
+    def install(self, name):
+        self._goal.append(name)
+
+    def group_install(self, name):
+        self._goal.append("@" + name)
+        self._group_persistor.groups.add(name)
+
+    def resolve(self):
+        self.resolved += 1
+        self._transaction = list(self._goal)
+        return True
+
+class DepsolveCacheTests(unittest.TestCase):
+    def setUp(self):
+        from pykickstart.version import makeVersion
+        with mock.patch("pyanaconda.packaging.dnfpayload.DNFPayload._configure"):
+            self.payload = dnfpayload.DNFPayload(makeVersion())
+        self.base = self.payload._base = FakeBase()
+        self.groups = ["core"]
+
+        def _apply_selections():
+            for group in self.groups:
+                self.base.group_install(group)
+            for name in self.payload.data.packages.packageList:
+                self.base.install(name)
+        self.payload._apply_selections = mock.Mock(side_effect=_apply_selections)
+
+        patch = mock.patch.multiple("pyanaconda.packaging.dnfpayload.DNFPayload",
+                                    environments=[], kernelPackages=["kernel"],
+                                    spaceRequired=Size(0))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def cache_test(self):
+        """Test that a selection seen before is not resolved again"""
+        packages = self.payload.data.packages
+        packages.packageList = ["vim"]
+        self.payload.checkSoftwareSelection()
+        vim_goal = self.base._goal
+
+        packages.packageList = ["vim", "emacs"]
+        self.payload.checkSoftwareSelection()
+        self.assertIsNot(self.base._goal, vim_goal)
+
+        # going back restores the old result, the selection is applied again
+        # for the group changes and the missing packages
+        packages.packageList = ["vim"]
+        self.payload.checkSoftwareSelection()
+        self.assertIs(self.base._goal, vim_goal)
+        self.assertEqual(self.base.transaction, ["@core", "vim"])
+        self.assertEqual(self.base._group_persistor.groups, {"core"})
+        self.assertEqual(self.base.resolved, 2)
+        self.assertEqual(self.payload._apply_selections.call_count, 3)
+        self.assertEqual(self.payload.txID, 3)
+
+        # new metadata means resolving again
+        self.payload.enableRepo("updates")
+        self.payload.checkSoftwareSelection()
+        self.assertEqual(self.base.resolved, 3)
+
+    def unknown_dnf_test(self):
+        """Test that nothing is saved if dnf keeps its state elsewhere"""
+        with mock.patch("pyanaconda.packaging.dnfpayload._DEPSOLVE_STATE",
+                        ("_goal", "_transaction", "_no_such_attribute")):
+            self.payload.checkSoftwareSelection()
+            self.payload.checkSoftwareSelection()
+        self.assertEqual(self.payload._depsolve_cache, {})
+        self.assertEqual(self.base.resolved, 2)
+
+class LoadReposTests(unittest.TestCase):
+    def setUp(self):
+        from pykickstart.version import makeVersion
+        with mock.patch("pyanaconda.packaging.dnfpayload.DNFPayload._configure"):
+            self.payload = dnfpayload.DNFPayload(makeVersion())
+        self.payload._base = mock.Mock(repos={"fedora": mock.Mock(), "updates": mock.Mock(),
+                                              "broken": mock.Mock(), "bad": mock.Mock()})
+        self.payload.repoLoadStatus = {}
+
+    def load_test(self):
+        """Test that a failing repo doesn't stop loading the others"""
+        repos = self.payload._base.repos
+        repos["broken"].load.side_effect = dnfpayload.dnf.exceptions.RepoError("no metadata")
+        repos["bad"].load.side_effect = ValueError("unexpected")
+
+        failed = self.payload._load_repos(["fedora", "updates", "broken", "bad", "fedora"])
+        self.assertEqual(sorted(failed.keys()), ["bad", "broken"])
+        self.assertEqual(repos["fedora"].load.call_count, 1)
+        self.assertEqual(repos["updates"].load.call_count, 1)
+        self.assertEqual(self.payload.repoLoadStatus["broken"][1], "no metadata")
+        self.assertEqual(self.payload.repoLoadStatus["bad"][1], "unexpected")
+        self.assertIsNone(self.payload.repoLoadStatus["fedora"][1])
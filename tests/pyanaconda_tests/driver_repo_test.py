@@ -0,0 +1,108 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from pyanaconda.threads import initThreading
+initThreading()
+
+from pyanaconda.packaging import PackagePayload, PayloadSetupError, DD_REPO_STAMP
+from unittest import mock
+import unittest
+import tempfile
+import shutil
+import os
+
+def _fake_createrepo(_cmd, argv):
+    os.makedirs(os.path.join(argv[0], "repodata"), exist_ok=True)
+    return 0
+
+def _failing_createrepo(_cmd, argv):
+    # leaves partial repodata behind
+    os.makedirs(os.path.join(argv[0], "repodata"), exist_ok=True)
+    return 1
+
+class DriverRepoTests(unittest.TestCase):
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        with open(os.path.join(self.repo, "driver.rpm"), "w") as f:
+            f.write("rpm")
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def _needs_metadata(self):
+        return PackagePayload._driverRepoNeedsMetadata(self.repo, PackagePayload._driverRepoDigest(self.repo))
+
+    @mock.patch("pyanaconda.iutil.execWithRedirect", side_effect=_fake_createrepo)
+    def cache_test(self, createrepo):
+        """Generated repodata is reused until the repo changes"""
+        self.assertTrue(self._needs_metadata())
+        PackagePayload._createDriverRepoMetadata(self.repo, PackagePayload._driverRepoDigest(self.repo))
+        self.assertEqual(createrepo.call_args[0], ("createrepo_c", [self.repo]))
+        self.assertTrue(os.path.exists(os.path.join(self.repo, "repodata", DD_REPO_STAMP)))
+        self.assertFalse(self._needs_metadata())
+
+        with open(os.path.join(self.repo, "other.rpm"), "w") as f:
+            f.write("rpm")
+        self.assertTrue(self._needs_metadata())
+
+    def shipped_repodata_test(self):
+        """Repodata from the driver disk and empty repos are left alone"""
+        os.unlink(os.path.join(self.repo, "driver.rpm"))
+        self.assertFalse(self._needs_metadata())
+
+        os.mkdir(os.path.join(self.repo, "repodata"))
+        with open(os.path.join(self.repo, "driver.rpm"), "w") as f:
+            f.write("rpm")
+        self.assertFalse(self._needs_metadata())
+
+    def failure_test(self):
+        """A failed createrepo_c run leaves no repodata to be reused"""
+        digest = PackagePayload._driverRepoDigest(self.repo)
+        with mock.patch("pyanaconda.iutil.execWithRedirect", side_effect=_fake_createrepo):
+            PackagePayload._createDriverRepoMetadata(self.repo, "old digest")
+
+        with mock.patch("pyanaconda.iutil.execWithRedirect", side_effect=_failing_createrepo):
+            self.assertRaises(PayloadSetupError, PackagePayload._createDriverRepoMetadata,
+                              self.repo, digest)
+        self.assertFalse(os.path.exists(os.path.join(self.repo, "repodata")))
+        self.assertTrue(self._needs_metadata())
+
+        with mock.patch("pyanaconda.iutil.execWithRedirect", side_effect=OSError("not found")):
+            self.assertRaises(PayloadSetupError, PackagePayload._createDriverRepoMetadata,
+                              self.repo, digest)
+
+    def prepare_test(self):
+        """A repo createrepo_c fails on is skipped, the others are used"""
+        other = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, other)
+        with open(os.path.join(other, "other.rpm"), "w") as f:
+            f.write("rpm")
+        empty = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, empty)
+
+        def createrepo(cmd, argv):
+            if argv[0] == self.repo:
+                raise RuntimeError("crashed")
+            return _fake_createrepo(cmd, argv)
+
+        with mock.patch("pyanaconda.iutil.execWithRedirect", side_effect=createrepo):
+            repos = PackagePayload._prepareDriverRepos([(1, self.repo), (2, other), (3, empty)])
+        self.assertEqual(repos, [(2, other)])
@@ -0,0 +1,92 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from pyanaconda.ui.lib import entropy
+from unittest import mock
+import unittest
+import tempfile
+import shutil
+import time
+import os
+
+class EntropyWaiterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        # a FIFO stands in for /dev/random, it is readable once written to
+        self.device = os.path.join(self.tmpdir, "random")
+        os.mkfifo(self.device)
+        self.threshold = os.path.join(self.tmpdir, "read_wakeup_threshold")
+        with open(self.threshold, "w") as f:
+            f.write("64\n")
+
+        self.entropy = 10
+        patches = [mock.patch.object(entropy, "RANDOM_DEVICE", self.device),
+                   mock.patch.object(entropy, "READ_WAKEUP_THRESHOLD", self.threshold),
+                   mock.patch.object(entropy, "get_current_entropy", lambda: self.entropy)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _read_threshold(self):
+        with open(self.threshold) as f:
+            return int(f.read())
+
+    def wait_test(self):
+        """Test that the wait ends as soon as the device is readable"""
+        with entropy.EntropyWaiter(256) as waiter:
+            self.assertEqual(self._read_threshold(), 256)
+            self.assertIsNotNone(waiter.fileno())
+
+            start = time.time()
+            self.assertEqual(waiter.wait(0.2), 10)
+            self.assertGreaterEqual(time.time() - start, 0.2)
+
+            self.entropy = 300
+            with open(self.device, "w") as f:
+                f.write("x")
+                f.flush()
+                start = time.time()
+                self.assertEqual(waiter.wait(10), 300)
+                self.assertLess(time.time() - start, 1)
+            self.assertTrue(waiter.done)
+
+        self.assertEqual(self._read_threshold(), 64)
+        self.assertIsNone(waiter.fileno())
+
+    def fallback_test(self):
+        """Test waiting without the kernel's help"""
+        os.unlink(self.device)
+        with entropy.EntropyWaiter(256, max_wait=1) as waiter:
+            self.assertIsNone(waiter.fileno())
+            self.entropy = 256
+            self.assertEqual(waiter.wait(10), 256)
+
+            # no more than the waiter's own limit
+            self.entropy = 10
+            start = time.time()
+            self.assertEqual(waiter.wait(10), 10)
+            self.assertLess(time.time() - start, 2)
+            self.assertTrue(waiter.timed_out)
+
+        self.assertEqual(self._read_threshold(), 64)
@@ -0,0 +1,169 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Test the grub.cfg written without grub2-mkconfig
+# These tests do not write anything to the disk and do not require root
+
+from pyanaconda import bootloader
+from pyanaconda.bootloader import GRUB2, EFIGRUB, LinuxBootLoaderImage, BootLoaderImage
+from unittest import mock
+import unittest
+import tempfile
+import shutil
+import io
+import os
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "grub2")
+
+class GRUB2ConfigTest(unittest.TestCase):
+    def setUp(self):
+        disk = mock.Mock()
+        disk.format.labelType = "gpt"
+        self.boot = mock.Mock(type="partition", disk=disk)
+        self.boot.name = "sda1"
+        self.boot.format.type = "ext4"
+        self.boot.format.uuid = "3bd5d3cf-6b3e-4b5a-8c07-3aa5f4a8a3c5"
+        self.boot.format.mountpoint = "/boot"
+        self.root = mock.Mock(type="lvmlv", fstabSpec="/dev/mapper/fedora-root")
+
+        self.sysroot = tempfile.mkdtemp()
+        patches = [mock.patch("pyanaconda.bootloader.productName", "Fedora"),
+                   mock.patch("pyanaconda.bootloader.productVersion", "23"),
+                   mock.patch("pyanaconda.bootloader.arch.isX86", return_value=True),
+                   mock.patch("pyanaconda.iutil.getSysroot", return_value=self.sysroot)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.sysroot)
+
+    def _bootloader(self, cls=GRUB2):
+        loader = cls()
+        loader.stage2_device = self.boot
+        loader.console = ""
+        loader.other_os_devices = []
+        loader.boot_args.update(["rhgb", "quiet"])
+        for version in ("4.2.3-300.fc23.x86_64", "4.2.5-300.fc23.x86_64"):
+            loader.add_image(LinuxBootLoaderImage(device=self.root, label="Fedora",
+                                                  short="linux", version=version))
+        return loader
+
+    def _config(self, loader):
+        config = io.StringIO()
+        loader.write_config_header(config)
+        loader.write_config_images(config)
+        return config.getvalue()
+
+    def _fixture(self, name):
+        with open(os.path.join(FIXTURES, name)) as f:
+            return f.read()
+
+    def bios_test(self):
+        """Test the configuration of a BIOS system"""
+        loader = self._bootloader()
+        self.assertTrue(loader._can_write_native_config())
+        self.assertEqual(self._config(loader), self._fixture("bios.cfg"))
+
+    def btrfs_test(self):
+        """Test the configuration of a root on a btrfs subvolume"""
+        self.root.type = "btrfs subvolume"
+        self.root.fstabSpec = "UUID=8d2c3c3e-1e4f-4b0c-9d0e-4c1f6f0d8a21"
+        self.root.name = "root"
+        loader = self._bootloader()
+        self.assertTrue(loader._can_write_native_config())
+        self.assertEqual(self._config(loader), self._fixture("btrfs.cfg"))
+
+    def efi_serial_test(self):
+        """Test the configuration of an EFI system with a serial console"""
+        loader = self._bootloader(EFIGRUB)
+        loader.console = "ttyS1"
+        loader.console_options = "115200n8"
+        loader.encrypted_password = "grub.pbkdf2.sha512.10000.AAAA.BBBB"
+        loader.timeout = 10
+        self.assertEqual(self._config(loader), self._fixture("efi-serial.cfg"))
+
+    def grubenv_test(self):
+        """Test that the default entry is saved in the environment block"""
+        loader = self._bootloader()
+        os.makedirs(self.sysroot + loader.config_dir)
+        env_path = self.sysroot + loader.config_dir + "/grubenv"
+        with open(env_path, "w") as f:
+            f.write("# GRUB Environment Block\nsaved_entry=old\nboot_success=1\n" + "#" * 900)
+
+        loader.write_config_post()
+        with open(env_path) as f:
+            env = f.read()
+        self.assertEqual(len(env), 1024)
+        self.assertTrue(env.startswith("# GRUB Environment Block\n"
+                                       "saved_entry=Fedora (4.2.3-300.fc23.x86_64) 23\n"
+                                       "boot_success=1\n#"))
+
+    def fallback_test(self):
+        """Test the cases left to grub2-mkconfig"""
+        loader = self._bootloader()
+        loader.other_os_devices = None
+        self.assertFalse(loader._can_write_native_config())
+
+        windows = mock.Mock()
+        windows.name = "sda3"
+        loader.other_os_devices = [windows]
+        self.assertFalse(loader._can_write_native_config())
+
+        loader = self._bootloader()
+        loader.add_image(BootLoaderImage(device=mock.Mock(), label="Windows"))
+        self.assertFalse(loader._can_write_native_config())
+
+        loader = self._bootloader()
+        self.boot.type = "mdarray"
+        self.assertFalse(loader._can_write_native_config())
+
+        self.boot.type = "partition"
+        self.boot.format.type = "btrfs"
+        self.assertFalse(loader._can_write_native_config())
+
+    def other_os_test(self):
+        """Test finding formatted devices the installed system doesn't use"""
+        disk = mock.Mock(ancestors=[])
+        disk.name = "sda"
+        disk.format.type = "disklabel"
+        mine = mock.Mock(ancestors=[disk])
+        mine.format.type = "ext4"
+        label = mock.Mock(ancestors=[disk])
+        label.format.type = "biosboot"
+        windows = mock.Mock(ancestors=[disk])
+        windows.name = "sda3"
+        windows.format.type = "ntfs"
+        empty = mock.Mock(ancestors=[disk])
+        empty.format.type = None
+        media = mock.Mock(ancestors=[])
+        media.format.type = "iso9660"
+        # a whole disk file system on an ignored disk
+        other = mock.Mock(ancestors=[])
+        other.name = "sdb"
+        other.format.type = "ext4"
+
+        storage = mock.Mock(mountpoints={"/": mine}, swaps=[])
+        storage.config.ignoredDisks = ["sdb"]
+        storage.devicetree.devices = [disk, mine, label, windows, empty, media]
+        storage.devicetree._hidden = [other]
+        self.assertEqual(bootloader.otherOSDevices(storage), [windows, other])
+
+        # an ignored disk that isn't there at all can't be checked
+        storage.devicetree._hidden = []
+        self.assertIsNone(bootloader.otherOSDevices(storage))
@@ -0,0 +1,202 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from pyanaconda.iso9660 import ISO9660Image, ISO9660Error, ISO_BLOCK_SIZE
+from pyanaconda import image
+from unittest import mock
+import unittest
+import tempfile
+import struct
+import os
+
+def _both(fmt, value):
+    return struct.pack("<" + fmt, value) + struct.pack(">" + fmt, value)
+
+def _record(name, extent, size, is_dir, su=b""):
+    pad = b"\0" if len(name) % 2 == 0 else b""
+    length = 33 + len(name) + len(pad) + len(su)
+    if length % 2:
+        su += b"\0"
+        length += 1
+    return bytes([length, 0]) + _both("I", extent) + _both("I", size) + \
+           b"\0" * 7 + bytes([0x02 if is_dir else 0, 0, 0]) + _both("H", 1) + \
+           bytes([len(name)]) + name + pad + su
+
+def _iso_name(name, is_dir):
+    name = name.upper().replace(".", "_", 1 if name.startswith(".") else 0)
+    if is_dir:
+        return name.encode("ascii")
+    if "." not in name:
+        name += "."
+    return (name + ";1").encode("ascii")
+
+def _volume_descriptor(vd_type, root, escape=b""):
+    vd = bytearray(ISO_BLOCK_SIZE)
+    vd[0] = vd_type
+    vd[1:6] = b"CD001"
+    vd[6] = 1
+    vd[88:88 + len(escape)] = escape
+    vd[156:156 + len(root)] = root
+    return bytes(vd)
+
+def make_iso(path, files, joliet=False, rock_ridge=False):
+    """Write a small ISO9660 image containing files ({path: bytes}).
+
+       Directories are taken from the file paths, a path ending with a /
+       creates an empty directory. Every directory has to fit in one sector.
+    """
+    dirs = {"": []}
+    for name in files:
+        parts = name.strip("/").split("/")
+        for i in range(len(parts)):
+            parent = "/".join(parts[:i])
+            child = "/".join(parts[:i + 1])
+            if not child:
+                continue
+            dirs.setdefault(parent, [])
+            is_dir = i < len(parts) - 1 or name.endswith("/")
+            if is_dir:
+                dirs.setdefault(child, [])
+            if (parts[i], is_dir) not in dirs[parent]:
+                dirs[parent].append((parts[i], is_dir))
+
+    trees = 2 if joliet else 1
+    first_dir = 16 + trees + 1
+    dir_sectors = {}
+    for (tree, dirname) in ((t, d) for t in range(trees) for d in sorted(dirs)):
+        dir_sectors[(tree, dirname)] = first_dir + len(dir_sectors)
+
+    file_sectors = {}
+    next_sector = first_dir + len(dir_sectors)
+    for name, data in sorted(files.items()):
+        if name.endswith("/"):
+            continue
+        file_sectors[name.strip("/")] = next_sector
+        next_sector += max(1, (len(data) + ISO_BLOCK_SIZE - 1) // ISO_BLOCK_SIZE)
+
+    image = bytearray(next_sector * ISO_BLOCK_SIZE)
+
+    for (tree, dirname), sector in dir_sectors.items():
+        su = b""
+        if rock_ridge and tree == 0 and dirname == "":
+            su = b"SP\x07\x01\xbe\xef\x00"
+        data = _record(b"\0", sector, ISO_BLOCK_SIZE, True, su)
+        parent = dirname.rpartition("/")[0]
+        data += _record(b"\1", dir_sectors[(tree, parent)], ISO_BLOCK_SIZE, True)
+        for (name, is_dir) in sorted(dirs[dirname]):
+            full = (dirname + "/" + name).strip("/")
+            if is_dir:
+                extent, size = dir_sectors[(tree, full)], ISO_BLOCK_SIZE
+            else:
+                extent, size = file_sectors[full], len(files[full])
+            if tree == 1:
+                rec_name = (name if is_dir else name + ";1").encode("utf-16-be")
+                data += _record(rec_name, extent, size, is_dir)
+            else:
+                su = b""
+                if rock_ridge:
+                    su = b"NM" + bytes([5 + len(name), 1, 0]) + name.encode("utf-8")
+                data += _record(_iso_name(name, is_dir), extent, size, is_dir, su)
+        image[sector * ISO_BLOCK_SIZE:sector * ISO_BLOCK_SIZE + len(data)] = data
+
+    for name, sector in file_sectors.items():
+        image[sector * ISO_BLOCK_SIZE:sector * ISO_BLOCK_SIZE + len(files[name])] = files[name]
+
+    root = _record(b"\0", dir_sectors[(0, "")], ISO_BLOCK_SIZE, True)
+    image[16 * ISO_BLOCK_SIZE:17 * ISO_BLOCK_SIZE] = _volume_descriptor(1, root)
+    if joliet:
+        root = _record(b"\0", dir_sectors[(1, "")], ISO_BLOCK_SIZE, True)
+        image[17 * ISO_BLOCK_SIZE:18 * ISO_BLOCK_SIZE] = _volume_descriptor(2, root, b"%/E")
+    terminator = 16 + trees
+    image[terminator * ISO_BLOCK_SIZE:(terminator + 1) * ISO_BLOCK_SIZE] = _volume_descriptor(255, b"")
+
+    with open(path, "wb") as f:
+        f.write(image)
+
+class ISO9660Tests(unittest.TestCase):
+    DISCINFO = b"1430000000.000000\nFedora 23\nx86_64\n"
+    FILES = {".discinfo": DISCINFO,
+             ".treeinfo": b"[general]\nversion = 23\n",
+             "repodata/repomd.xml": b"<repomd/>",
+             "Packages/": b""}
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, "test.iso")
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        os.rmdir(self.tmpdir)
+
+    def _check_tree(self, iso):
+        self.assertEqual(iso.read(".discinfo"), self.DISCINFO)
+        self.assertTrue(iso.isdir("repodata"))
+        self.assertTrue(iso.isdir("/Packages"))
+        self.assertFalse(iso.isdir(".treeinfo"))
+        self.assertTrue(iso.exists("repodata/repomd.xml"))
+        self.assertFalse(iso.exists("images/install.img"))
+        self.assertEqual(sorted(iso.listdir("/")),
+                         [".discinfo", ".treeinfo", "Packages", "repodata"])
+        self.assertEqual(iso.read("repodata/repomd.xml"), b"<repomd/>")
+        self.assertRaises(ISO9660Error, iso.read, "repodata")
+        self.assertRaises(ISO9660Error, iso.listdir, ".discinfo")
+
+    def joliet_test(self):
+        """Read names from the Joliet tree"""
+        make_iso(self.path, self.FILES, joliet=True)
+        with ISO9660Image(self.path) as iso:
+            self._check_tree(iso)
+
+    def rock_ridge_test(self):
+        """Read names from Rock Ridge NM entries"""
+        make_iso(self.path, self.FILES, rock_ridge=True)
+        with ISO9660Image(self.path) as iso:
+            self._check_tree(iso)
+
+    def plain_test(self):
+        """Plain ISO9660 names are matched case insensitively"""
+        make_iso(self.path, {"README": b"readme", "repodata/repomd.xml": b"<repomd/>"})
+        with ISO9660Image(self.path) as iso:
+            self.assertEqual(iso.read("README"), b"readme")
+            self.assertEqual(iso.read("readme"), b"readme")
+            self.assertTrue(iso.isdir("repodata"))
+
+    def not_iso_test(self):
+        """Files that aren't ISO images are rejected"""
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * ISO_BLOCK_SIZE * 20)
+        self.assertRaises(ISO9660Error, ISO9660Image, self.path)
+
+    def probe_test(self):
+        """Probe results are cached, failed reads are not"""
+        make_iso(self.path, self.FILES, joliet=True)
+        image._iso_probe_cache.clear()
+
+        with mock.patch("pyanaconda.image.ISO9660Image", side_effect=OSError("EIO")):
+            self.assertIsNone(image.probeIsoImage(self.path))
+        self.assertEqual(image._iso_probe_cache, {})
+
+        self.assertEqual(image.probeIsoImage(self.path), ("x86_64", True))
+        with mock.patch("pyanaconda.image.ISO9660Image") as reader:
+            self.assertEqual(image.probeIsoImage(self.path), ("x86_64", True))
+            self.assertFalse(reader.called)
+        image._iso_probe_cache.clear()
@@ -20,6 +20,19 @@
 
 from pyanaconda import keyboard
 import unittest
+import tempfile
+import shutil
+import os
+
+KBD_MODEL_MAP = """# consolelayout\txlayout\txmodel\t\txvariant\txoptions
+sg\t\t\tch\tpc105\t\tde_nodeadkeys\tterminate:ctrl_alt_bksp
+mk-utf\t\t\tmk,us\tpc105\t\t-\t\tterminate:ctrl_alt_bksp,grp:shifts_toggle
+us\t\t\tus\tpc105+inet\t-\t\tterminate:ctrl_alt_bksp
+de\t\t\tde\tpc105\t\t-\t\tterminate:ctrl_alt_bksp
+de-latin1\t\tde\tpc105\t\t-\t\tterminate:ctrl_alt_bksp
+de-latin1-nodeadkeys\tde\tpc105\t\tnodeadkeys\tterminate:ctrl_alt_bksp
+fr_CH\t\t\tch\tpc105\t\tfr\t\tterminate:ctrl_alt_bksp
+"""
 
 class ParsingAndJoiningTests(unittest.TestCase):
     def layout_variant_parsing_test(self):
@@ -89,3 +102,44 @@ class ParsingAndJoiningTests(unittest.TestCase):
         self.assertEqual(keyboard.normalize_layout_variant("cz(qwerty)"), "cz (qwerty)")
         self.assertEqual(keyboard.normalize_layout_variant("cz ( qwerty )"), "cz (qwerty)")
         self.assertEqual(keyboard.normalize_layout_variant("cz "), "cz")
+
+class KeymapConverterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.model_map = os.path.join(self.tmpdir, "kbd-model-map")
+        with open(self.model_map, "w") as f:
+            f.write(KBD_MODEL_MAP)
+        self.xkb_dir = os.path.join(self.tmpdir, "xkb")
+        os.mkdir(self.xkb_dir)
+        for name in ("cz.map.gz", "cz-qwerty.map.gz"):
+            open(os.path.join(self.xkb_dir, name), "w").close()
+
+        self.converter = keyboard.KeymapConverter(self.model_map, [self.xkb_dir])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def convert_keymap_test(self):
+        """Should convert keymaps to X layouts like systemd-localed."""
+
+        self.assertEqual(self.converter.convert_keymap("sg"), "ch (de_nodeadkeys)")
+        self.assertEqual(self.converter.convert_keymap("mk-utf"), "mk,us")
+        self.assertEqual(self.converter.convert_keymap("de-latin1"), "de")
+        self.assertEqual(self.converter.convert_keymap("cz"), "")
+
+    def convert_layout_test(self):
+        """Should convert X layouts to keymaps like systemd-localed."""
+
+        # generated keymaps come first
+        self.assertEqual(self.converter.convert_layout("cz"), "cz")
+        self.assertEqual(self.converter.convert_layout("cz (qwerty)"), "cz-qwerty")
+
+        # the first of the best matching entries
+        self.assertEqual(self.converter.convert_layout("de"), "de")
+        self.assertEqual(self.converter.convert_layout("de (nodeadkeys)"), "de-latin1-nodeadkeys")
+        self.assertEqual(self.converter.convert_layout("ch (fr)"), "fr_CH")
+        self.assertEqual(self.converter.convert_layout("mk"), "mk-utf")
+        self.assertEqual(self.converter.convert_layout("gb"), "")
+
+        with self.assertRaises(keyboard.InvalidLayoutVariantSpec):
+            self.converter.convert_layout("cz [qwerty]")
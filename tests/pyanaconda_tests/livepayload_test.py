@@ -0,0 +1,174 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Test the segmented liveimg download against a local HTTP server
+
+from pyanaconda.threads import initThreading
+initThreading()
+
+from pyanaconda.packaging import livepayload, PayloadInstallError
+from pyanaconda.iutil import requests_session
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from unittest import mock
+import unittest
+import threading
+import tempfile
+import hashlib
+import os
+
+IMAGE = os.urandom(300000)
+
+class ImageHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.headers.get("Range"))
+        if self.headers.get("Range") and server.ranges:
+            (start, end) = (int(v) for v in self.headers["Range"][6:].split("-"))
+            if start in server.errors:
+                self.send_error(server.errors[start])
+                return
+            self.send_response(206)
+            body = IMAGE[start:end + 1]
+        else:
+            self.send_response(200)
+            body = IMAGE
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+
+        with server.lock:
+            drop = server.drops > 0 and len(body) > 10000
+            if drop:
+                server.drops -= 1
+        if drop:
+            # the connection dies after part of the data
+            self.wfile.write(body[:5000])
+            self.wfile.flush()
+            self.close_connection = True
+            self.connection.shutdown(2)
+            return
+        self.wfile.write(body)
+
+class ImageServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), ImageHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.ranges = True
+        self.drops = 0
+        self.errors = {}
+
+class SegmentedDownloadTests(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.multiple("pyanaconda.packaging.livepayload",
+                                    DOWNLOAD_MIN_SEGMENT_SIZE=1000, DOWNLOAD_CHUNK_SIZE=4096,
+                                    DOWNLOAD_RETRY_DELAY=0)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+        self.server = ImageServer()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = "http://127.0.0.1:%d/disk.img" % self.server.server_port
+
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.unlink(self.path)
+
+    def _download(self, hasher=None):
+        return livepayload.SegmentedDownload(requests_session(), self.url, self.path,
+                                             len(IMAGE), hasher=hasher)
+
+    def _check_image(self):
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), IMAGE)
+
+    def split_test(self):
+        """The file is split into contiguous segments"""
+        segments = livepayload.SegmentedDownload._split(10000, 3)
+        self.assertEqual(segments, [[0, 3333, 0], [3333, 6666, 3333], [6666, 10000, 6666]])
+        # small files aren't split
+        self.assertEqual(livepayload.SegmentedDownload._split(1500, 3), [[0, 1500, 0]])
+
+    def download_test(self):
+        """Segments are downloaded and hashed in order"""
+        hasher = hashlib.sha256()
+        download = self._download(hasher)
+        download.run()
+
+        self._check_image()
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(IMAGE).hexdigest())
+        self.assertEqual(download.bytes_read, len(IMAGE))
+        self.assertEqual(len(self.server.requests), livepayload.DOWNLOAD_SEGMENTS)
+
+    def resume_test(self):
+        """Dropped connections are resumed where they stopped"""
+        self.server.drops = 3
+        hasher = hashlib.sha256()
+        self._download(hasher).run()
+
+        self._check_image()
+        self.assertEqual(hasher.hexdigest(), hashlib.sha256(IMAGE).hexdigest())
+        resumed = [r for r in self.server.requests
+                   if int(r[6:].split("-")[0]) % (len(IMAGE) // livepayload.DOWNLOAD_SEGMENTS)]
+        self.assertEqual(len(resumed), 3)
+
+    def error_test(self):
+        """A failing segment fails the download and stops the others"""
+        self.server.errors = {0: 403}
+        download = self._download()
+        with mock.patch.object(download._cancel, "set", wraps=download._cancel.set) as cancel:
+            self.assertRaises(PayloadInstallError, download.run)
+            self.assertTrue(cancel.called)
+
+        with mock.patch.object(livepayload.SegmentedDownload, "_fetch_segment_data",
+                               side_effect=ValueError("unexpected")):
+            self.assertRaises(PayloadInstallError, self._download().run)
+
+    def no_ranges_test(self):
+        """The whole file sent for a range request is reported"""
+        self.server.ranges = False
+        self.assertRaises(livepayload.RangeRequestError, self._download().run)
+
+    def fallback_test(self):
+        """The image is downloaded over one connection if ranges don't work"""
+        from pykickstart.version import makeVersion
+        payload = livepayload.LiveImageKSPayload(makeVersion())
+        payload.data.method.method = "liveimg"
+        payload.data.method.url = self.url
+        payload.data.method.checksum = hashlib.sha256(IMAGE).hexdigest()
+        payload.image_path = self.path
+        payload._image_size = len(IMAGE)
+        payload._accept_ranges = True
+        self.server.ranges = False
+
+        self.assertIsNone(payload._preInstall_url_image())
+        self._check_image()
+        self.assertEqual(payload._image_sha256, hashlib.sha256(IMAGE).hexdigest())
+        self.assertIsNone(self.server.requests[-1])
@@ -0,0 +1,180 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Test LocaledWrapper against a stub systemd-localed on a private bus
+
+from pyanaconda import keyboard
+from pyanaconda.safe_dbus import DBUS_PROPS_IFACE
+import unittest
+import subprocess
+import threading
+import shutil
+import time
+
+import gi
+gi.require_version("GLib", "2.0")
+gi.require_version("Gio", "2.0")
+
+from gi.repository import GLib, Gio
+
+LOCALED_XML = """
+<node>
+  <interface name="org.freedesktop.locale1">
+    <property name="VConsoleKeymap" type="s" access="read"/>
+    <property name="X11Layout" type="s" access="read"/>
+    <property name="X11Model" type="s" access="read"/>
+    <property name="X11Variant" type="s" access="read"/>
+    <property name="X11Options" type="s" access="read"/>
+    <method name="SetVConsoleKeyboard">
+      <arg type="s" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="b" direction="in"/>
+      <arg type="b" direction="in"/>
+    </method>
+    <method name="SetX11Keyboard">
+      <arg type="s" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="s" direction="in"/>
+      <arg type="b" direction="in"/>
+      <arg type="b" direction="in"/>
+    </method>
+  </interface>
+</node>
+"""
+
+CONNECTION_FLAGS = Gio.DBusConnectionFlags.AUTHENTICATION_CLIENT | \
+                   Gio.DBusConnectionFlags.MESSAGE_BUS_CONNECTION
+
+class StubLocaled(object):
+    """systemd-localed without the conversions, running in its own thread."""
+
+    def __init__(self, address):
+        self.properties = {"VConsoleKeymap": "us", "X11Layout": "us", "X11Model": "",
+                           "X11Variant": "", "X11Options": ""}
+        self.calls = []
+        self.property_reads = 0
+
+        self._context = GLib.MainContext()
+        self._loop = GLib.MainLoop(self._context)
+        self._connection = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(address,))
+        self._thread.daemon = True
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self, address):
+        self._context.push_thread_default()
+        self._connection = Gio.DBusConnection.new_for_address_sync(address, CONNECTION_FLAGS,
+                                                                   None, None)
+        info = Gio.DBusNodeInfo.new_for_xml(LOCALED_XML).interfaces[0]
+        self._connection.register_object(keyboard.LOCALED_OBJECT_PATH, info,
+                                         self._method_call, self._get_property, None)
+        self._connection.call_sync("org.freedesktop.DBus", "/org/freedesktop/DBus",
+                                   "org.freedesktop.DBus", "RequestName",
+                                   GLib.Variant("(su)", (keyboard.LOCALED_SERVICE, 0)),
+                                   None, Gio.DBusCallFlags.NONE, -1, None)
+        self._ready.set()
+        self._loop.run()
+
+    def _get_property(self, _connection, _sender, _path, _iface, name):
+        self.property_reads += 1
+        return GLib.Variant("s", self.properties[name])
+
+    def _method_call(self, _connection, _sender, _path, _iface, method, params, invocation):
+        args = params.unpack()
+        self.calls.append((method, args))
+        if method == "SetVConsoleKeyboard":
+            changed = {"VConsoleKeymap": args[0]}
+        else:
+            changed = {"X11Layout": args[0], "X11Variant": args[2], "X11Options": args[3]}
+        invocation.return_value(None)
+        self.change(changed)
+
+    def change(self, changed):
+        """Change properties and tell the clients."""
+        self.properties.update(changed)
+        values = dict((name, GLib.Variant("s", value)) for (name, value) in changed.items())
+        self._connection.emit_signal(None, keyboard.LOCALED_OBJECT_PATH, DBUS_PROPS_IFACE,
+                                     "PropertiesChanged",
+                                     GLib.Variant("(sa{sv}as)",
+                                                  (keyboard.LOCALED_IFACE, values, [])))
+
+    def stop(self):
+        self._loop.quit()
+        self._thread.join()
+
+@unittest.skipUnless(shutil.which("dbus-daemon"), "dbus-daemon is not available")
+class LocaledWrapperTest(unittest.TestCase):
+    def setUp(self):
+        self.bus = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address"],
+                                    stdout=subprocess.PIPE, universal_newlines=True)
+        address = self.bus.stdout.readline().strip()
+        self.localed = StubLocaled(address)
+        connection = Gio.DBusConnection.new_for_address_sync(address, CONNECTION_FLAGS,
+                                                             None, None)
+        self.wrapper = keyboard.LocaledWrapper(connection)
+
+    def tearDown(self):
+        self.localed.stop()
+        self.bus.terminate()
+        self.bus.wait()
+        self.bus.stdout.close()
+
+    def _dispatch_signals(self, condition):
+        context = GLib.MainContext.default()
+        deadline = time.time() + 5
+        while not condition() and time.time() < deadline:
+            context.iteration(False)
+            time.sleep(0.01)
+
+    def properties_test(self):
+        """Test that all properties are fetched once"""
+        self.localed.properties.update({"X11Layout": "cz,us", "X11Variant": "qwerty"})
+
+        self.assertEqual(self.wrapper.keymap, "us")
+        reads = self.localed.property_reads
+        self.assertEqual(self.wrapper.layouts_variants, ["cz (qwerty)", "us"])
+        self.assertEqual(self.wrapper.options, "")
+        self.assertEqual(self.localed.property_reads, reads)
+
+    def properties_changed_test(self):
+        """Test that the cached properties follow the PropertiesChanged signal"""
+        self.assertEqual(self.wrapper.keymap, "us")
+        reads = self.localed.property_reads
+
+        self.localed.change({"VConsoleKeymap": "cz-us-qwertz"})
+        self._dispatch_signals(lambda: self.wrapper.keymap != "us")
+        self.assertEqual(self.wrapper.keymap, "cz-us-qwertz")
+        self.assertEqual(self.localed.property_reads, reads)
+
+    def set_keyboard_test(self):
+        """Test setting the keymap and the layouts together"""
+        self.wrapper.set_keyboard("de", ["de (nodeadkeys)", "us"], ["grp:alt_shift_toggle"])
+        self.assertEqual(self.localed.calls,
+                         [("SetVConsoleKeyboard", ("de", "", False, False)),
+                          ("SetX11Keyboard", ("de,us", "", "nodeadkeys,", "grp:alt_shift_toggle",
+                                              False, False))])
+        self.assertEqual(self.wrapper.keymap, "de")
+        self.assertEqual(self.wrapper.layouts_variants, ["de (nodeadkeys)", "us"])
+
+        # nothing is set if a layout is not valid
+        with self.assertRaises(keyboard.InvalidLayoutVariantSpec):
+            self.wrapper.set_keyboard("cz", ["cz [qwerty]"])
+        self.assertEqual(len(self.localed.calls), 2)
@@ -21,6 +21,7 @@
 from pyanaconda import localization
 from pyanaconda.iutil import execWithCaptureBinary
 import locale as locale_mod
+import tempfile
 import unittest
 
 class ParsingTests(unittest.TestCase):
@@ -165,3 +166,40 @@ class LangcodeLocaleMatchingTests(unittest.TestCase):
             order = localization.resolve_date_format(1, 2, 3, fail_safe=False)[0]
             for i in (1, 2, 3):
                 self.assertIn(i, order)
+
+class LanguageCatalogTests(unittest.TestCase):
+    def catalog_test(self):
+        """Language catalog should cache queries and survive a round trip."""
+
+        queries = []
+        def query():
+            queries.append(1)
+            return ["cs_CZ.UTF-8"]
+
+        with tempfile.NamedTemporaryFile(mode="w+t") as catalog_file:
+            catalog = localization._LanguageCatalog(catalog_file.name)
+
+            # broken catalog file is ignored
+            self.assertEqual(catalog.lookup("language_locales", "cs", query), ["cs_CZ.UTF-8"])
+            self.assertEqual(catalog.lookup("language_locales", "cs", query), ["cs_CZ.UTF-8"])
+            self.assertEqual(len(queries), 1)
+
+            catalog.write()
+
+            # a new catalog answers from the file without querying
+            catalog = localization._LanguageCatalog(catalog_file.name)
+            self.assertEqual(catalog.lookup("language_locales", "cs", query), ["cs_CZ.UTF-8"])
+            self.assertEqual(len(queries), 1)
+
+            # unknown keys are still queried
+            catalog.lookup("language_locales", "sk", query)
+            self.assertEqual(len(queries), 2)
+
+            # catalogs with a different version are ignored
+            catalog_file.seek(0)
+            catalog_file.truncate()
+            catalog_file.write('{"version": 0, "tables": {"language_locales": {"cs": []}}}')
+            catalog_file.flush()
+            catalog.reset()
+            self.assertEqual(catalog.lookup("language_locales", "cs", query), ["cs_CZ.UTF-8"])
+            self.assertEqual(len(queries), 3)
@@ -0,0 +1,138 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Test the password quality checker of the GUI spokes, the main loop and the
+# threads are replaced so that everything runs when the test says so
+
+from pyanaconda.threads import initThreading
+initThreading()
+
+from pyanaconda.ui.gui.helpers import PasswordQualityChecker
+from unittest import mock
+import unittest
+import threading
+
+class PasswordQualityCheckerTests(unittest.TestCase):
+    def setUp(self):
+        # timeout_add returns ids, the timers run when the test fires them
+        self.timers = {}
+        glib = mock.Mock()
+        glib.timeout_add.side_effect = self._timeout_add
+        glib.source_remove.side_effect = self.timers.pop
+
+        # threads run when the test runs them
+        self.threads = []
+        thread_mgr = mock.Mock()
+        thread_mgr.add.side_effect = lambda thread: self.threads.append(thread)
+
+        self.validate = mock.Mock(side_effect=lambda pw, user, minlen: (True, len(pw), None))
+        patches = [mock.patch("pyanaconda.ui.gui.helpers.GLib", glib),
+                   mock.patch("pyanaconda.ui.gui.helpers.threadMgr", thread_mgr),
+                   mock.patch("pyanaconda.ui.gui.helpers.AnacondaThread",
+                              side_effect=lambda **kwargs: kwargs),
+                   mock.patch("pyanaconda.ui.gui.helpers.gtk_call_once",
+                              side_effect=lambda func, *args: func(*args)),
+                   mock.patch("pyanaconda.ui.gui.helpers.validatePassword", self.validate)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.callback = mock.Mock()
+        self.checker = PasswordQualityChecker(self.callback)
+
+    def _timeout_add(self, _delay, func, *args):
+        timer_id = len(self.timers) + 100
+        while timer_id in self.timers:
+            timer_id += 1
+        self.timers[timer_id] = (func, args)
+        return timer_id
+
+    def _fire_timers(self):
+        for (func, args) in list(self.timers.values()):
+            func(*args)
+        self.timers.clear()
+
+    def _run_threads(self):
+        while self.threads:
+            thread = self.threads.pop(0)
+            thread["target"](*thread["args"])
+
+    def debounce_test(self):
+        """Test that only the password typed last is checked"""
+        self.checker.check("a", "root", 6)
+        self.checker.check("ab", "root", 6)
+        self.checker.check("abc", "root", 6)
+        self.assertEqual(len(self.timers), 1)
+
+        self._fire_timers()
+        self._run_threads()
+        self.validate.assert_called_once_with("abc", "root", minlen=6)
+        self.callback.assert_called_once_with((True, 3, None))
+
+    def memo_test(self):
+        """Test that a password is checked only once"""
+        self.checker.check("abc", "root", 6)
+        self._fire_timers()
+        self._run_threads()
+
+        self.checker.check("abcd", "root", 6)
+        self.checker.check("abc", "root", 6)
+        # the known result is passed on right away, nothing else is started
+        self.assertEqual(self.timers, {})
+        self.assertEqual(self.callback.call_args_list[-1], mock.call((True, 3, None)))
+        self.assertEqual(self.checker.result("abc", "root", 6), (True, 3, None))
+        self.assertEqual(self.validate.call_count, 1)
+
+        # a different user or minimal length is a different check
+        self.checker.check("abc", "joe", 6)
+        self.assertEqual(len(self.timers), 1)
+
+    def result_test(self):
+        """Test that result() waits for the check running for the password"""
+        self.checker.check("abc", "root", 6)
+        self._fire_timers()
+        self.assertEqual(len(self.threads), 1)
+
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(self.checker.result("abc", "root", 6)))
+        waiter.start()
+        waiter.join(0.1)
+        self.assertTrue(waiter.is_alive())
+
+        self._run_threads()
+        waiter.join()
+        self.assertEqual(results, [(True, 3, None)])
+        self.assertEqual(self.validate.call_count, 1)
+
+        # nothing started yet, the password is checked in the calling thread
+        self.assertEqual(self.checker.result("xyz1", "root", 6), (True, 4, None))
+        self.assertEqual(self.threads, [])
+
+    def stale_test(self):
+        """Test that the result of a password typed over since is dropped"""
+        self.checker.check("abc", "root", 6)
+        self._fire_timers()
+        self.checker.check("abcd", "root", 6)
+
+        # the old check finishes, but its result isn't shown
+        self._run_threads()
+        self.assertFalse(self.callback.called)
+
+        self._fire_timers()
+        self._run_threads()
+        self.callback.assert_called_once_with((True, 4, None))
@@ -0,0 +1,75 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from pyanaconda.queuefactory import QueueFactory
+import unittest
+import os
+
+class QueueFactoryTests(unittest.TestCase):
+    def setUp(self):
+        self.q = QueueFactory("test")
+        self.q.addMessage("step", 0)
+        self.q.addMessage("message", 2, coalesce=lambda args: args[0])
+
+    def messages_test(self):
+        """Test the generated constants and send methods"""
+        self.assertEqual((self.q.TEST_CODE_STEP, self.q.TEST_CODE_MESSAGE), (0, 1))
+        self.assertRaises(AttributeError, self.q.addMessage, "step", 0)
+        self.assertRaises(TypeError, self.q.send_message, "only one")
+
+        self.q.send_step()
+        self.assertEqual(self.q.q.get(False), (self.q.TEST_CODE_STEP, ()))
+
+    def drain_test(self):
+        """Test that drain coalesces messages and keeps the order"""
+        self.q.send_message("a", "first")
+        self.q.send_step()
+        self.q.send_message("b", "first")
+        self.q.send_message("a", "second")
+        self.q.send_step()
+
+        step = (self.q.TEST_CODE_STEP, ())
+        self.assertEqual(self.q.drain(),
+                         [step, (self.q.TEST_CODE_MESSAGE, ("b", "first")),
+                          (self.q.TEST_CODE_MESSAGE, ("a", "second")), step])
+        self.assertEqual(self.q.drain(), [])
+
+        # requeued messages come first
+        self.q.send_message("a", "third")
+        self.q.requeue([step])
+        self.assertEqual(self.q.drain(), [step, (self.q.TEST_CODE_MESSAGE, ("a", "third"))])
+
+    def wakeup_test(self):
+        """Test that only one wakeup byte is written until it is cleared"""
+        r, w = os.pipe2(os.O_NONBLOCK)
+        try:
+            self.q.q.set_wakeup_fd(w)
+            for _i in range(100):
+                self.q.send_step()
+            self.assertEqual(os.read(r, 4096), b"\0")
+
+            self.q.q.clear_wakeup(r)
+            self.q.send_step()
+            self.assertEqual(os.read(r, 4096), b"\0")
+            self.assertEqual(len(self.q.drain()), 101)
+        finally:
+            os.close(r)
+            os.close(w)
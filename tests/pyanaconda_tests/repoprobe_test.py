@@ -0,0 +1,136 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from pyanaconda.threads import initThreading
+initThreading()
+
+from pyanaconda.packaging.repoprobe import RepoProbe
+from unittest import mock
+import unittest
+import threading
+import requests
+
+TREEINFO = "[general]\nversion = 23\n"
+
+class FakeSession(object):
+    """requests.Session serving files from a dict of url -> text"""
+    def __init__(self, files):
+        self.files = files
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self._lock:
+            self.requests.append((url, kwargs["proxies"], kwargs["verify"]))
+        content = self.files.get(url)
+        if isinstance(content, Exception):
+            raise content
+
+        response = mock.Mock(text=content)
+        response.ok = content is not None
+        response.status_code = 200 if response.ok else 404
+        return response
+
+class RepoProbeTests(unittest.TestCase):
+    def setUp(self):
+        self.session = FakeSession({"http://a/os/.treeinfo": TREEINFO,
+                                    "http://a/os/repodata/repomd.xml": "<repomd/>",
+                                    "http://b/os/repodata/repomd.xml": "<repomd/>"})
+        self.probe = RepoProbe(self.session)
+
+    def probe_test(self):
+        """Probe one repo and reuse the result"""
+        result = self.probe.probe("http://a/os/")
+        self.assertEqual(result.treeinfo, TREEINFO)
+        self.assertEqual(result.treeinfo_config.get("general", "version"), "23")
+        self.assertTrue(result.has_repomd)
+        self.assertEqual(result.errors, [])
+
+        count = len(self.session.requests)
+        self.assertIs(self.probe.probe("http://a/os/"), result)
+        self.assertIs(self.probe.cached("http://a/os/"), result)
+        self.assertEqual(len(self.session.requests), count)
+
+        # other settings are probed again
+        self.assertIsNot(self.probe.probe("http://a/os/", sslverify=False), result)
+        self.assertGreater(len(self.session.requests), count)
+
+        self.probe.invalidate("http://a/os/")
+        self.assertIsNone(self.probe.cached("http://a/os/"))
+
+    def missing_test(self):
+        """A missing repomd.xml is told apart from an error"""
+        result = self.probe.probe("http://c/os")
+        self.assertIsNone(result.treeinfo)
+        self.assertTrue(result.missing_repomd)
+        self.assertEqual(result.errors, [])
+
+    def error_test(self):
+        """Network errors stop the probe and aren't cached"""
+        self.session.files["http://a/os/.treeinfo"] = requests.exceptions.Timeout("timed out")
+        result = self.probe.probe("http://a/os")
+        self.assertEqual(result.errors, ["timed out"])
+        self.assertFalse(result.has_repomd)
+        self.assertFalse(result.missing_repomd)
+        self.assertEqual(len(self.session.requests), 1)
+        self.assertIsNone(self.probe.cached("http://a/os"))
+
+        self.session.files["http://a/os/.treeinfo"] = TREEINFO
+        self.assertEqual(self.probe.probe("http://a/os").treeinfo, TREEINFO)
+
+    def ttl_test(self):
+        """Results are reused only for the ttl"""
+        probe = RepoProbe(self.session, ttl=0)
+        result = probe.probe("http://a/os")
+        self.assertIsNot(probe.probe("http://a/os"), result)
+
+    def probe_all_test(self):
+        """Probe several repos at once, keyed by all their settings"""
+        cached = self.probe.probe("http://a/os")
+        count = len(self.session.requests)
+
+        repos = [("http://a/os", None, True),
+                 ("http://a/os", "http://proxy:3128", True),
+                 ("http://b/os", None, False),
+                 ("http://b/os", None, False),
+                 ("", None, True)]
+        results = self.probe.probe_all(repos)
+
+        self.assertEqual(sorted(results.keys()),
+                         [("http://a/os", "", True), ("http://a/os", "http://proxy:3128", True),
+                          ("http://b/os", "", False)])
+        self.assertIs(results[RepoProbe.key("http://a/os")], cached)
+        self.assertTrue(results[RepoProbe.key("http://b/os", sslverify=False)].has_repomd)
+
+        # the proxy and sslverify settings were used, duplicates probed once
+        new = self.session.requests[count:]
+        self.assertEqual(sorted(set((url.split("/")[2], proxies.get("http"), verify)
+                                    for (url, proxies, verify) in new)),
+                         [("a", "http://proxy:3128", True), ("b", None, False)])
+        self.assertEqual(len([r for r in new if r[0] == "http://b/os/.treeinfo"]), 1)
+
+    def probe_all_error_test(self):
+        """A probe failing unexpectedly is reported as an error"""
+        self.session.files["http://b/os/.treeinfo"] = ValueError("bad url")
+        results = self.probe.probe_all([("http://a/os", None, True), ("http://b/os", None, True)])
+
+        self.assertTrue(results[RepoProbe.key("http://a/os")].has_repomd)
+        failed = results[RepoProbe.key("http://b/os")]
+        self.assertFalse(failed.has_repomd)
+        self.assertEqual(failed.errors, ["bad url"])
+        self.assertIsNone(self.probe.cached("http://b/os"))
@@ -0,0 +1,129 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from pyanaconda.threads import initThreading
+initThreading()
+
+from pyanaconda import rescue
+from blivet.errors import StorageError
+from unittest import mock
+import unittest
+import os
+
+class FakeFormat(object):
+    def __init__(self, fmt_type, files=None, passphrase=None):
+        self.type = fmt_type
+        self.options = "defaults"
+        self.linuxNative = True
+        self.mountable = True
+        self.mount_options = None
+        self.mountpoint = None
+        self.files = files or {}
+        self.passphrase = None
+        self.correct_passphrase = passphrase
+
+    def mount(self, options, mountpoint):
+        self.mount_options = options
+        self.mountpoint = mountpoint
+        for (path, content) in self.files.items():
+            os.makedirs(os.path.dirname(mountpoint + path), exist_ok=True)
+            with open(mountpoint + path, "w") as f:
+                f.write(content)
+
+    def unmount(self):
+        self.mountpoint = None
+
+    def setup(self):
+        if self.passphrase != self.correct_passphrase:
+            raise StorageError("wrong passphrase")
+
+class FakeDevice(object):
+    def __init__(self, name, fmt):
+        self.name = name
+        self.format = fmt
+        self.controllable = True
+        self.active = False
+
+    def setup(self):
+        self.active = True
+
+    def teardown(self):
+        self.active = False
+
+class RescueTests(unittest.TestCase):
+    @mock.patch("pyanaconda.rescue.Root", lambda **kwargs: kwargs)
+    @mock.patch("pyanaconda.rescue.iutil.execWithCapture", return_value="x86_64\n")
+    @mock.patch("pyanaconda.rescue.parseFSTab")
+    def find_installations_test(self, parse, _arch):
+        """Test probing the candidate devices for installed systems"""
+        fstabs = {}
+        crypttabs = []
+        def _parse(_devicetree, chroot):
+            with open(chroot + "/etc/fstab") as f:
+                fstabs[chroot] = f.read()
+            if os.path.exists(chroot + "/etc/crypttab"):
+                with open(chroot + "/etc/crypttab") as f:
+                    crypttabs.append(f.read())
+            return ({"/": chroot}, [])
+        parse.side_effect = _parse
+
+        root = FakeDevice("root", FakeFormat("ext4", {"/etc/fstab": "/dev/root / ext4\n",
+                                                      "/etc/crypttab": "luks-home UUID=1 none\n",
+                                                      "/etc/redhat-release":
+                                                      "Fedora release 23 (Twenty Three)\n"}))
+        home = FakeDevice("home", FakeFormat("xfs", {"/user/notes": "hello"}))
+        bare = FakeDevice("bare", FakeFormat("ext2", {"/etc/fstab": "/dev/bare / ext2\n"}))
+        swap = FakeDevice("swap", FakeFormat("swap"))
+        swap.format.mountable = False
+
+        devicetree = mock.Mock(leaves=[root, home, bare, swap])
+        roots = rescue.find_existing_installations(devicetree)
+
+        self.assertEqual([r["name"] for r in roots],
+                         ["Fedora Linux 23 for x86_64", "Unknown Linux"])
+        self.assertEqual(sorted(fstabs.values()), ["/dev/bare / ext2\n", "/dev/root / ext4\n"])
+        self.assertEqual(crypttabs, ["luks-home UUID=1 none\n"])
+        self.assertEqual(root.format.mount_options, "defaults,ro,noload")
+        self.assertEqual(home.format.mount_options, "defaults,ro,norecovery")
+        self.assertEqual(bare.format.mount_options, "defaults,ro")
+        self.assertIsNone(swap.format.mount_options)
+
+        # everything is cleaned up
+        for device in (root, home, bare):
+            self.assertFalse(device.active)
+            self.assertIsNone(device.format.mountpoint)
+        for chroot in fstabs:
+            self.assertFalse(os.path.exists(chroot))
+
+    def unlock_test(self):
+        """Test trying a passphrase on several LUKS devices"""
+        devices = [FakeDevice("luks%d" % i, FakeFormat("luks", passphrase=p))
+                   for (i, p) in enumerate(["secret", "other", "secret"])]
+
+        unlocked = rescue.unlock_luks_devices(devices, "secret")
+        self.assertEqual(unlocked, [devices[0], devices[2]])
+        self.assertEqual([d.active for d in devices], [True, False, True])
+        self.assertEqual([d.format.passphrase for d in devices], ["secret", None, "secret"])
+
+    def run_parallel_test(self):
+        """Test that one failing item doesn't stop the others"""
+        def _check(item):
+            if item == 2:
+                raise OSError("no such file")
+            return item * 10
+        self.assertEqual(rescue._run_parallel("Test", _check, [1, 2, 3]), [10, None, 30])
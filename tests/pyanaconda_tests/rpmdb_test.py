@@ -0,0 +1,89 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from pyanaconda.packaging.rpmdb import SysrootRpmDB
+from unittest import mock
+import unittest
+import tempfile
+import shutil
+import os
+
+def _header(name, provides, files):
+    return {"name": name.encode("utf-8"), "version": b"1.0", "release": b"1",
+            "provides": [p.encode("utf-8") for p in provides + [name]],
+            "files": [f.encode("utf-8") for f in files]}
+
+HEADERS = [_header("kernel-core", ["kernel"], ["/boot/vmlinuz-4.2.3", "/lib/modules/4.2.3/vmlinuz"]),
+           _header("kernel", [], []),
+           _header("plymouth", ["plymouth(system-theme)"], ["/usr/bin/plymouth"])]
+
+class RpmDBTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.dbfile = os.path.join(self.root, "var/lib/rpm/Packages")
+        os.makedirs(os.path.dirname(self.dbfile))
+        with open(self.dbfile, "w") as f:
+            f.write("db")
+
+        self.rpm = mock.MagicMock(RPMTAG_NAME="name", RPMTAG_VERSION="version",
+                                  RPMTAG_RELEASE="release", RPMTAG_PROVIDENAME="provides",
+                                  RPMTAG_FILENAMES="files")
+        self.rpm.expandMacro.return_value = "/var/lib/rpm"
+        self.ts = self.rpm.TransactionSet.return_value
+        self.ts.dbMatch.side_effect = lambda: iter(HEADERS)
+
+        patcher = mock.patch.dict("sys.modules", rpm=self.rpm)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.db = SysrootRpmDB(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def query_test(self):
+        """All queries are answered from one pass over the database"""
+        self.assertEqual([p.name for p in self.db.whatProvides("kernel")], ["kernel-core", "kernel"])
+        self.assertEqual(self.db.whatProvides("rhgb"), [])
+        self.assertEqual([p.name for p in self.db.fileOwners("/boot/vmlinuz-4.2.3")], ["kernel-core"])
+        self.assertEqual(self.db.packages("kernel-core")[0].files, ["/boot/vmlinuz-4.2.3"])
+        self.assertRaises(ValueError, self.db.fileOwners, "/usr/bin/plymouth")
+        self.assertEqual(self.ts.dbMatch.call_count, 1)
+        self.rpm.TransactionSet.assert_called_once_with(self.root)
+
+    def invalidate_test(self):
+        """The index is rebuilt when the database changes"""
+        self.assertTrue(self.db.whatProvides("plymouth"))
+        self.assertEqual(self.ts.dbMatch.call_count, 1)
+
+        # environment files don't count
+        with open(os.path.join(self.root, "var/lib/rpm/__db.001"), "w") as f:
+            f.write("env")
+        self.assertTrue(self.db.whatProvides("plymouth"))
+        self.assertEqual(self.ts.dbMatch.call_count, 1)
+
+        with open(self.dbfile, "a") as f:
+            f.write("more packages")
+        self.assertTrue(self.db.whatProvides("plymouth"))
+        self.assertEqual(self.ts.dbMatch.call_count, 2)
+
+        self.db.invalidate()
+        self.assertTrue(self.db.whatProvides("plymouth"))
+        self.assertEqual(self.ts.dbMatch.call_count, 3)
@@ -26,6 +26,7 @@ from pyanaconda.simpleconfig import simple_replace
 from pyanaconda import simpleconfig
 import unittest
 import tempfile
+import os
 
 class SimpleConfigTests(unittest.TestCase):
     TEST_CONFIG = """ESSID="Example Network #1"
@@ -191,6 +192,67 @@ KEY2="A single ' inside" # And comment "with quotes"
             # Check that the original file handle points to the replaced contents
             self.assertEqual(testconfig.read(), 'KEY1=value2\n')
 
+    def find_comment_test(self):
+        """Test finding comments outside of quotes"""
+        self.assertEqual(simpleconfig.find_comment("KEY=VALUE"), None)
+        self.assertEqual(simpleconfig.find_comment("# KEY=VALUE"), 0)
+        self.assertEqual(simpleconfig.find_comment("KEY=VALUE # comment # more"), 10)
+        self.assertEqual(simpleconfig.find_comment('KEY="#1" # comment'), 9)
+        self.assertEqual(simpleconfig.find_comment("""KEY="it's #1" # comment"""), 14)
+        self.assertEqual(simpleconfig.find_comment("""KEY='say "#"' # comment"""), 14)
+        self.assertEqual(simpleconfig.find_comment('KEY="unterminated # quote'), None)
+        self.assertEqual(simpleconfig.find_comment(""), None)
+
+    def round_trip_test(self):
+        """Test that only the changed keys are rewritten"""
+        config = """# Comment line
+
+NAME=one # the first
+ INDENTED = spaces
+DUP=1
+QUOTED='single quotes'
+DUP=1
+not a key
+"""
+        with tempfile.NamedTemporaryFile(mode="wt") as testconfig:
+            testconfig.write(config)
+            testconfig.flush()
+            os.chmod(testconfig.name, 0o640)
+
+            scf = SimpleConfigFile(testconfig.name)
+            scf.read()
+            self.assertEqual(scf.get("indented"), "spaces")
+            scf.set(("NAME", "two words"), ("NEW", "value"))
+            scf.unset("QUOTED")
+            scf.write()
+
+            self.assertEqual(open(testconfig.name).read(),
+                             """# Comment line
+
+NAME="two words" # the first
+INDENTED=spaces
+DUP=1
+DUP=1
+not a key
+NEW=value
+""")
+            self.assertEqual(os.stat(testconfig.name).st_mode & 0o777, 0o640)
+
+    def write_new_file_test(self):
+        """Test writing a file that doesn't exist yet"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, "config")
+            scf = SimpleConfigFile()
+            scf.set(("key1", "value1"))
+            scf.write(filename)
+            self.assertEqual(open(filename).read(), "KEY1=value1\n")
+            self.assertEqual(os.stat(filename).st_mode & 0o777, 0o644)
+            self.assertEqual(os.listdir(tmpdir), ["config"])
+        finally:
+            os.unlink(filename)
+            os.rmdir(tmpdir)
+
 class SimpleReplaceTests(unittest.TestCase):
     TEST_CONFIG = """#SKIP=Skip this commented line
 BOOT=always
@@ -232,3 +294,19 @@ BOOT=always
             config.read()
             self.assertEqual(config.get("BOOT"), "sometimes")
             self.assertEqual(config.get("NEWKEY"), "")
+
+    def prefix_test(self):
+        """Test that the first key a line starts with wins"""
+        with tempfile.NamedTemporaryFile(mode="wt") as testconfig:
+            testconfig.write("  BOOTPROTO=dhcp\nBOOT=always\nOTHER=1\n")
+            testconfig.flush()
+
+            keys = [("BOOT", "BOOT=never"), ("BOOTPROTO", "BOOTPROTO=none"),
+                    ("OTHER", "NOTHER=2"), ("NEW", "NEW=1"), ("NEW", "NEW=2")]
+            simple_replace(testconfig.name, keys)
+
+            # BOOTPROTO and OTHER are not in the file anymore once replaced,
+            # so they are added
+            self.assertEqual(open(testconfig.name).read(),
+                             "BOOT=never\nBOOT=never\nNOTHER=2\n# Added by Anaconda\n"
+                             "BOOTPROTO=none\nNOTHER=2\nNEW=1\nNEW=2\n")
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+from pyanaconda.ui.tui.simpleline.base import App, UIScreen, Widget, invalidate_frames
+from pyanaconda.ui.tui.simpleline.widgets import TextWidget, ColumnWidget
+import unittest
+
+class WidgetTests(unittest.TestCase):
+    def write_test(self):
+        """Test typing text to the widget buffer"""
+        w = Widget()
+        w.write(u"Můj text\nnext")
+        self.assertEqual(w.get_lines(), [u"Můj text", u"next"])
+        self.assertEqual(w.width, 8)
+        self.assertEqual(w.cursor, (1, 4))
+
+        # overwrite in the middle and pad a new row
+        w.write(u"X", row=0, col=1)
+        w.write(u"far", row=3, col=2)
+        self.assertEqual(w.get_lines(), [u"MXj text", u"next", u"", u"  far"])
+        self.assertEqual(w.height, 4)
+
+        w.clear()
+        self.assertEqual((w.width, w.height, w.cursor), (0, 0, (0, 0)))
+
+    def wrap_test(self):
+        """Test wrapping of long text"""
+        w = Widget()
+        w.write(u"abcdefgh", col=2, width=3)
+        self.assertEqual(w.get_lines(), [u"  abc", u"defgh"])
+
+        w = Widget()
+        w.write(u"abcdefgh", col=2, width=3, block=True)
+        self.assertEqual(w.get_lines(), [u"  abc", u"  def", u"  gh"])
+        self.assertEqual(w.cursor, (2, 4))
+
+        w = Widget(max_width=4)
+        w.write(u"abcdef\nxy")
+        self.assertEqual(w.get_lines(), [u"abcd", u"ef", u"xy"])
+
+    def draw_test(self):
+        """Test drawing widgets into each other"""
+        c = ColumnWidget([(4, [TextWidget(u"one two")]), (None, [TextWidget(u"three")])], 1)
+        c.render(20)
+        self.assertEqual(c.get_lines(), [u"one  three", u"two"])
+        self.assertEqual(c.width, 10)
+
+class FrameDamageTests(unittest.TestCase):
+    def frame_damage_test(self):
+        """Test that only changed lines of a redrawn screen are reported"""
+        app = App("test")
+        screen = UIScreen(app)
+        frame = [u"title", u"", u"1) [ ] first", u"2) [ ] second", u"3) [ ] third"]
+
+        # the first frame is always shown completely
+        self.assertIsNone(app.frame_damage(screen, frame))
+        self.assertEqual(app.frame_damage(screen, list(frame)), [])
+
+        changed = list(frame)
+        changed[3] = u"2) [x] second"
+        self.assertEqual(app.frame_damage(screen, changed), [u"2) [x] second"])
+
+        # a different screen or a forced redraw shows everything
+        self.assertIsNone(app.frame_damage(UIScreen(app), changed))
+        app.redraw(full=True)
+        self.assertIsNone(app.frame_damage(screen, changed))
+
+        # so does a frame that changed too much or changed its length
+        self.assertIsNone(app.frame_damage(screen, [u"a", u"b", u"c", u"d", u"e"]))
+        self.assertIsNone(app.frame_damage(screen, [u"a", u"b"]))
+
+    def invalidate_test(self):
+        """Test that output printed between frames forces a full redraw"""
+        app = App("test")
+        screen = UIScreen(app)
+        frame = [u"title", u"", u"1) [ ] first", u"2) [ ] second", u"3) [ ] third"]
+        self.assertIsNone(app.frame_damage(screen, frame))
+
+        invalidate_frames()
+        self.assertIsNone(app.frame_damage(screen, frame))
+        self.assertEqual(app.frame_damage(screen, frame), [])
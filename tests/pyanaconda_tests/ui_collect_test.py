@@ -0,0 +1,101 @@
+#
+# Copyright (C) 2015  Red Hat, Inc.
+#
+# This copyrighted material is made available to anyone wishing to use,
+# modify, copy, or redistribute it subject to the terms and conditions of
+# the GNU General Public License v.2, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT
+# ANY WARRANTY expressed or implied, including the implied warranties of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.  You should have received a copy of the
+# GNU General Public License along with this program; if not, write to the
+# Free Software Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA
+# 02110-1301, USA.  Any Red Hat trademarks that are incorporated in the
+# source code or documentation are not subject to the GNU General Public
+# License and may only be used or replicated with the express permission of
+# Red Hat, Inc.
+#
+
+# Ignore any interruptible calls
+# pylint: disable=interruptible-system-call
+
+from pyanaconda.ui import common
+from unittest import mock
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+SPOKES = """
+class Category(object):
+    displayOnHubGUI = "Hub"
+
+class FirstSpoke(object):
+    category = Category
+
+class SecondSpoke(object):
+    category = None
+"""
+
+class CollectTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pkgname = "collect_test_%d" % os.getpid()
+        self.path = os.path.join(self.tmpdir, self.pkgname)
+        os.mkdir(self.path)
+        with open(os.path.join(self.path, "__init__.py"), "w"):
+            pass
+        with open(os.path.join(self.path, "spokes.py"), "w") as f:
+            f.write(SPOKES)
+        sys.path.insert(0, self.tmpdir)
+
+        self.pattern = self.pkgname + ".%s"
+        self.manifest = os.path.join(self.tmpdir, "manifest.json")
+        self.registry = common._ModuleRegistry(self.manifest)
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        for name in [n for n in sys.modules if n.startswith(self.pkgname)]:
+            del sys.modules[name]
+        shutil.rmtree(self.tmpdir)
+
+    def _collect(self, pred):
+        with mock.patch("pyanaconda.ui.common._registry", self.registry):
+            return common.collect(self.pattern, self.path, pred)
+
+    def collect_test(self):
+        """Directories are scanned once and rescanned when they change"""
+        spokes = self._collect(lambda obj: getattr(obj, "category", None) is not None)
+        self.assertEqual([s.__name__ for s in spokes], ["FirstSpoke"])
+
+        with mock.patch("pyanaconda.ui.common._scan_modules") as scan:
+            names = [c.__name__ for c in self._collect(lambda obj: True)]
+            self.assertEqual(names, ["Category", "FirstSpoke", "SecondSpoke"])
+            self.assertFalse(scan.called)
+
+        # a new module changes the directory's mtime
+        with open(os.path.join(self.path, "more.py"), "w") as f:
+            f.write("class ThirdSpoke(object):\n    category = None\n")
+        os.utime(self.path, (0, 0))
+        names = [c.__name__ for c in self._collect(lambda obj: obj.__name__.endswith("Spoke"))]
+        self.assertEqual(sorted(names), ["FirstSpoke", "SecondSpoke", "ThirdSpoke"])
+
+        self.assertEqual(self.registry.modules(self.pattern, "/no/such/dir"), [])
+
+    def manifest_test(self):
+        """Directories in the manifest are not scanned"""
+        self.registry.write_manifest([(self.pattern, self.path), (self.pattern, "/no/such/dir")])
+        self.registry.reset()
+
+        with mock.patch("pyanaconda.ui.common._scan_modules") as scan:
+            names = [c.__name__ for c in self._collect(lambda obj: True)]
+            self.assertEqual(names, ["Category", "FirstSpoke", "SecondSpoke"])
+            self.assertFalse(scan.called)
+
+        # a stale manifest falls back to scanning
+        self.registry.reset()
+        os.utime(self.path, (0, 0))
+        with mock.patch("pyanaconda.ui.common._scan_modules", return_value=[]) as scan:
+            self.assertEqual(self._collect(lambda obj: True), [])
+            self.assertTrue(scan.called)